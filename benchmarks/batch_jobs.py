@@ -0,0 +1,84 @@
+"""
+Jobs per second when running the same program with many initial memories.
+
+The ``fresh`` mode builds an `AppConfiguration` and a processor for every job, as
+`xsim-run` does. The ``worker`` mode runs the jobs through a `batch.Worker` in the
+current process, which reuses its processor, and the ``pool`` mode through
+`batch.run_jobs` with a pool of worker processes.
+
+Usage:
+
+    python benchmarks/batch_jobs.py --jobs 400 --max-steps 2000 --workers 4
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from xsim.app import batch, cli
+from xsim.app.config import AppConfiguration
+
+CONFIG = Path(__file__).parent.parent / "config.json"
+SOURCE = "ADD r1, 0x1\nSUB r2, r1\nMOV [0x300], r2\nAND r2, 0xff\nJMP 0x0\n"
+
+
+def make_jobs(config: dict, program: Path, count: int, max_steps: int):
+    return [
+        batch.Job(
+            config,
+            str(program),
+            memory={2: (index % 0x100).to_bytes(2, "big")},
+            max_steps=max_steps,
+        )
+        for index in range(count)
+    ]
+
+
+def run_fresh(jobs, workers):
+    for job in jobs:
+        config = AppConfiguration(**json.loads(json.dumps(job.config)))
+        processor = config.create_processor()
+        config.map_devices(processor)
+        for address, values in job.memory.items():
+            processor.memory.write_block(address, values)
+        cli.run_processor(config, processor, cli.RunOptions(max_steps=job.max_steps))
+
+
+def run_worker(jobs, workers):
+    worker = batch.Worker()
+    for job in jobs:
+        worker.run(job)
+
+
+def run_pool(jobs, workers):
+    batch.run_jobs(jobs, workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=400)
+    parser.add_argument("--max-steps", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        program = Path(directory) / "program.s"
+        program.write_text(SOURCE)
+        config = json.loads(CONFIG.read_text())
+        config["program_path"] = str(program)
+        jobs = make_jobs(config, program, args.jobs, args.max_steps)
+        for name, runner in (
+            ("fresh", run_fresh),
+            ("worker", run_worker),
+            ("pool", run_pool),
+        ):
+            start = time.perf_counter()
+            runner(jobs, args.workers)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<8} {len(jobs) / elapsed:>10,.1f} jobs/s")
+
+
+if __name__ == "__main__":
+    main()
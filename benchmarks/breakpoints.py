@@ -0,0 +1,61 @@
+"""
+Run speed with breakpoints set outside the hot loop of a program.
+
+``none`` runs without breakpoints, ``native`` with `--breakpoints` addresses in
+`BasicProcessor.breakpoints`, half of them conditional, and ``callback`` checks the
+same addresses from an `until` callback, as a debugger written in Python would.
+
+Usage:
+
+    python benchmarks/breakpoints.py --steps 200000 --breakpoints 50
+"""
+
+import argparse
+import time
+
+from snapshot_restore import FLAGS_NAMES, REGISTER_NAMES, REGISTERS_SPEC
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core.asm_parser import AssemblyParser
+
+LOOP = "ADD r1, 0x1\nMOV [0x300], r1\nSUB r2, r1\nAND r2, 0xff\nJMP 0x0\n"
+
+
+def make_processor(breakpoints: int) -> BasicProcessor:
+    # the loop is followed by code which is never reached
+    source = LOOP + "ADD r3, 0x1\n" * breakpoints
+    processor = BasicProcessor(0x4000, REGISTERS_SPEC, FLAGS_NAMES)
+    processor.update_program(AssemblyParser.loads(source, REGISTER_NAMES))
+    return processor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=200_000)
+    parser.add_argument("--breakpoints", type=int, default=50)
+    args = parser.parse_args()
+    addresses = range(5, 5 + args.breakpoints)
+
+    def none(processor):
+        return processor.run(max_steps=args.steps)
+
+    def native(processor):
+        for address in addresses:
+            processor.breakpoints.add(address, "r3 == 1" if address % 2 else None)
+        return processor.run(max_steps=args.steps)
+
+    def callback(processor):
+        stops = set(addresses)
+        return processor.run(
+            max_steps=args.steps, until=lambda cpu: cpu.registers["pc"] in stops
+        )
+
+    for name, runner in (("none", none), ("native", native), ("callback", callback)):
+        processor = make_processor(args.breakpoints)
+        start = time.perf_counter()
+        steps = runner(processor)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<10} {steps / elapsed:>12,.0f} instructions/s")
+
+
+if __name__ == "__main__":
+    main()
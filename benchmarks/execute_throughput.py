@@ -0,0 +1,178 @@
+"""
+Instructions per second of BasicProcessor on a tight arithmetic loop.
+
+The ``dispatch`` mode reproduces the original execution loop, which looks up every
+instruction by name and resolves its operands from the parsed dictionaries. The
+``decoded`` mode runs the predecoded program through the `BasicProcessor.execute`
+generator, the ``batch`` mode through the `BasicProcessor.run` batch loop and the
+``translated`` mode through the batch loop with the hot blocks translated into
+Python functions.
+
+The ``dispatch`` mode runs on the current register file and memory, so it only
+shows the gain of the decoding. ``--reference`` points to a source tree of the
+original implementation, for example a worktree of the first commit, whose
+`BasicProcessor.execute` is then measured in a subprocess as the ``original`` mode
+and used as the baseline of the speedups.
+
+The original loop cannot execute jumps, so the loop body is unrolled into a
+straight-line program and the program counter is rewound after each pass.
+
+Usage:
+
+    git worktree add /tmp/xsim-original $(git rev-list --max-parents=0 HEAD)
+    python benchmarks/execute_throughput.py --reference /tmp/xsim-original --repeat 5
+"""
+
+import argparse
+import pickle
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core.asm_parser import AssemblyParser
+
+REGISTERS_SPEC = {
+    "memory_mapped": [0, 16],
+    "registers": [
+        {"name": "r0", "size": 2},
+        {"name": "r1", "size": 2},
+        {"name": "r2", "size": 2},
+        {"name": "r3", "size": 2},
+        {"name": "r4", "size": 2},
+        {"name": "r5", "size": 2},
+        {"name": "r6", "size": 2},
+        {"name": "r7", "size": 2},
+        {"name": "pc", "size": 2},
+        {"name": "sp", "size": 2},
+        {"name": "sreg", "size": 1},
+    ],
+}
+FLAGS_NAMES = ["I", "T", "H", "S", "V", "P", "Z", "C"]
+
+LOOP_BODY = [
+    "ADD r1, 0x1",
+    "SUB r2, 0x1",
+    "ADD r3, r1",
+    "MOV r4, r3",
+    "AND r4, 0xff",
+    "CMP r4, r2",
+]
+
+
+# measures the `execute` generator of the source tree given as argument
+REFERENCE = """
+import pickle, sys, time
+sys.path.insert(0, sys.argv[1])
+from xsim.components.basic.processor import BasicProcessor
+spec, flags_names, program, instructions = pickle.load(sys.stdin.buffer)
+processor = BasicProcessor(0x10000, spec, flags_names=flags_names)
+processor.update_program(program)
+executed = 0
+start = time.perf_counter()
+while executed < instructions:
+    processor.registers["pc"] = 0
+    executed += sum(1 for _ in processor.execute())
+print(executed / (time.perf_counter() - start))
+"""
+
+
+def parse_program(unroll: int) -> list:
+    return AssemblyParser.loads(
+        "\n".join(LOOP_BODY * unroll) + "\n",
+        register_names=[item["name"] for item in REGISTERS_SPEC["registers"]],
+    )
+
+
+def make_processor(unroll: int, translate_blocks: bool = False) -> BasicProcessor:
+    processor = BasicProcessor(0x10000, REGISTERS_SPEC, flags_names=FLAGS_NAMES)
+    if not translate_blocks:
+        processor.translator = None
+    processor.update_program(parse_program(unroll))
+    return processor
+
+
+def measure_reference(source: Path, instructions: int, unroll: int) -> float:
+    """Rate of the original implementation found in the `source` tree."""
+    arguments = (REGISTERS_SPEC, FLAGS_NAMES, parse_program(unroll), instructions)
+    result = subprocess.run(
+        [sys.executable, "-c", REFERENCE, str(source / "src")],
+        input=pickle.dumps(arguments),
+        capture_output=True,
+        check=True,
+    )
+    return float(result.stdout)
+
+
+def dispatch_execute(processor: BasicProcessor):
+    processor.pc = processor.registers.take("pc")
+    program_data = processor.program_data
+    while True:
+        current_address = processor.pc.get()
+        if current_address >= len(program_data):
+            break
+        instruction_data = program_data[processor.pc.get()]
+        processor.pc.set(current_address + 1)
+        instruction = processor.instruction_set.get_instruction(
+            instruction_data["name"]
+        )
+        instruction.execute(processor, **instruction_data["params"])
+        yield processor
+
+
+def decoded_execute(processor: BasicProcessor):
+    return processor.execute()
+
+
+def count_steps(executor) -> int:
+    return sum(1 for _ in executor)
+
+
+MODES = {
+    "dispatch": lambda processor: count_steps(dispatch_execute(processor)),
+    "decoded": lambda processor: count_steps(decoded_execute(processor)),
+    "batch": lambda processor: processor.run(),
+    "translated": lambda processor: processor.run(),
+}
+
+
+def measure(mode: str, instructions: int, unroll: int) -> float:
+    processor = make_processor(unroll, translate_blocks=mode == "translated")
+    executed = 0
+    start = time.perf_counter()
+    while executed < instructions:
+        processor.registers["pc"] = 0
+        executed += MODES[mode](processor)
+    return executed / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--instructions", type=int, default=200_000)
+    parser.add_argument("--unroll", type=int, default=100)
+    parser.add_argument("--modes", nargs="+", default=list(MODES))
+    parser.add_argument("--reference", type=Path, default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # the modes are measured in turn and keep their best round, so a slow period
+    # of the host does not favour one of them
+    rates = dict.fromkeys(args.modes, 0.0)
+    for _ in range(args.repeat):
+        for mode in args.modes:
+            rate = measure(mode, args.instructions, args.unroll)
+            rates[mode] = max(rates[mode], rate)
+
+    baseline = None
+    print(f"{'mode':<10} {'instructions/s':>16} {'speedup':>8}")
+    if args.reference is not None:
+        baseline = measure_reference(args.reference, args.instructions, args.unroll)
+        print(f"{'original':<10} {baseline:>16,.0f} {1:>7.2f}x")
+    for mode, rate in rates.items():
+        baseline = baseline or rate
+        print(f"{mode:<10} {rate:>16,.0f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Cost of computing the flags of an arithmetic result and updating the flags register.
+
+The ``original`` mode reproduces the previous computation, counting the bits of the
+result for the parity and rebuilding the flag masks from ``flags_mask`` every time.
+The ``tables`` mode uses the lookup tables of `xsim.core.const` and the masks
+precomputed by ``flags_masks``. The ``parity``
+line compares counting bits with a lookup in ``const.PARITY_U16`` on its own.
+
+Usage:
+
+    python benchmarks/flags_compute.py --repeat 200000
+"""
+
+import argparse
+import random
+import time
+
+from xsim.components.basic.instructions.arithmetic import ArithmeticInstructionSet
+from xsim.core import const
+
+FLAGS_NAMES = ["I", "T", "H", "S", "V", "P", "Z", "C"]
+
+
+class Context:
+    flags_mask = {flag: 2**i for i, flag in enumerate(reversed(FLAGS_NAMES))}
+    flags_masks = {}
+
+
+def original_flags_compute(result):
+    yield "S", result & const.SIGN_U16 != 0
+    yield "Z", result & const.MAX_U16 == 0
+    yield "P", bin(result & const.MAX_U16).count("1") % 2 == 0
+    yield "C", result > const.MAX_U16
+
+
+def original_flags_register(context, value, flags):
+    seated_flags = dict(flags)
+    mask_set, mask_cls = zip(
+        *[
+            (flag_mask, 0) if flag_name in seated_flags else (0, flag_mask)
+            for flag_name, flag_mask in context.flags_mask.items()
+        ]
+    )
+    return const.set_bits(const.mask(value, sum(mask_cls)), sum(mask_set))
+
+
+def original(context, results):
+    value = 0
+    for result in results:
+        value = original_flags_register(context, value, original_flags_compute(result))
+    return value
+
+
+def tables(context, results):
+    flags_compute = ArithmeticInstructionSet.flags_compute
+    flags_register = ArithmeticInstructionSet.compute_flags_register
+    value = 0
+    for result in results:
+        value = flags_register(context, value, flags_compute(result))
+    return value
+
+
+def parity_count(results):
+    return sum(bin(result & const.MAX_U16).count("1") % 2 == 0 for result in results)
+
+
+def parity_table(results):
+    table = const.PARITY_U16
+    return sum(table[result & const.MAX_U16] for result in results)
+
+
+def measure(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200_000)
+    args = parser.parse_args()
+
+    results = [random.randrange(-0x8000, 0x20000) for _ in range(args.repeat)]
+    context = Context()
+    assert original(context, results) == tables(context, results)
+    assert parity_count(results) == parity_table(results)
+
+    print(f"{'computation':<12} {'before':>10} {'tables':>10} {'speedup':>8}")
+    for name, before, after in (
+        (
+            "flags",
+            measure(original, context, results),
+            measure(tables, context, results),
+        ),
+        ("parity", measure(parity_count, results), measure(parity_table, results)),
+    ):
+        per_call = 1e9 / args.repeat
+        print(
+            f"{name:<12} {before * per_call:>8.0f}ns {after * per_call:>8.0f}ns"
+            f" {before / after:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Cost of stepping a processor backwards with a `Journal`.
+
+After running `--steps` instructions, ``back`` times `Journal.back` for several
+distances and ``rerun`` resets the processor and runs it again up to the same
+position, which is what going back costs without a journal. The recording overhead
+is shown by comparing the instructions per second with and without the journal.
+
+Usage:
+
+    python benchmarks/journal_back.py --steps 20000 --checkpoint-interval 1024
+"""
+
+import argparse
+import time
+
+from snapshot_restore import FLAGS_NAMES, REGISTER_NAMES, REGISTERS_SPEC
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core.asm_parser import AssemblyParser
+from xsim.core.journal import Journal
+
+SOURCE = (
+    "MOV sp, 0x700\nADD r2, 0x3\nMOV r4, r1\nADD r4, 0x100\nMOV [r4], r2\n"
+    "ADD r1, 0x2\nAND r1, 0xff\nPUSH r2\nPOP r3\nJMP 0x1\n"
+)
+
+
+def make_processor() -> BasicProcessor:
+    processor = BasicProcessor(2048, REGISTERS_SPEC, FLAGS_NAMES)
+    processor.update_program(AssemblyParser.loads(SOURCE, REGISTER_NAMES))
+    return processor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--checkpoint-interval", type=int, default=1024)
+    args = parser.parse_args()
+
+    processor = make_processor()
+    start = time.perf_counter()
+    processor.run(max_steps=args.steps)
+    plain = args.steps / (time.perf_counter() - start)
+
+    processor = make_processor()
+    journal = Journal(processor, checkpoint_interval=args.checkpoint_interval)
+    start = time.perf_counter()
+    processor.run(max_steps=args.steps)
+    recorded = args.steps / (time.perf_counter() - start)
+    print(f"run      {plain:>12,.0f} instructions/s")
+    print(f"journal  {recorded:>12,.0f} instructions/s, {journal.size:,} bytes")
+
+    other = make_processor()
+    for distance in (1, 10, 100, 1000, 10000):
+        if distance > journal.position:
+            break
+        start = time.perf_counter()
+        journal.back(distance)
+        back = time.perf_counter() - start
+        processor.run(max_steps=distance)
+
+        start = time.perf_counter()
+        other.reset()
+        other.run(max_steps=journal.position - distance)
+        rerun = time.perf_counter() - start
+        print(
+            f"back {distance:>6} {back * 1e6:>12,.1f}us   rerun {rerun * 1e6:>12,.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Per access lookup cost of the memory page table against an interval tree.
+
+``views`` times finding the sub views holding an address and ``limit`` the access
+limit of a two bytes access, on a memory with views restricted to one byte
+accesses. The interval tree columns reproduce the lookups of the implementation
+the page table replaced; `intervaltree` comes with the tests extra.
+
+Usage:
+
+    python benchmarks/memory_lookup.py --size 65536 --views 48
+"""
+
+import argparse
+import timeit
+
+import intervaltree
+from xsim.core.memory import Memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=64 * 1024)
+    parser.add_argument("--views", type=int, default=48)
+    parser.add_argument("--accesses", type=int, default=2000)
+    args = parser.parse_args()
+
+    memory = Memory(args.size)
+    sub_views = intervaltree.IntervalTree()
+    restricts = intervaltree.IntervalTree()
+    stride = args.size // args.views
+    for index in range(args.views):
+        address, size = index * stride + 100, stride * 2 // 3
+        memory_view = memory.view(address, size, restrict_access_at_time=1)
+        sub_views[address : address + size] = memory_view
+        restricts[address : address + size] = 1
+    addresses = [(index * 1361) % (args.size - 2) for index in range(args.accesses)]
+
+    def interval_limit(address):
+        bound = restricts.overlap(address, address + 2)
+        return min(bound.pop().data, 2) if bound else 2
+
+    lookups = {
+        "views": (
+            lambda address: list(memory.views_at(address)),
+            lambda address: list(sub_views[address]),
+        ),
+        "limit": (
+            lambda address: memory.get_limit_access_at_time(address, 2),
+            interval_limit,
+        ),
+    }
+    print(f"{'lookup':<8} {'pages':>10} {'interval tree':>14}")
+    for name, (paged, interval) in lookups.items():
+        costs = [
+            min(
+                timeit.repeat(
+                    lambda lookup=lookup: [lookup(address) for address in addresses],
+                    number=5,
+                    repeat=5,
+                )
+            )
+            / (5 * len(addresses))
+            for lookup in (paged, interval)
+        ]
+        print(f"{name:<8} {costs[0] * 1e6:>8.2f}us {costs[1] * 1e6:>12.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Parse throughput of the assembly parser for the available parser modes.
+
+Programs of the requested sizes are generated from a fixed instruction mix and
+parsed with each mode. The CYK engine is cubic in the program length, so it is
+only measured up to ``--cyk-max-lines``; bigger sizes are reported as skipped.
+
+Usage:
+
+    python benchmarks/parser_throughput.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from xsim.core.asm_parser import AssemblyParser
+
+REGISTER_NAMES = ["r0", "r1", "r2", "r3", "r4", "r5", "r6", "r7", "pc", "sp"]
+
+TEMPLATES = [
+    "MOV {reg}, {const}",
+    "MOV {reg}, {reg}",
+    "MOV [{reg}], {const}",
+    "MOV [{const}], {reg}",
+    "MOV [{reg} + {const}], {const}",
+    "ADD {reg}, {const}",
+    "SUB {reg}, {reg}",
+    "CMP {reg}, [{const}]",
+    "AND {reg}, {const}",
+    "JNE {const}",
+    "PUSH {reg}",
+    "POP {reg}",
+    "NOP",
+]
+
+
+def generate_program(lines: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    program = []
+    for _ in range(lines):
+        template = rng.choice(TEMPLATES)
+        program.append(
+            template.format(
+                reg=rng.choice(REGISTER_NAMES[:8]),
+                const=rng.choice(
+                    [str(rng.randint(1, 0xFFF)), hex(rng.randint(0, 0xFFFF))]
+                ),
+            )
+        )
+    return "\n".join(program) + "\n"
+
+
+def measure_construction(parser_mode: str) -> float:
+    AssemblyParser.Grammar._parsers.pop(parser_mode, None)
+    start = time.perf_counter()
+    AssemblyParser.Grammar.parser(parser_mode)
+    return time.perf_counter() - start
+
+
+def measure_parse(source: str, parser_mode: str) -> float:
+    start = time.perf_counter()
+    AssemblyParser.loads(source, register_names=REGISTER_NAMES, parser_mode=parser_mode)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--modes", nargs="+", default=["lalr", "cyk"])
+    parser.add_argument("--cyk-max-lines", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["XSIM_CACHE_DIR"] = cache_dir
+        print(f"{'mode':<6} {'construction':>14} {'cached':>10}")
+        for parser_mode in args.modes:
+            cold = measure_construction(parser_mode)
+            warm = measure_construction(parser_mode)
+            print(f"{parser_mode:<6} {cold * 1e3:>12.2f}ms {warm * 1e3:>8.2f}ms")
+        print()
+
+        print(f"{'mode':<6} {'lines':>8} {'seconds':>10} {'lines/s':>12}")
+        for parser_mode in args.modes:
+            sizes = args.sizes
+            if parser_mode == "cyk":
+                sizes = [args.cyk_max_lines, *sizes]
+            for lines in sizes:
+                if parser_mode == "cyk" and lines > args.cyk_max_lines:
+                    print(f"{parser_mode:<6} {lines:>8} {'skipped':>10}")
+                    continue
+                elapsed = measure_parse(generate_program(lines), parser_mode)
+                print(
+                    f"{parser_mode:<6} {lines:>8} {elapsed:>10.3f} "
+                    f"{lines / elapsed:>12.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
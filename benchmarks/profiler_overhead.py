@@ -0,0 +1,71 @@
+"""
+Overhead of `BasicProcessor.enable_profiling` on a program calling a routine.
+
+Usage:
+
+    python benchmarks/profiler_overhead.py --steps 100000 --repeat 15
+"""
+
+import argparse
+import statistics
+import time
+import typing
+
+from snapshot_restore import FLAGS_NAMES, REGISTER_NAMES, REGISTERS_SPEC
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core.asm_parser import AssemblyParser
+
+# the main loop calls a routine summing into the memory at every iteration
+SOURCE = (
+    "MOV sp, 0x700\nADD r1, 0x1\nCALL 0x6\nSUB r2, r1\nAND r2, 0xff\nJMP 0x1\n"
+    "MOV r3, [0x300]\nADD r3, r1\nMOV [0x300], r3\nXOR r4, r3\nSHR r4, 0x1\nRET\n"
+)
+
+
+def make_processor() -> BasicProcessor:
+    processor = BasicProcessor(2048, REGISTERS_SPEC, FLAGS_NAMES)
+    processor.update_program(AssemblyParser.loads(SOURCE, REGISTER_NAMES))
+    return processor
+
+
+def measure(mode: str, steps: int) -> float:
+    """Speed of a run on a fresh processor."""
+    processor = make_processor()
+    if mode != "plain":
+        processor.enable_profiling()
+    if mode == "disabled":
+        processor.disable_profiling()
+    start = time.perf_counter()
+    processor.run(max_steps=steps)
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    modes = ("plain", "profiled", "disabled")
+    speeds: typing.Dict[str, typing.List[float]] = {mode: [] for mode in modes}
+    overheads: typing.Dict[str, typing.List[float]] = {mode: [] for mode in modes}
+    # the modes are interleaved so that they see the same machine load, and the
+    # overheads are compared within every round
+    for _ in range(args.repeat):
+        for mode in modes:
+            speeds[mode].append(measure(mode, args.steps))
+        for mode in modes:
+            overheads[mode].append(speeds["plain"][-1] / speeds[mode][-1] - 1)
+    for mode in modes:
+        speed = max(speeds[mode])
+        overhead = statistics.median(overheads[mode])
+        print(f"{mode:<10} {speed:>12,.0f} instructions/s ({overhead:+.1%})")
+
+    processor = make_processor()
+    profiler = processor.enable_profiling()
+    processor.run(max_steps=args.steps)
+    print(profiler.collapsed(), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Load time of programs, parsed from source or from the compiled program cache.
+
+The ``parse`` mode parses the assembly source with Lark, the ``cached`` mode loads
+the compiled form written by the first `assembler.load` of the same source. The
+``install`` columns time putting the program in a processor, from the instructions
+loaded from the cache or from the path of the compiled file, whose instructions are
+copied without being decoded.
+
+Usage:
+
+    python benchmarks/program_loading.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import typing
+from pathlib import Path
+
+from parser_throughput import REGISTER_NAMES, generate_program
+from snapshot_restore import FLAGS_NAMES, REGISTERS_SPEC
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core import assembler
+
+
+def measure(path: Path, use_cache: bool) -> float:
+    start = time.perf_counter()
+    assembler.load(path, register_names=REGISTER_NAMES, use_cache=use_cache)
+    return time.perf_counter() - start
+
+
+def measure_install(path: Path) -> typing.Tuple[float, float]:
+    """Time to load the cached program into a processor, decoded and compiled."""
+    processor = BasicProcessor(0x10000, REGISTERS_SPEC, flags_names=FLAGS_NAMES)
+    compiled = assembler.cache_file(path.read_bytes(), REGISTER_NAMES)
+    start = time.perf_counter()
+    processor.update_program(assembler.load(path, register_names=REGISTER_NAMES))
+    decoded = time.perf_counter() - start
+    start = time.perf_counter()
+    processor.update_program(compiled)
+    return decoded, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["XSIM_CACHE_DIR"] = cache_dir
+        print(
+            f"{'lines':>8} {'parse':>10} {'cached':>10} {'speedup':>8}"
+            f" {'install decoded':>16} {'compiled':>10}"
+        )
+        for lines in args.sizes:
+            path = Path(cache_dir) / f"program-{lines}.s"
+            path.write_text(generate_program(lines))
+            parse = measure(path, use_cache=False)
+            measure(path, use_cache=True)
+            cached = measure(path, use_cache=True)
+            decoded, compiled = measure_install(path)
+            print(
+                f"{lines:>8} {parse:>9.3f}s {cached:>9.3f}s {parse / cached:>7.1f}x"
+                f" {decoded:>15.3f}s {compiled:>9.3f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Cost of forking runs from a warmed-up state.
+
+The program first runs a setup loop filling the memory, then the measured runs
+start from the state reached after the setup: ``snapshot`` and ``restore`` time
+`ProcessorBase.snapshot` and `ProcessorBase.restore`, ``setup`` times resetting the
+processor and executing the setup again.
+
+Usage:
+
+    python benchmarks/snapshot_restore.py --memory-size 65536 --setup-steps 5000
+"""
+
+import argparse
+import time
+
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core.asm_parser import AssemblyParser
+
+REGISTERS_SPEC = {
+    "memory_mapped": [0, 16],
+    "registers": [
+        {"name": "r0", "size": 2},
+        {"name": "r1", "size": 2},
+        {"name": "r2", "size": 2},
+        {"name": "r3", "size": 2},
+        {"name": "r4", "size": 2},
+        {"name": "r5", "size": 2},
+        {"name": "r6", "size": 2},
+        {"name": "r7", "size": 2},
+        {"name": "pc", "size": 2},
+        {"name": "sp", "size": 2},
+        {"name": "sreg", "size": 1},
+    ],
+}
+FLAGS_NAMES = ["I", "T", "H", "S", "V", "P", "Z", "C"]
+REGISTER_NAMES = [item["name"] for item in REGISTERS_SPEC["registers"]]
+
+# fills the memory from 0x100 with a counter, then the measured part starts at 0x6
+SOURCE = (
+    "MOV r1, 0x100\nADD r2, 0x3\nMOV [r1], r2\nADD r1, 0x2\nJMP 0x1\nHALT\n"
+    "ADD r3, r2\nJMP 0x6\n"
+)
+
+
+def measure(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--memory-size", type=int, default=0x10000)
+    parser.add_argument("--setup-steps", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    processor = BasicProcessor(args.memory_size, REGISTERS_SPEC, FLAGS_NAMES)
+    processor.update_program(AssemblyParser.loads(SOURCE, REGISTER_NAMES))
+
+    def setup():
+        processor.reset()
+        processor.run(max_steps=args.setup_steps)
+        processor.registers["pc"] = 6
+
+    setup()
+    snapshot = processor.snapshot()
+    results = {
+        "snapshot": measure(processor.snapshot, args.repeat),
+        "restore": measure(lambda: processor.restore(snapshot), args.repeat),
+        "setup": measure(setup, max(1, args.repeat // 100)),
+    }
+    print(f"snapshot of {len(snapshot):,} bytes")
+    for name, seconds in results.items():
+        print(f"{name:<10} {seconds * 1e6:>12,.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Cost of recording a run with `TraceWriter` and of seeking in the trace.
+
+``observed`` runs with an observer doing nothing, which disables the translated
+blocks as the trace writer does, ``traced`` records every instruction. The size of the
+trace per instruction and the time of `TraceReader` to read a record in the middle
+of the trace are also shown.
+
+Usage:
+
+    python benchmarks/trace_writer.py --steps 300000 --chunk-size 262144
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from profiler_overhead import make_processor
+from xsim.components.basic.trace import TraceReader, TraceWriter
+from xsim.core.processor import StepObserver
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=300_000)
+    parser.add_argument("--chunk-size", type=int, default=256 * 1024)
+    args = parser.parse_args()
+
+    processor = make_processor()
+    processor.observe(StepObserver())
+    start = time.perf_counter()
+    processor.run(max_steps=args.steps)
+    observed = args.steps / (time.perf_counter() - start)
+    print(f"observed   {observed:>12,.0f} instructions/s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "run.xtrace"
+        processor = make_processor()
+        start = time.perf_counter()
+        with TraceWriter(processor, path, chunk_size=args.chunk_size):
+            processor.run(max_steps=args.steps)
+        traced = args.steps / (time.perf_counter() - start)
+        print(f"traced     {traced:>12,.0f} instructions/s ({observed / traced:.1f}x)")
+        size = path.stat().st_size
+        print(f"size       {size:>12,} bytes ({size / args.steps:.2f} per instruction)")
+
+        start = time.perf_counter()
+        with TraceReader(path) as reader:
+            record = reader[len(reader) // 2]
+        elapsed = time.perf_counter() - start
+        print(f"seek       {elapsed * 1e3:>12.2f} ms to record {record.index}")
+
+
+if __name__ == "__main__":
+    main()
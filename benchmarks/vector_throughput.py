@@ -0,0 +1,114 @@
+"""
+Instructions per second of many instances of the same program.
+
+The ``scalar`` mode runs one `BasicProcessor` per instance with its batch loop and
+translated blocks, the ``vector`` mode runs every instance as a lane of a
+`VectorProcessor`. Each instance starts with its own random registers and branches
+on them, so the lanes do not all follow the same path.
+
+Usage:
+
+    python benchmarks/vector_throughput.py --lanes 1000 --steps 2000
+"""
+
+import argparse
+import functools
+import random
+import time
+
+from xsim.components.basic.processor import BasicProcessor
+from xsim.components.basic.vector import VectorProcessor
+from xsim.core.asm_parser import AssemblyParser
+
+REGISTERS_SPEC = {
+    "memory_mapped": [0, 16],
+    "registers": [
+        {"name": "r0", "size": 2},
+        {"name": "r1", "size": 2},
+        {"name": "r2", "size": 2},
+        {"name": "r3", "size": 2},
+        {"name": "r4", "size": 2},
+        {"name": "r5", "size": 2},
+        {"name": "r6", "size": 2},
+        {"name": "r7", "size": 2},
+        {"name": "pc", "size": 2},
+        {"name": "sp", "size": 2},
+        {"name": "sreg", "size": 1},
+    ],
+}
+FLAGS_NAMES = ["I", "T", "H", "S", "V", "P", "Z", "C"]
+REGISTER_NAMES = [item["name"] for item in REGISTERS_SPEC["registers"]]
+
+# the first jump goes to one of two loop bodies depending on the instance
+SOURCE = """
+JMP r5
+ADD r1, 0x1
+SUB r2, 0x1
+ADD r3, r1
+MOV r4, r3
+AND r4, 0xff
+CMP r4, r2
+JMP 0x1
+MUL r1, 0x3
+ADD r2, r1
+XOR r3, r2
+MOV [0x300], r3
+JMP 0x8
+"""
+
+
+def make_inputs(lanes: int):
+    return {
+        "r1": [random.randrange(0x100) for _ in range(lanes)],
+        "r2": [random.randrange(0x100) for _ in range(lanes)],
+        "r5": [random.choice((1, 8)) for _ in range(lanes)],
+    }
+
+
+def make_processor(program) -> BasicProcessor:
+    processor = BasicProcessor(0x10000, REGISTERS_SPEC, flags_names=FLAGS_NAMES)
+    processor.update_program(program)
+    return processor
+
+
+def run_scalar(program, inputs, lanes: int, steps: int) -> float:
+    processors = []
+    for lane in range(lanes):
+        processor = make_processor(program)
+        for name, values in inputs.items():
+            processor.registers[name] = values[lane]
+        processors.append(processor)
+    start = time.perf_counter()
+    for processor in processors:
+        processor.run(max_steps=steps)
+    return time.perf_counter() - start
+
+
+def run_vector(program, inputs, lanes: int, steps: int) -> float:
+    vector = VectorProcessor(lanes, functools.partial(make_processor, program))
+    for name, values in inputs.items():
+        vector.set_register(name, values)
+    start = time.perf_counter()
+    vector.run(max_steps=steps)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lanes", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--mode", choices=["scalar", "vector", "all"], default="all")
+    args = parser.parse_args()
+
+    program = AssemblyParser.loads(SOURCE.lstrip(), REGISTER_NAMES)
+    inputs = make_inputs(args.lanes)
+    runners = {"scalar": run_scalar, "vector": run_vector}
+    modes = list(runners) if args.mode == "all" else [args.mode]
+    instructions = args.lanes * args.steps
+    for mode in modes:
+        elapsed = runners[mode](program, inputs, args.lanes, args.steps)
+        print(f"{mode:<8} {instructions / elapsed:>14,.0f} instructions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ import nox
 
 @nox.session(python=["3.10", "3.11", "3.12"], venv_backend="uv")
 def tests(session):
-    session.install("-e", ".[dev]")
+    session.install("-e", ".[dev,tests]")
     session.run(
         "coverage",
         "run",
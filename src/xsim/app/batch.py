@@ -0,0 +1,237 @@
+"""
+Batch runner executing many jobs, programs with their configuration and initial
+memory, across a pool of worker processes.
+
+Every worker keeps the processors it created, one per configuration and version of
+the program file, and the parsed programs: a job running the same program as a previous one resets
+the processor instead of building it again, keeping its decoded instructions and
+translated blocks. A line of JSON is printed per job, in the order of the jobs, with
+the fields of `xsim-run` and whether the processor was reused.
+
+The jobs file is a JSON list of objects with a ``program`` path and optionally
+``config`` values overriding the configuration, the ``memory`` to write before
+running as hexadecimal bytes by address, and ``max_steps``.
+
+Usage:
+
+    xsim-batch --config config.json --jobs jobs.json --workers 4
+    xsim-batch --config config.json program.s other.s --max-steps 100000
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import copy
+import dataclasses
+import functools
+import json
+import os
+import sys
+import typing
+from pathlib import Path
+
+from xsim.app.cli import RunOptions, parse_range, run_processor
+from xsim.app.config import AppConfiguration
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core import assembler
+
+
+@dataclasses.dataclass
+class Job:
+    """A program to run with a configuration and an initial memory."""
+
+    config: dict
+    program_path: typing.Optional[str] = None
+    memory: typing.Dict[int, bytes] = dataclasses.field(default_factory=dict)
+    max_steps: typing.Optional[int] = None
+    memory_ranges: typing.List[typing.Tuple[int, int]] = dataclasses.field(
+        default_factory=list
+    )
+    full_memory: bool = False
+
+
+class Worker:
+    """
+    Runs jobs in the current process, keeping the `max_processors` most recently
+    used processors and the parsed programs between jobs.
+    """
+
+    def __init__(self, max_processors: int = 16):
+        self.max_processors = max_processors
+        self.programs: typing.Dict[tuple, typing.List[dict]] = {}
+        # least recently used first
+        self.processors: typing.OrderedDict[
+            tuple, typing.Tuple[AppConfiguration, BasicProcessor]
+        ] = collections.OrderedDict()
+
+    @staticmethod
+    def program_stamp(path: str) -> typing.Optional[typing.Tuple[int, int]]:
+        """Modification time and size of a program file, None when it is missing."""
+        try:
+            stat = Path(path).stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load_program(self, path: str, register_names: typing.List[str]) -> list:
+        """Parsed program, read again when the file changed."""
+        key = (
+            str(Path(path).resolve()),
+            self.program_stamp(path),
+            tuple(register_names),
+        )
+        if key not in self.programs:
+            self.programs[key] = assembler.load(path, register_names=register_names)
+        return self.programs[key]
+
+    def processor(
+        self, job: Job
+    ) -> typing.Tuple[AppConfiguration, BasicProcessor, bool]:
+        """Returns the processor of the job, reset when it is reused."""
+        data = dict(job.config)
+        if job.program_path:
+            data["program_path"] = job.program_path
+        # a processor holds the program it was created with, it is not reused once
+        # the file changed
+        stamp = None
+        if not data.get("program"):
+            stamp = self.program_stamp(
+                data.get("program_path", AppConfiguration.program_path)
+            )
+        key = (json.dumps(data, sort_keys=True), stamp)
+        if key in self.processors:
+            self.processors.move_to_end(key)
+            config, processor = self.processors[key]
+            processor.reset()
+            return config, processor, True
+
+        # the configuration updates the registers spec in place
+        data = copy.deepcopy(data)
+        registers = data.get("registers_spec", {}).get("registers") or []
+        if registers and not data.get("program"):
+            data["program"] = self.load_program(
+                data.get("program_path", AppConfiguration.program_path),
+                [item["name"] for item in registers],
+            )
+        config = AppConfiguration(**data)
+        processor = config.create_processor()
+        config.map_devices(processor)
+        if len(self.processors) >= self.max_processors:
+            self.processors.popitem(last=False)
+        self.processors[key] = config, processor
+        return config, processor, False
+
+    def run(self, job: Job) -> dict:
+        try:
+            config, processor, warm = self.processor(job)
+            for address, values in job.memory.items():
+                processor.memory.write_block(address, values)
+            report = run_processor(
+                config,
+                processor,
+                RunOptions(
+                    max_steps=job.max_steps,
+                    memory_ranges=job.memory_ranges,
+                    full_memory=job.full_memory,
+                ),
+            )
+        except Exception as exc:
+            return {
+                "program": job.program_path,
+                "error": f"{type(exc).__name__}: {exc}",
+            }
+        report["warm"] = warm
+        return report
+
+
+@functools.cache
+def process_worker() -> Worker:
+    """The worker of the current process."""
+    return Worker()
+
+
+def run_job(job: Job) -> dict:
+    return process_worker().run(job)
+
+
+def run_jobs(
+    jobs: typing.Sequence[Job], workers: typing.Optional[int] = None
+) -> typing.List[dict]:
+    """
+    Runs the jobs in a pool of `workers` processes, one per processor by default,
+    and returns their reports in the order of the jobs. With `workers` set to 0 the
+    jobs run in the current process.
+
+    Consecutive jobs are sent to the same worker, so jobs sharing a program should
+    follow each other.
+    """
+    if workers == 0:
+        worker = Worker()
+        return [worker.run(job) for job in jobs]
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_job, jobs, chunksize=chunksize))
+
+
+def load_jobs(path: str, config: dict) -> typing.List[Job]:
+    """Reads a jobs file, the job values override the configuration `config`."""
+    jobs = []
+    for item in json.loads(Path(path).read_text()):
+        jobs.append(
+            Job(
+                config={**config, **item.get("config", {})},
+                program_path=item.get("program"),
+                memory={
+                    int(address, 0): bytes.fromhex(values)
+                    for address, values in item.get("memory", {}).items()
+                },
+                max_steps=item.get("max_steps"),
+            )
+        )
+    return jobs
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="xsim-batch", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument("programs", nargs="*", help="programs run as single jobs")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--jobs", help="JSON file listing the jobs")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="defaults to the processors count"
+    )
+    parser.add_argument("--max-steps", type=int, default=None)
+    parser.add_argument(
+        "--memory",
+        type=parse_range,
+        action="append",
+        default=[],
+        metavar="START:SIZE",
+        help="memory range to dump, defaults to the video memory",
+    )
+    parser.add_argument("--full-memory", action="store_true")
+    args = parser.parse_args(argv)
+
+    config = json.loads(Path(args.config).read_text())
+    jobs = load_jobs(args.jobs, config) if args.jobs else []
+    jobs += [Job(config, program_path) for program_path in args.programs]
+    if not jobs:
+        jobs = [Job(config)]
+    for job in jobs:
+        if job.max_steps is None:
+            job.max_steps = args.max_steps
+        job.memory_ranges = args.memory
+        job.full_memory = args.full_memory
+
+    failed = False
+    for report in run_jobs(jobs, args.workers):
+        failed = failed or "error" in report
+        print(json.dumps(report), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Headless runner executing programs without any user interface.
+
+Every program is run with the configuration of the simulator and a line of JSON is
+printed per program, with the executed instructions, the wall time, the
+throughput and the final state of the registers and memory.
+
+Usage:
+
+    xsim-run --config config.json program.s other.s --max-steps 1000000
+
+With `--profile` the line also holds the profile of the run, see
+`BasicProcessor.enable_profiling`, its `stacks` are in the collapsed format of the
+flame graph tools. With `--instrument` it holds the host time spent per subsystem of
+the interpreter, see `BasicProcessor.enable_instrumentation`, which is also printed
+as a table on the standard error. With `--trace DIRECTORY` every executed instruction
+is recorded in a trace file, read with `xsim.components.basic.trace.TraceReader`.
+"""
+
+import argparse
+import dataclasses
+import hashlib
+import json
+import sys
+import time
+import typing
+from pathlib import Path
+
+from xsim.app.config import AppConfiguration
+from xsim.components.basic.instrumentation import format_report
+from xsim.components.basic.processor import BasicProcessor
+from xsim.components.basic.trace import TraceWriter
+
+
+def parse_range(value: str) -> typing.Tuple[int, int]:
+    """Parses a `START:SIZE` memory range, numbers can be decimal or hexadecimal."""
+    start, _, size = value.partition(":")
+    try:
+        return int(start, 0), int(size or "1", 0)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid memory range: {value}") from None
+
+
+@dataclasses.dataclass
+class RunOptions:
+    """What a run records and reports besides the final registers and memory."""
+
+    max_steps: typing.Optional[int] = None
+    # memory ranges to dump, the video memory by default
+    memory_ranges: typing.Sequence[typing.Tuple[int, int]] = ()
+    full_memory: bool = False
+    profile: bool = False
+    instrument: bool = False
+    # file recording every instruction
+    trace: typing.Optional[Path] = None
+
+
+def run_program(
+    config: AppConfiguration, options: typing.Optional[RunOptions] = None
+) -> dict:
+    processor = config.create_processor()
+    config.map_devices(processor)
+    return run_processor(config, processor, options)
+
+
+def run_processor(
+    config: AppConfiguration,
+    processor: BasicProcessor,
+    options: typing.Optional[RunOptions] = None,
+) -> dict:
+    """
+    Runs a processor created from the configuration and reports its final state,
+    recording every instruction in the file `options.trace` if given.
+    """
+    options = options or RunOptions()
+    max_steps, trace = options.max_steps, options.trace
+    if options.profile:
+        processor.enable_profiling()
+    if options.instrument:
+        processor.enable_instrumentation()
+    start = time.perf_counter()
+    try:
+        if trace is not None:
+            with TraceWriter(processor, trace):
+                instructions = processor.run(max_steps=max_steps)
+        else:
+            instructions = processor.run(max_steps=max_steps)
+    finally:
+        instrumentation = processor.disable_instrumentation()
+    wall_time = time.perf_counter() - start
+    profiler = processor.disable_profiling()
+
+    memory = processor.memory
+    ranges = list(options.memory_ranges) or [
+        (config.video_memory_location, config.video_memory_size)
+    ]
+    if options.full_memory:
+        ranges = [(0, memory.size)]
+    report = {
+        "program": config.program_path,
+        "instructions": instructions,
+        "stop_reason": processor.stop_reason,
+        "wall_time": wall_time,
+        "mips": instructions / wall_time / 1e6 if wall_time else 0.0,
+        "registers": {
+            name: processor.registers[name] for name in config.register_names
+        },
+        "memory": {
+            "sha256": hashlib.sha256(memory.data).hexdigest(),
+            "dump": {
+                hex(address): memory.read_block(address, size).hex()
+                for address, size in ranges
+            },
+        },
+    }
+    if profiler is not None:
+        report["profile"] = profiler.report()
+    if instrumentation is not None:
+        report["instrumentation"] = instrumentation.report()
+    if trace is not None:
+        report["trace"] = str(trace)
+    return report
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="xsim-run", description=__doc__.strip().splitlines()[0]
+    )
+    parser.add_argument("programs", nargs="*", help="defaults to the config program")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--max-steps", type=int, default=None)
+    parser.add_argument(
+        "--memory",
+        type=parse_range,
+        action="append",
+        default=[],
+        metavar="START:SIZE",
+        help="memory range to dump, defaults to the video memory",
+    )
+    parser.add_argument("--full-memory", action="store_true")
+    parser.add_argument(
+        "--profile", action="store_true", help="adds the profile of every run"
+    )
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        help="adds and prints the host time per subsystem of every run",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="DIRECTORY",
+        help="records every instruction of a program in DIRECTORY/<program>.xtrace, "
+        "DIRECTORY is created if needed",
+    )
+    args = parser.parse_args(argv)
+    if args.trace:
+        try:
+            Path(args.trace).mkdir(parents=True, exist_ok=True)
+        except OSError as exc:
+            parser.error(f"--trace: {exc}")
+
+    failed = False
+    for program_path in args.programs or [None]:
+        overrides = {"program_path": program_path} if program_path else {}
+        try:
+            config = AppConfiguration.load(args.config, **overrides)
+            trace = None
+            if args.trace:
+                trace = Path(args.trace) / f"{Path(config.program_path).stem}.xtrace"
+            report = run_program(
+                config,
+                RunOptions(
+                    max_steps=args.max_steps,
+                    memory_ranges=args.memory,
+                    full_memory=args.full_memory,
+                    profile=args.profile,
+                    instrument=args.instrument,
+                    trace=trace,
+                ),
+            )
+            if args.instrument:
+                print(
+                    f"{config.program_path}\n"
+                    + format_report(report["instrumentation"]),
+                    file=sys.stderr,
+                )
+        except Exception as exc:
+            failed = True
+            report = {"program": program_path, "error": f"{type(exc).__name__}: {exc}"}
+        print(json.dumps(report), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
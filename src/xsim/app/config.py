@@ -0,0 +1,169 @@
+import dataclasses
+import json
+import typing
+from pathlib import Path
+
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core import assembler, memory
+
+
+class AppConstrains:
+    MEMORY_MULTIPLE = 1024
+    MEMORY_KB_LIMIT = 64
+    CLOCK_SPEED_LIMIT = 10_000_000
+    FRAME_RATE = 30
+
+
+@dataclasses.dataclass
+class AppConfiguration:
+    memory_size: int = 2048
+    registers_spec: dict = dataclasses.field(default_factory=dict)
+    flags_names: list = dataclasses.field(default_factory=list)
+    video_memory_size: int = 300
+    video_memory_location: int = 0x100
+    video_memory_w_size: int = 30
+    video_memory_h_size: int = 10
+    keyboard_memory_location: int = 0xFF
+    # the code is kept out of the memory unless given an address in it
+    code_address: typing.Optional[int] = None
+    clock_speed: int = 1
+    program_path: str = "program.s"
+    program: list = dataclasses.field(default_factory=list)
+    register_names: list = dataclasses.field(default_factory=list)
+
+    def __post_init__(self):
+        self.validate_memory_size()
+        self.validate_video_memory()
+        self.validate_kb_memory()
+        self.validate_code_address()
+        self.validate_registers_spec()
+        self.validate_clock_speed()
+        self.validate_flags_names()
+        self.set_default_memory_mapped_registers()
+        self.augment_fields()
+
+    def augment_fields(self):
+        self.register_names = [
+            item["name"] for item in self.registers_spec["registers"]
+        ]
+        # a program given with the configuration was already parsed
+        if not self.program:
+            self.program = assembler.load(
+                self.program_path, register_names=self.register_names
+            )
+
+    def validate_clock_speed(self):
+        if self.clock_speed < 0:
+            raise ValueError("Clock speed must be a positive integer")
+
+        if self.clock_speed > AppConstrains.CLOCK_SPEED_LIMIT:
+            raise ValueError(
+                f"Clock speed must be less than {AppConstrains.CLOCK_SPEED_LIMIT}"
+            )
+
+    def validate_memory_size(self):
+        constrains = AppConstrains
+
+        if self.memory_size < 0:
+            raise ValueError("Memory size must be a positive integer")
+
+        size_kb, remainder = divmod(self.memory_size, constrains.MEMORY_MULTIPLE)
+        if remainder:
+            raise ValueError("Memory size must be a multiple of 1024")
+
+        if size_kb > constrains.MEMORY_KB_LIMIT:
+            raise ValueError("Memory size must be less than 64KB")
+
+    def validate_kb_memory(self):
+        if self.keyboard_memory_location < 0:
+            raise ValueError("Keyboard memory location must be a positive integer")
+        if self.keyboard_memory_location + 1 > self.memory_size:
+            raise ValueError("Keyboard memory location must be within memory size")
+
+    def validate_code_address(self):
+        if self.code_address is None:
+            return
+        if self.code_address < 0:
+            raise ValueError("Code address must be a positive integer")
+        if self.code_address >= self.memory_size:
+            raise ValueError("Code address must be within memory size")
+
+    def validate_code_range(self, processor: BasicProcessor):
+        """Checks that the code loaded in memory leaves room for the devices."""
+        if not processor.code_in_memory:
+            return
+        start = processor.code.offset
+        stop = start + processor.code.size
+        devices = {
+            "video memory": (self.video_memory_location, self.video_memory_size),
+            "keyboard memory": (self.keyboard_memory_location, 1),
+        }
+        for device, (address, size) in devices.items():
+            if address < stop and start < address + size:
+                raise ValueError(f"Program overlaps the {device}")
+
+    def validate_video_memory(self):
+        if self.video_memory_size < 0:
+            raise ValueError("Video memory size must be a positive integer")
+
+        if self.video_memory_location < 0:
+            raise ValueError("Video memory location must be a positive integer")
+
+        if self.video_memory_w_size < 0:
+            raise ValueError("Video memory width size must be a positive integer")
+
+        if self.video_memory_h_size < 0:
+            raise ValueError("Video memory height size must be a positive integer")
+
+        if self.video_memory_size < self.video_memory_w_size * self.video_memory_h_size:
+            raise ValueError("Video memory size must be greater than width * height")
+
+        if self.video_memory_location + self.video_memory_size > self.memory_size:
+            raise ValueError("Video memory location must be within memory size")
+
+    def validate_registers_spec(self):
+        if not self.registers_spec:
+            raise ValueError("Registers spec must be provided")
+
+        if not self.registers_spec.get("registers"):
+            raise ValueError("Registers must be provided")
+
+    def validate_flags_names(self):
+        if not self.flags_names:
+            raise ValueError("Flags names must be provided")
+
+    def set_default_memory_mapped_registers(self):
+        if not self.registers_spec.get("memory_mapped"):
+            self.registers_spec["memory_mapped"] = [0, 0]
+
+    def create_processor(self) -> BasicProcessor:
+        processor = BasicProcessor(
+            rom_size=self.memory_size,
+            registers_spec=self.registers_spec,
+            flags_names=self.flags_names,
+            code_address=self.code_address,
+        )
+        processor.update_program(self.program)
+        self.validate_code_range(processor)
+        return processor
+
+    def map_devices(
+        self, processor: BasicProcessor
+    ) -> typing.Tuple[memory.MemoryView, memory.MemoryView]:
+        """Creates the video and keyboard memory views of the processor."""
+        video_memory = processor.memory.view(
+            address=self.video_memory_location,
+            size=self.video_memory_size,
+            restrict_access_at_time=1,
+        )
+        kb_memory = processor.memory.view(
+            address=self.keyboard_memory_location,
+            restrict_access_at_time=1,
+        )
+        return video_memory, kb_memory
+
+    @classmethod
+    def load(cls, path: str, **overrides):
+        data = json.loads(Path(path).read_text())
+        data.update(overrides)
+        return cls(**data)
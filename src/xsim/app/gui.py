@@ -1,6 +1,3 @@
-import contextlib
-import dataclasses
-import json
 import typing
 from pathlib import Path
 
@@ -13,122 +10,9 @@ from textual.widget import Widget
 from textual.widgets import Footer, Input, Label, TextArea
 from textual.widgets.text_area import Selection
 
+from xsim.app.config import AppConfiguration, AppConstrains
 from xsim.components.basic.processor import BasicProcessor
-from xsim.core import asm_parser, memory, processor
-
-
-class AppConstrains:
-    MEMORY_MULTIPLE = 1024
-    MEMORY_KB_LIMIT = 64
-    CLOCK_SPEED_LIMIT = 100
-
-
-@dataclasses.dataclass
-class AppConfiguration:
-    memory_size: int = 2048
-    registers_spec: dict = dataclasses.field(default_factory=dict)
-    flags_names: list = dataclasses.field(default_factory=list)
-    video_memory_size: int = 300
-    video_memory_location: int = 0x100
-    video_memory_w_size: int = 30
-    video_memory_h_size: int = 10
-    keyboard_memory_location: int = 0xFF
-    clock_speed: int = 1
-    program_path: str = "program.s"
-    program: list = dataclasses.field(default_factory=list)
-    register_names: list = dataclasses.field(default_factory=list)
-
-    def __post_init__(self):
-        self.validate_memory_size()
-        self.validate_video_memory()
-        self.validate_kb_memory()
-        self.validate_registers_spec()
-        self.validate_clock_speed()
-        self.validate_flags_names()
-        self.set_default_memory_mapped_registers()
-        self.augment_fields()
-
-    def augment_fields(self):
-        self.register_names = [
-            item["name"] for item in self.registers_spec["registers"]
-        ]
-        for _ in range(2):
-            try:
-                self.program = asm_parser.AssemblyParser.load(
-                    self.program_path, register_names=self.register_names
-                )
-                break
-            except Exception as exc:
-                last_exc = exc
-                continue
-        if not self.program:
-            raise last_exc
-            # raise ValueError("Program path must be valid")
-
-    def validate_clock_speed(self):
-        if self.clock_speed < 0:
-            raise ValueError("Clock speed must be a positive integer")
-
-        if self.clock_speed > AppConstrains.CLOCK_SPEED_LIMIT:
-            raise ValueError("Clock speed must be less than 100")
-
-    def validate_memory_size(self):
-        constrains = AppConstrains
-
-        if self.memory_size < 0:
-            raise ValueError("Memory size must be a positive integer")
-
-        size_kb, remainder = divmod(self.memory_size, constrains.MEMORY_MULTIPLE)
-        if remainder:
-            raise ValueError("Memory size must be a multiple of 1024")
-
-        if size_kb > constrains.MEMORY_KB_LIMIT:
-            raise ValueError("Memory size must be less than 64KB")
-
-    def validate_kb_memory(self):
-        if self.keyboard_memory_location < 0:
-            raise ValueError("Keyboard memory location must be a positive integer")
-        if self.keyboard_memory_location + 1 > self.memory_size:
-            raise ValueError("Keyboard memory location must be within memory size")
-
-    def validate_video_memory(self):
-        if self.video_memory_size < 0:
-            raise ValueError("Video memory size must be a positive integer")
-
-        if self.video_memory_location < 0:
-            raise ValueError("Video memory location must be a positive integer")
-
-        if self.video_memory_w_size < 0:
-            raise ValueError("Video memory width size must be a positive integer")
-
-        if self.video_memory_h_size < 0:
-            raise ValueError("Video memory height size must be a positive integer")
-
-        if self.video_memory_size < self.video_memory_w_size * self.video_memory_h_size:
-            raise ValueError("Video memory size must be greater than width * height")
-
-        if self.video_memory_location + self.video_memory_size > self.memory_size:
-            raise ValueError("Video memory location must be within memory size")
-
-    def validate_registers_spec(self):
-        if not self.registers_spec:
-            raise ValueError("Registers spec must be provided")
-
-        if not self.registers_spec.get("registers"):
-            raise ValueError("Registers must be provided")
-
-    def validate_flags_names(self):
-        if not self.flags_names:
-            raise ValueError("Flags names must be provided")
-
-    def set_default_memory_mapped_registers(self):
-        if not self.registers_spec.get("memory_mapped"):
-            self.registers_spec["memory_mapped"] = [0, 0]
-
-    @classmethod
-    def load(cls, path: str):
-        data = json.loads(Path(path).read_text())
-        return cls(**data)
+from xsim.core import clock, journal, memory
 
 
 class KeyboardComponent(Widget):
@@ -179,7 +63,9 @@ class KeyboardComponent(Widget):
 
         if self.read_cursor == -1:
             self.read_cursor = 0
-            self.memory_map.write(0, self.buffer[self.cursor])
+            # the processor runs in the clock thread, its hooks see the write
+            with self.app.resource.clock.lock:
+                self.memory_map.write(0, self.buffer[self.cursor])
 
         self.preview = self.buffer.decode("utf-8")
         label = self.query_one(Label)
@@ -192,6 +78,7 @@ class DisplayComponent(Widget):
         content-align: center middle;
     }
     """
+    MAX_FPS = 30
 
     def __init__(
         self,
@@ -204,37 +91,52 @@ class DisplayComponent(Widget):
         self.w_size, self.h_size = screen_size
         self.memory_size = self.w_size * self.h_size
         self.fill(" ")
-        self.memory.on_write(self.trigger_update)
+        self.dirty = memory.DirtyTracker(self.memory, self.w_size)
+        self.screen_lines = [
+            self.render_line_text(row) for row in range(self.dirty.rows_count)
+        ]
 
     def fill(self, value: str):
-        for i in range(self.memory_size):
-            self.memory.write(i, value.encode("utf-8")[0])
+        self.memory.fill(0, self.memory_size, value.encode("utf-8")[0])
+
+    def on_mount(self) -> None:
+        self.set_interval(1 / self.MAX_FPS, self.trigger_update)
 
     def trigger_update(self, *args, **kwargs) -> None:
+        # writes between two frames are coalesced, only the written rows are decoded
+        if not self.dirty.dirty:
+            return
+        for row in self.dirty.collect():
+            self.screen_lines[row] = self.render_line_text(row)
         self.refresh()
 
+    def render_line_text(self, row: int) -> str:
+        start = row * self.w_size
+        return (
+            self.memory.mv[start : start + self.w_size]
+            .tobytes()
+            .decode("utf-8", errors="replace")
+        )
+
     def render(self) -> str:
-        stream = self.memory.mv.tobytes().decode("utf-8")
-        screen_lines = [
-            stream[i : i + self.w_size] for i in range(0, len(stream), self.w_size)
-        ]
         return "".join(
             [
                 "/" + "-" * self.w_size + "\\\n|",
-                "|\n|".join(screen_lines),
+                "|\n|".join(self.screen_lines),
                 "|\n\\" + "-" * self.w_size + "/",
             ]
         )
 
 
 class Simulator(App):
-    class Execute(Message):
+    class Stopped(Message):
         pass
 
     class Resource:
         program: typing.List[dict]
         processor: BasicProcessor
-        execute: typing.Optional[typing.Callable]
+        clock: clock.ProcessorClock
+        journal: journal.Journal
         config: AppConfiguration
         video_memory: memory.MemoryView
         kb_memory: memory.MemoryView
@@ -243,32 +145,30 @@ class Simulator(App):
         super().__init__(**kwargs)
         self.resource = self.Resource()
         self.resource.program = config.program
-        self.resource.processor = BasicProcessor(
-            rom_size=config.memory_size,
-            registers_spec=config.registers_spec,
-            flags_names=config.flags_names,
-        )
-        self.resource.execute = None
+        self.resource.processor = config.create_processor()
         self.resource.config = config
         self.setup_simulator()
+        # the devices are mapped first so the journal starts from their state
+        self.resource.journal = journal.Journal(self.resource.processor)
+        self.resource.clock = clock.ProcessorClock(
+            self.resource.processor,
+            frequency=config.clock_speed,
+            on_stop=lambda _: self.post_message(self.Stopped()),
+        )
+        self.resource.clock.journal = self.resource.journal
 
     def setup_simulator(self):
-        self.resource.processor.update_program(self.resource.program)
-        self.resource.video_memory = self.resource.processor.memory.view(
-            address=self.resource.config.video_memory_location,
-            size=self.resource.config.video_memory_size,
-            restrict_access_at_time=1,
-        )
-        self.resource.kb_memory = self.resource.processor.memory.view(
-            address=self.resource.config.keyboard_memory_location,
-            restrict_access_at_time=1,
+        self.resource.video_memory, self.resource.kb_memory = (
+            self.resource.config.map_devices(self.resource.processor)
         )
 
     BINDINGS = [
         ("r", "run", "RUN/STOP"),
         ("s", "step", "step"),
-        # ("b", "back", "breakpoint"),
-        # ("c", "forward", "continue"),
+        ("b", "back", "back"),
+        ("c", "continue", "continue"),
+        ("t", "toggle_breakpoint", "breakpoint"),
+        ("i", "instrument", "instrument"),
     ]
     CSS_PATH = Path(__file__).parent / "gui.tcss"
     current_line = reactive(0)
@@ -297,39 +197,75 @@ class Simulator(App):
         yield Footer()
 
     def action_step(self) -> None:
-        if self.resource.execute is None:
-            self.resource.execute = self.resource.processor.execute()
-        self.post_message(self.Execute())
+        if self.resource.clock.running:
+            return
+        self.resource.clock.step()
+        self.show_current_line()
+
+    def action_back(self) -> None:
+        if self.resource.clock.running:
+            return
+        if not self.resource.clock.back():
+            self.notify("No earlier state in the history")
+        # restoring a checkpoint does not go through the memory hooks
+        self.query_one(DisplayComponent).dirty.mark_all()
+        self.show_current_line()
+
+    def action_continue(self) -> None:
+        # runs without the clock speed limit up to the next breakpoint
+        if not self.resource.clock.running:
+            self.resource.clock.resume(full_speed=True)
+
+    def action_toggle_breakpoint(self) -> None:
+        line = self.query_one(TextArea).cursor_location[0]
+        with self.resource.clock.lock:
+            added = self.resource.processor.breakpoints.toggle(line)
+        self.notify(f"Breakpoint {'set' if added else 'removed'} at line {line}")
+
+    def action_instrument(self) -> None:
+        # the first press starts measuring the interpreter, the next one reports
+        with self.resource.clock.lock:
+            processor = self.resource.processor
+            if processor.instrumentation is None:
+                processor.enable_instrumentation()
+                report = None
+            else:
+                report = processor.disable_instrumentation().format_report()
+        self.notify(report or "Measuring the interpreter", timeout=10 if report else 3)
 
     def action_run(self) -> None:
-        if self.resource.execute is None:
-            self.resource.execute = self.resource.processor.execute()
-            self.process_clock.resume()
+        if not self.resource.clock.running:
+            self.resource.clock.resume()
         else:
-            self.process_clock.pause()
-            self.resource.execute = None
-            self.current_line = 0
-            text = self.query_one(TextArea)
-            text.selection = Selection((self.current_line, 0), (self.current_line, 0))
-
-    def on_simulator_execute(self, message: Execute) -> None:
-        if self.resource.execute is None:
-            return
-        with contextlib.suppress(StopIteration):
-            processor_state: processor.ProcessorBase = next(self.resource.execute)
-            self.current_line = processor_state.pc.get()
-            text = self.query_one(TextArea)
-            text.selection = Selection((self.current_line, 0), (self.current_line, 0))
+            self.resource.clock.pause()
+            self.show_current_line()
+
+    def on_simulator_stopped(self, message: Stopped) -> None:
+        if self.resource.clock.error is not None:
+            self.notify(str(self.resource.clock.error), severity="error")
+        elif self.resource.processor.stop_reason == "watchpoint":
+            kind, address = self.resource.processor.breakpoints.hit
+            self.notify(f"Watchpoint: {kind} at {address:#x}")
+        self.show_current_line()
+
+    def show_current_line(self) -> None:
+        line = self.resource.processor.registers["pc"]
+        if line == self.current_line:
             return
-        self.resource.execute = None
+        self.current_line = line
+        text = self.query_one(TextArea)
+        text.selection = Selection((self.current_line, 0), (self.current_line, 0))
 
     def on_mount(self) -> None:
-        def process_tick():
-            self.post_message(self.Execute())
+        # the processor runs in the clock thread, the interface only samples it
+        self.set_interval(1 / AppConstrains.FRAME_RATE, self.sample)
 
-        self.process_clock = self.set_interval(
-            1 / self.resource.config.clock_speed, process_tick, pause=True
-        )
+    def sample(self) -> None:
+        if self.resource.clock.running:
+            self.show_current_line()
+
+    def on_unmount(self) -> None:
+        self.resource.clock.stop()
 
 
 def main():
@@ -1,3 +1,7 @@
+import functools
+import itertools
+import typing
+
 from xsim.core import const, processor
 
 from .base import BaseInstruction
@@ -5,15 +9,66 @@ from .base import BaseInstruction
 
 class ArithmeticInstructionSet(BaseInstruction):
     @classmethod
-    def arithmetic_compute(cls, context, source, destination): ...
+    def result_compute(cls, source, destination): ...
+
+    @classmethod
+    def arithmetic_compute(cls, context, source, destination):
+        result = cls.result_compute(source, destination)
+        yield result & const.MAX_U16
+        yield from cls.flags_compute(result)
 
     @classmethod
     def flags_compute(cls, result):
-        yield "S", result & const.SIGN_U16 != 0
-        yield "Z", result & const.MAX_U16 == 0
-        yield "P", const.parity(result & const.MAX_U16)
+        flags = const.SZP_U16[result & const.MAX_U16]
+        yield "S", flags & const.FLAG_S != 0
+        yield "Z", flags & const.FLAG_Z != 0
+        yield "P", flags & const.FLAG_P != 0
         yield "C", result > const.MAX_U16
 
+    @classmethod
+    def flags_masks(cls, context: processor.ProcessorBase) -> typing.Tuple[int, int]:
+        """
+        Masks clearing and setting the flags register for the flags reported by
+        `flags_compute`, computed once per instruction class and processor.
+        """
+        masks = context.flags_masks.get(cls)
+        if masks is None:
+            flags_mask = context.flags_mask
+            mask_set = 0
+            for flag_name, _ in cls.flags_compute(0):
+                mask_set |= flags_mask.get(flag_name, 0)
+            masks = context.flags_masks[cls] = (
+                sum(flags_mask.values()) & ~mask_set,
+                mask_set,
+            )
+        return masks
+
+    @classmethod
+    def compute_flags_register(
+        cls, context: processor.ProcessorBase, value: int, flags
+    ) -> int:
+        """
+        Value of the flags register `value` once updated with the given flags: the
+        reported flags are set, the other flags are kept and the remaining bits
+        cleared. The flags of an instruction always report the same names, so the
+        masks are the precomputed `flags_masks`.
+        """
+        mask_cls, mask_set = cls.flags_masks(context)
+        return value & mask_cls | mask_set
+
+    @classmethod
+    def update_flags_register(
+        cls, context: processor.ProcessorBase, value: int, result: int
+    ) -> int:
+        """Value of the flags register `value` once updated with the flags of the
+        unmasked `result`."""
+        return cls.compute_flags_register(context, value, cls.flags_compute(result))
+
+    @classmethod
+    def update_flags(cls, context: processor.ProcessorBase, flags):
+        flag_reg = context.registers.take("SREG")
+        flag_reg.set(cls.compute_flags_register(context, flag_reg.get(), flags))
+
     @classmethod
     def execute(
         cls, context: processor.ProcessorBase, destination, source=None, **kwargs
@@ -24,25 +79,7 @@ class ArithmeticInstructionSet(BaseInstruction):
             context, source_op_value, destination_op_value
         )
 
-        seated_flags = dict(flags)
-
-        mask_set, mask_cls = zip(
-            *[
-                (flag_mask, 0) if flag_name in seated_flags else (0, flag_mask)
-                for flag_name, flag_mask in context.flags_mask.items()
-            ]
-        )
-
-        flag_reg = context.registers.take("SREG")
-        flag_reg.set(
-            const.set_bits(
-                const.mask(
-                    flag_reg.get(),
-                    sum(mask_cls),
-                ),
-                sum(mask_set),
-            )
-        )
+        cls.update_flags(context, flags)
 
         if "read_only" in kwargs and kwargs["read_only"]:
             return
@@ -55,76 +92,95 @@ class ArithmeticInstructionSet(BaseInstruction):
         else:
             context.memory.write(destination_op_value, result)
 
+    @classmethod
+    def decode(
+        cls, context: processor.ProcessorBase, destination, source=None, **kwargs
+    ):
+        read_only = kwargs.get("read_only", False)
+        store = cls.decode_destination(context, *destination)
+        if store is None and not read_only:
+            return super().decode(context, destination=destination, source=source)
+
+        get_source = (
+            cls.decode_operand(context, *source)
+            if source
+            else itertools.repeat(0).__next__
+        )
+        get_destination = cls.decode_operand(context, *destination)
+        result_compute = cls.result_compute
+        defer_flags = context.registers.take("SREG").defer
+        update_flags = functools.partial(cls.update_flags_register, context)
+
+        def handler():
+            # the flags are computed from the result when the flags register is
+            # read, as many times as it is restored (see `Journal`)
+            result = result_compute(get_source(), get_destination())
+            defer_flags(update_flags, result)
+            if not read_only:
+                store(result & const.MAX_U16)
+
+        return handler
+
 
 class Cmp(ArithmeticInstructionSet):
     instruction_name = "CMP"
 
     @classmethod
-    def arithmetic_compute(cls, context, source, destination):
-        result = destination - source
-        yield result & const.MAX_U16
-        yield from cls.flags_compute(result)
+    def result_compute(cls, source, destination):
+        return destination - source
 
     @classmethod
     def execute(cls, context: processor.ProcessorBase, source, destination):
         super().execute(context, source, destination, read_only=True)
 
+    @classmethod
+    def decode(cls, context: processor.ProcessorBase, source, destination):
+        return super().decode(context, source, destination, read_only=True)
+
 
 class Add(ArithmeticInstructionSet):
     instruction_name = "ADD"
 
     @classmethod
-    def arithmetic_compute(cls, context, source, destination, carry=False):
-        result = source + destination + int(carry)
-        yield result & const.MAX_U16
-        yield from cls.flags_compute(result)
+    def result_compute(cls, source, destination, carry=False):
+        return source + destination + int(carry)
 
 
 class Sub(ArithmeticInstructionSet):
     instruction_name = "SUB"
 
     @classmethod
-    def arithmetic_compute(cls, context, source, destination, carry=False):
-        result = destination - source - int(carry)
-        yield result & const.MAX_U16
-        yield from cls.flags_compute(result)
+    def result_compute(cls, source, destination, carry=False):
+        return destination - source - int(carry)
 
 
 class Mul(ArithmeticInstructionSet):
     instruction_name = "MUL"
 
     @classmethod
-    def arithmetic_compute(cls, context, source, destination):
-        result = source * destination
-        yield result & const.MAX_U16
-        yield from cls.flags_compute(result)
+    def result_compute(cls, source, destination):
+        return source * destination
 
 
 class Div(ArithmeticInstructionSet):
     instruction_name = "DIV"
 
     @classmethod
-    def arithmetic_compute(cls, context, source, destination):
-        result = destination // source
-        yield result & const.MAX_U16
-        yield from cls.flags_compute(result)
+    def result_compute(cls, source, destination):
+        return destination // source
 
 
 class Inc(ArithmeticInstructionSet):
     instruction_name = "INC"
 
     @classmethod
-    def arithmetic_compute(cls, context, source, destination):
-        result = destination + 1
-        yield result & const.MAX_U16
-        yield from cls.flags_compute(result)
+    def result_compute(cls, source, destination):
+        return destination + 1
 
 
 class Dec(ArithmeticInstructionSet):
     instruction_name = "DEC"
 
     @classmethod
-    def arithmetic_compute(cls, context, source, destination):
-        result = destination - 1
-        yield result & const.MAX_U16
-        yield from cls.flags_compute(result)
+    def result_compute(cls, source, destination):
+        return destination - 1
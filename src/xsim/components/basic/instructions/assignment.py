@@ -23,9 +23,23 @@ class Mov(BaseInstruction):
 
         raise ValueError(f"Unknown destination type: {destination_type}")
 
+    @classmethod
+    def decode(cls, context: processor.ProcessorBase, source, destination):
+        store = cls.decode_destination(context, *destination)
+        if store is None:
+            return super().decode(context, source=source, destination=destination)
+
+        get_value = cls.decode_operand(context, *source)
+
+        def handler():
+            store(get_value())
+
+        return handler
+
 
 class Db(BaseInstruction):
     instruction_name = "DB"
+    accesses_memory = True
 
     @classmethod
     def execute(cls, context: processor.ProcessorBase, destination, source):
@@ -38,9 +52,7 @@ class Db(BaseInstruction):
             return
 
         if source_type == "STRING" and isinstance(source, str):
-            source = source.encode("utf-8")
-            for offset, byte in enumerate(source):
-                context.memory.write(address + offset, byte)
+            context.memory.write_block(address, source.encode("utf-8"))
             return
 
         raise ValueError(f"Incorrect source type: {source} ({type(source)})")
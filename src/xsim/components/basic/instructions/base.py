@@ -1,3 +1,5 @@
+import functools
+import itertools
 import typing
 
 from xsim.core import instruction, processor
@@ -8,6 +10,11 @@ class BaseInstruction(
 ):
     """Simple instruction set."""
 
+    # hints for the block translator: instructions transferring the control end a
+    # basic block, instructions accessing the memory may run memory hooks
+    ends_block = False
+    accesses_memory = False
+
     @classmethod
     def compute_require_size(
         cls, context: processor.ProcessorBase, operand_type, operand_value
@@ -41,6 +48,75 @@ class BaseInstruction(
 
         raise ValueError(f"Unknown operand type: {operand_type}")
 
+    @classmethod
+    def decode(
+        cls, context: processor.ProcessorBase, **kwargs
+    ) -> typing.Callable[[], None]:
+        """
+        Bind the instruction and its operands to a processor.
+
+        The returned handler runs the instruction without looking it up by name or
+        unpacking its operands again. Instructions that do not specialise the
+        decoding are bound to `execute`.
+        """
+        return functools.partial(cls.execute, context, **kwargs)
+
+    @classmethod
+    def decode_operand(
+        cls,
+        context: processor.ProcessorBase,
+        operand_type: str,
+        operand_value: typing.Union[str, int, tuple],
+    ) -> typing.Callable[[], typing.Optional[int]]:
+        """Build a getter returning what `resolve_operand` would for the operand."""
+        if operand_type == "CONST":
+            return itertools.repeat(operand_value).__next__
+
+        if operand_type == "REG":
+            return context.registers.getter(operand_value)
+
+        if operand_type == "ADDR":
+            address_type, address_value = operand_value
+            read = context.memory.read
+            if address_type == "CONST":
+                return functools.partial(read, address_value, 1)
+            if address_type == "REG":
+                get_address = context.registers.getter(address_value)
+
+                def read_at_register():
+                    # the register value is both the address and the access size,
+                    # as computed by `compute_require_size`
+                    address = get_address()
+                    return read(address, address)
+
+                return read_at_register
+
+        return functools.partial(
+            cls.resolve_operand, context, operand_type, operand_value
+        )
+
+    @classmethod
+    def decode_destination(
+        cls,
+        context: processor.ProcessorBase,
+        destination_type: str,
+        destination_value: typing.Union[str, tuple],
+    ) -> typing.Optional[typing.Callable[[int], None]]:
+        """Build a setter storing a result in a register or a 2 bytes memory word."""
+        if destination_type == "REG":
+            return context.registers.setter(destination_value)
+
+        if destination_type == "ADDR":
+            get_address = cls.decode_operand(context, *destination_value)
+            write = context.memory.write
+
+            def write_at_address(value):
+                write(get_address(), value, 2)
+
+            return write_at_address
+
+        return None
+
 
 class Nop(BaseInstruction):
     instruction_name = "NOP"
@@ -52,6 +128,7 @@ class Nop(BaseInstruction):
 
 class Halt(BaseInstruction):
     instruction_name = "HALT"
+    ends_block = True
 
     @staticmethod
     def execute(context: processor.ProcessorBase, **kwargs):
@@ -19,6 +19,21 @@ class BitwiseInstructionSet(BaseInstruction):
             address = cls.resolve_operand(context, *destination[1])
             context.memory.write(address, result, 2)
 
+    @classmethod
+    def decode(cls, context: processor.ProcessorBase, source, destination):
+        store = cls.decode_destination(context, *destination)
+        if store is None:
+            return super().decode(context, source=source, destination=destination)
+
+        get_source = cls.decode_operand(context, *source)
+        get_destination = cls.decode_operand(context, *destination)
+        compute_result = cls.compute_result
+
+        def handler():
+            store(compute_result(context, get_source(), get_destination()))
+
+        return handler
+
 
 class And(BitwiseInstructionSet):
     instruction_name = "AND"
@@ -4,6 +4,8 @@ from .base import BaseInstruction
 
 
 class JumpInstruction(BaseInstruction):
+    ends_block = True
+
     @classmethod
     def check_condition(cls, context: processor.ProcessorBase): ...
 
@@ -13,6 +15,19 @@ class JumpInstruction(BaseInstruction):
             address_value = cls.resolve_operand(context, *address)
             context.registers["PC"] = address_value
 
+    @classmethod
+    def decode(cls, context: processor.ProcessorBase, destination):
+        # the parser names a single operand "destination", here it is the target
+        check_condition = cls.check_condition
+        get_address = cls.decode_operand(context, *destination)
+        set_pc = context.registers.setter("PC")
+
+        def handler():
+            if check_condition(context):
+                set_pc(get_address())
+
+        return handler
+
 
 class Jmp(JumpInstruction):
     instruction_name = "JMP"
@@ -5,6 +5,8 @@ from .base import BaseInstruction
 
 class Call(BaseInstruction):
     instruction_name = "CALL"
+    ends_block = True
+    accesses_memory = True
 
     @classmethod
     def execute(cls, context: processor.ProcessorBase, destination):
@@ -13,11 +15,40 @@ class Call(BaseInstruction):
         context.memory.write(context.registers["SP"], context.registers["PC"], 2)
         context.registers["PC"] = address_value
 
+    @classmethod
+    def decode(cls, context: processor.ProcessorBase, destination):
+        get_address = cls.decode_operand(context, *destination)
+        get_sp, set_sp = context.registers.getter("SP"), context.registers.setter("SP")
+        get_pc, set_pc = context.registers.getter("PC"), context.registers.setter("PC")
+        write = context.memory.write
+
+        def handler():
+            address_value = get_address()
+            set_sp(get_sp() - 2)
+            write(get_sp(), get_pc(), 2)
+            set_pc(address_value)
+
+        return handler
+
 
 class Ret(BaseInstruction):
     instruction_name = "RET"
+    ends_block = True
+    accesses_memory = True
 
     @classmethod
     def execute(cls, context: processor.ProcessorBase):
         context.registers["PC"] = context.memory.read(context.registers["SP"], 2)
         context.registers["SP"] += 2
+
+    @classmethod
+    def decode(cls, context: processor.ProcessorBase):
+        get_sp, set_sp = context.registers.getter("SP"), context.registers.setter("SP")
+        set_pc = context.registers.setter("PC")
+        read = context.memory.read
+
+        def handler():
+            set_pc(read(get_sp(), 2))
+            set_sp(get_sp() + 2)
+
+        return handler
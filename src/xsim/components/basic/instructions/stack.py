@@ -5,6 +5,7 @@ from .base import BaseInstruction
 
 class Push(BaseInstruction):
     instruction_name = "PUSH"
+    accesses_memory = True
 
     @classmethod
     def execute(cls, context: processor.ProcessorBase, source):
@@ -14,9 +15,24 @@ class Push(BaseInstruction):
         context.registers["SP"] -= 2
         context.memory.write(context.registers["SP"], value, 2)
 
+    @classmethod
+    def decode(cls, context: processor.ProcessorBase, destination):
+        # the parser names a single operand "destination", here it is the pushed value
+        get_value = cls.decode_operand(context, *destination)
+        get_sp, set_sp = context.registers.getter("SP"), context.registers.setter("SP")
+        write = context.memory.write
+
+        def handler():
+            value = get_value()
+            set_sp(get_sp() - 2)
+            write(get_sp(), value, 2)
+
+        return handler
+
 
 class Pop(BaseInstruction):
     instruction_name = "POP"
+    accesses_memory = True
 
     @classmethod
     def execute(cls, context: processor.ProcessorBase, destination):
@@ -29,3 +45,19 @@ class Pop(BaseInstruction):
             return
 
         raise ValueError(f"Unknown destination type: {destination_type}")
+
+    @classmethod
+    def decode(cls, context: processor.ProcessorBase, destination):
+        destination_type, destination_value = destination
+        if destination_type != "REG":
+            return super().decode(context, destination=destination)
+
+        set_value = context.registers.setter(destination_value)
+        get_sp, set_sp = context.registers.getter("SP"), context.registers.setter("SP")
+        read = context.memory.read
+
+        def handler():
+            set_value(read(get_sp(), 2))
+            set_sp(get_sp() + 2)
+
+        return handler
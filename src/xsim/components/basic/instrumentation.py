@@ -0,0 +1,173 @@
+import time
+import typing
+
+# subsystems of the interpreter and the functions measured for each of them, found
+# on the class of the processor, its memory or registers, or of an instruction given
+# by name; the callables returned by the "factory" functions are measured instead
+SUBSYSTEMS: typing.Dict[str, typing.List[typing.Tuple[str, str, str]]] = {
+    "fetch": [("processor", "fetch", "call")],
+    "decode": [("processor", "decode_instruction", "call")],
+    "operands": [
+        ("MOV", "resolve_operand", "call"),
+        ("MOV", "decode_operand", "factory"),
+        ("MOV", "decode_destination", "factory"),
+    ],
+    "memory hooks": [
+        ("memory", "on_write_hook", "call"),
+        ("memory", "on_read_hook", "call"),
+        ("memory", "on_hook", "call"),
+        ("memory", "on_range_hook", "call"),
+    ],
+    "registers": [
+        ("registers", "take", "call"),
+        ("registers", "__getitem__", "call"),
+        ("registers", "__setitem__", "call"),
+        ("registers", "getter", "factory"),
+        ("registers", "setter", "factory"),
+    ],
+    "flags": [("ADD", "compute_flags_register", "call")],
+}
+
+
+class Instrumentation:
+    """
+    Measures the host time spent by the subsystems of the interpreter, see
+    `BasicProcessor.enable_instrumentation`.
+
+    While enabled, the functions of `SUBSYSTEMS` are replaced on their classes by
+    wrappers counting the calls and their time, so the instrumentation applies to
+    every processor of the process and only one can be enabled at a time. The time
+    of a call excludes the time of the measured calls it makes, so the times of the
+    subsystems add up, and the rest of the time they were enabled is reported as
+    `other`: the instruction handlers, the run loop and the translated blocks.
+    """
+
+    active: typing.Optional["Instrumentation"] = None
+
+    def __init__(self, target, subsystems: typing.Optional[typing.List[str]] = None):
+        self.processor = target
+        self.subsystems = list(subsystems or SUBSYSTEMS)
+        unknown = set(self.subsystems) - set(SUBSYSTEMS)
+        if unknown:
+            raise ValueError(f"Unknown subsystems: {', '.join(sorted(unknown))}")
+        self.calls = [0] * len(self.subsystems)
+        self.times = [0] * len(self.subsystems)
+        # time of the measured calls made by the call being measured
+        self.children = 0
+        self.wall_time = 0
+        self.started: typing.Optional[int] = None
+        self.originals: typing.List[typing.Tuple[typing.Any, str, typing.Any]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.started is not None
+
+    def owner(self, owner: str, name: str) -> type:
+        """The class defining the function, which may be a base class."""
+        if owner == "processor":
+            cls = type(self.processor)
+        elif owner == "memory":
+            cls = type(self.processor.memory.root)
+        elif owner == "registers":
+            cls = type(self.processor.registers)
+        else:
+            cls = self.processor.instruction_set.get_instruction(owner)
+        return next(base for base in cls.__mro__ if name in base.__dict__)
+
+    def timed(self, index: int, function: typing.Callable) -> typing.Callable:
+        calls, times = self.calls, self.times
+        clock = time.perf_counter_ns
+
+        def measured(*args, **kwargs):
+            outer, self.children = self.children, 0
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                times[index] += elapsed - self.children
+                calls[index] += 1
+                self.children = outer + elapsed
+
+        return measured
+
+    def measured_factory(self, index: int, factory: typing.Callable) -> typing.Callable:
+        def measured_factory(*args, **kwargs):
+            built = factory(*args, **kwargs)
+            return built if built is None else self.timed(index, built)
+
+        return measured_factory
+
+    def enable(self):
+        """Replaces the measured functions and starts the clock."""
+        if self.enabled:
+            return
+        if Instrumentation.active is not None:
+            raise RuntimeError("Another instrumentation is enabled")
+        Instrumentation.active = self
+        for index, subsystem in enumerate(self.subsystems):
+            for owner_name, name, kind in SUBSYSTEMS[subsystem]:
+                owner = self.owner(owner_name, name)
+                original = owner.__dict__[name]
+                wrap = self.timed if kind == "call" else self.measured_factory
+                if isinstance(original, classmethod):
+                    replacement = classmethod(wrap(index, original.__func__))
+                else:
+                    replacement = wrap(index, original)
+                self.originals.append((owner, name, original))
+                setattr(owner, name, replacement)
+        self.started = time.perf_counter_ns()
+
+    def disable(self):
+        """Restores the measured functions and stops the clock."""
+        if not self.enabled:
+            return
+        self.wall_time += time.perf_counter_ns() - self.started
+        self.started = None
+        for owner, name, original in reversed(self.originals):
+            setattr(owner, name, original)
+        self.originals.clear()
+        Instrumentation.active = None
+
+    def reset(self):
+        """Clears the counts and times, the clock restarts if enabled."""
+        self.calls[:] = [0] * len(self.subsystems)
+        self.times[:] = [0] * len(self.subsystems)
+        self.wall_time = 0
+        if self.enabled:
+            self.started = time.perf_counter_ns()
+
+    def report(self) -> dict:
+        """Calls and host seconds per subsystem, as JSON serializable data."""
+        wall_time = self.wall_time
+        if self.enabled:
+            wall_time += time.perf_counter_ns() - self.started
+        subsystems = {
+            subsystem: {"calls": calls, "seconds": elapsed / 1e9}
+            for subsystem, calls, elapsed in zip(
+                self.subsystems, self.calls, self.times
+            )
+        }
+        subsystems["other"] = {
+            "calls": 0,
+            "seconds": max(wall_time - sum(self.times), 0) / 1e9,
+        }
+        return {"seconds": wall_time / 1e9, "subsystems": subsystems}
+
+    def format_report(self) -> str:
+        return format_report(self.report())
+
+
+def format_report(report: dict) -> str:
+    """An instrumentation report as a table, the subsystems taking most time first."""
+    total = report["seconds"] or 1.0
+    lines = [f"{'subsystem':<14}{'calls':>12}{'seconds':>12}{'share':>8}"]
+    for subsystem, entry in sorted(
+        report["subsystems"].items(), key=lambda item: -item[1]["seconds"]
+    ):
+        lines.append(
+            f"{subsystem:<14}{entry['calls']:>12,}{entry['seconds']:>12.6f}"
+            f"{entry['seconds'] / total:>8.1%}"
+        )
+    lines.append(f"{'total':<14}{'':>12}{report['seconds']:>12.6f}")
+    return "\n".join(lines) + "\n"
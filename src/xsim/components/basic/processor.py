@@ -1,34 +1,471 @@
+import bisect
+import functools
+import itertools
+import sys
+import typing
+from pathlib import Path
+
 from xsim.components.basic.instructions import BaseInstruction
-from xsim.core import asm_parser, processor
+from xsim.components.basic.instrumentation import Instrumentation
+from xsim.components.basic.profiler import CountedMemory, Profiler
+from xsim.components.basic.translator import BlockTranslator
+from xsim.core import asm_parser, assembler, memory, processor
+from xsim.core.breakpoints import Breakpoints
+
+# code addresses below this limit fit in the two bytes entries of the code table
+SHORT_TABLE_LIMIT = 0x10000
 
 
 class BasicProcessor(processor.ProcessorBase):
-    def __init__(self, rom_size: int, registers_spec: dict, flags_names):
+    """
+    Processor running programs stored in its memory.
+
+    `update_program` encodes the instructions in `code_memory`: a memory of its own
+    by default, out of reach of the program, or the main memory at `code_address`,
+    where the program can read and rewrite its code. The code starts with a table
+    holding the address of every instruction, indexed by the program counter,
+    followed by the encoded instructions (see `assembler.encode_instruction`).
+    Instructions are decoded the first time they are executed and the decoded
+    handlers are cached in `program`; a write to a page of the code drops the
+    handlers of the instructions on that page, so programs can modify themselves.
+
+    Batch runs translate the hot basic blocks of the program into Python functions
+    (see `BlockTranslator`), set `translator` to None to interpret every instruction.
+    """
+
+    def __init__(
+        self,
+        rom_size: int,
+        registers_spec: dict,
+        flags_names,
+        code_address: typing.Optional[int] = None,
+    ):
         super().__init__(rom_size, registers_spec, flags_names=flags_names)
-        self.program_data = []
+        self.program: typing.List[typing.Callable[[], None]] = []
         self.instruction_set = BaseInstruction()
+        self.breakpoints = Breakpoints(self)
+        self.profiler: typing.Optional[Profiler] = None
+        self.instrumentation: typing.Optional[Instrumentation] = None
+        self.translator: typing.Optional[BlockTranslator] = BlockTranslator(self)
+        self.code_address = code_address
+        self.code_memory = memory.Memory(0, self.memory.endianess)
+        self.code: typing.Optional[memory.MemoryView] = None
+        self.code_offsets: typing.List[int] = []
+        # bytes of the code as loaded, restored by `reset`
+        self.code_image = b""
+        self.code_table_width = 2
+        self.opcodes = self.instruction_set.get_opcodes()
+        self.opcode_names = list(self.opcodes)
+        self.register_names = list(self.registers.resisters)
+        self.register_indices = {
+            name: index for index, name in enumerate(self.register_names)
+        }
+
+    def register_index(self, name: str) -> int:
+        if name not in self.register_indices:
+            raise ValueError(f"Register {name} not found in {self.register_names}")
+        return self.register_indices[name]
+
+    def opcode_index(self, name: str) -> int:
+        if name not in self.opcodes:
+            raise ValueError(f"Unknown instruction: {name}")
+        return self.opcodes[name]
+
+    def encode_instruction(self, instruction_data: dict) -> bytearray:
+        encoded = bytearray()
+        assembler.encode_instruction(
+            instruction_data,
+            self.opcode_index(instruction_data["name"]),
+            self.register_index,
+            encoded,
+        )
+        return encoded
 
     def update_program(self, program_data):
-        self.program_data = program_data
+        """
+        Loads the instructions of a program, given as parsed instructions or as the
+        path of a compiled program. The instructions of a compiled program are copied
+        from the memory mapped file into the code, without decoding them.
+        """
+        if isinstance(program_data, (str, Path)):
+            starts, stream = assembler.load_code(
+                program_data, self.opcode_index, self.register_index
+            )
+        else:
+            encoded = [self.encode_instruction(item) for item in program_data]
+            starts = list(itertools.accumulate(map(len, encoded), initial=0))[:-1]
+            stream = b"".join(encoded)
+        count = len(starts)
+        code_address = self.code_address
+        if code_address is None:
+            code_address = 0
+            limit = count * 2 + len(stream)
+        else:
+            limit = self.memory.size
+        width = 2 if limit <= SHORT_TABLE_LIMIT else 4
+        table_size = count * width
+        code_size = table_size + len(stream)
+        if self.code_address is None:
+            code_memory = memory.Memory(code_size, self.memory.endianess)
+        else:
+            self.validate_code_range(code_address, code_size)
+            code_memory = self.memory.root
 
-    def execute_instruction(self, instruction_data):
+        offsets = [code_address + table_size + start for start in starts]
+        table = b"".join(
+            offset.to_bytes(width, self.memory.endianess) for offset in offsets
+        )
+
+        if self.code is not None:
+            for kind, callback in list(self.code.callbacks):
+                self.code.unsubscribe(callback, kind)
+        self.code = None
+        self.code_memory = code_memory
+        self.code_table_width = width
+        self.code_image = table + stream
+        code_memory.write_block(code_address, self.code_image)
+        self.code_offsets = offsets + [code_address + code_size]
+        if code_size:
+            self.code = code_memory.view(code_address, code_size)
+            self.code.on_write(functools.partial(self.on_code_write, self.code))
+        # every address starts with the trampoline decoding the instruction the first
+        # time it is executed and replacing itself with the decoded handler
+        self.program[:] = [self.decode_current] * count
+        if self.translator is not None:
+            self.translator.reset(count)
+        if self.profiler is not None:
+            self.profiler.resize(count)
+
+    def reset(self):
+        """
+        Restores the state following `update_program`, so the processor can run the
+        program again: the memory is cleared except for the code and the registers
+        get their default values. The decoded handlers and translated blocks are
+        kept, unless the program rewrote its code.
+        """
+        data = self.memory.mv
+        start = stop = 0
+        if self.code_in_memory:
+            start, stop = self.code.offset, self.code.offset + self.code.size
+        data[:start] = bytes(start)
+        data[stop:] = bytes(self.memory.size - stop)
+        code = self.code
+        if code is not None and code.mv != self.code_image:
+            # the write hook reads the table again and drops every handler
+            self.code_memory.write_block(code.offset, self.code_image)
+        super().reset()
+
+    def restore_memory(self, data: memoryview):
+        code = self.code
+        if not self.code_in_memory:
+            super().restore_memory(data)
+            return
+        stop = code.offset + code.size
+        rewritten = data[code.offset : stop] != self.memory.mv[code.offset : stop]
+        super().restore_memory(data)
+        if rewritten:
+            # as for a write of the whole code, the table is read again
+            self.on_code_write(code, 0, data[code.offset : stop])
+
+    @property
+    def code_in_memory(self) -> bool:
+        """Whether the code is in the main memory, at `code_address`."""
+        return self.code is not None and self.code_memory is self.memory.root
+
+    def validate_code_range(self, address: int, size: int):
+        if address < 0 or address + size > self.memory.size:
+            raise ValueError(
+                f"Program of {size} bytes does not fit in memory at {address}"
+            )
+        registers_memory = self.registers.memory
+        if isinstance(registers_memory, memory.MemoryView) and (
+            address < registers_memory.offset + registers_memory.size
+            and registers_memory.offset < address + size
+        ):
+            raise ValueError("Program overlaps the memory mapped registers")
+
+    @property
+    def program_data(self) -> typing.List[dict]:
+        """Instructions of the program as currently found in memory."""
+        return [self.fetch(address) for address in range(len(self.program))]
+
+    def fetch(self, address: int) -> dict:
+        """Decodes the instruction at a program address from the memory."""
+        reader = assembler.ProgramReader(self.code_memory.mv)
+        reader.position = self.code_offsets[address]
+        return reader.instruction(self.opcode_names, self.register_names)
+
+    def on_code_write(self, code: memory.MemoryView, address: int, values):
+        if code is not self.code:
+            return
+        start = code.offset + address
+        stop = start + max(len(values), 1)
+        if start < code.offset + len(self.program) * self.code_table_width:
+            # the table was rewritten, every instruction may have moved
+            table = self.code_memory.read_block(
+                code.offset, len(self.program) * self.code_table_width
+            )
+            width = self.code_table_width
+            self.code_offsets[:-1] = [
+                int.from_bytes(table[index : index + width], self.code_memory.endianess)
+                for index in range(0, len(table), width)
+            ]
+            self.invalidate(0, len(self.program))
+            return
+
+        offsets = self.code_offsets
+        if offsets != sorted(offsets):
+            # the rewritten table no longer follows the code, drop every handler
+            self.invalidate(0, len(self.program))
+            return
+
+        # instructions sharing a page with the written bytes are decoded again
+        page_start = start >> memory.PAGE_BITS << memory.PAGE_BITS
+        page_stop = ((stop - 1) >> memory.PAGE_BITS) + 1 << memory.PAGE_BITS
+        first = max(bisect.bisect_right(offsets, page_start) - 1, 0)
+        last = min(bisect.bisect_left(offsets, page_stop), len(self.program))
+        self.invalidate(first, last)
+
+    def enable_profiling(
+        self, regions: typing.Optional[typing.Dict[str, typing.Tuple[int, int]]] = None
+    ) -> Profiler:
+        """
+        Starts counting the executed instructions, the memory accesses per region,
+        by default the mapped registers, the code and the rest of the memory, and the
+        calls. The memory is replaced by a `CountedMemory` and the instructions are
+        decoded again, so the runs only pay for the profiling while it is enabled.
+        """
+        self.disable_profiling()
+        self.profiler = Profiler(self, regions)
+        self.memory = CountedMemory(self.memory, self.profiler)
+        self.invalidate(0, len(self.program))
+        return self.profiler
+
+    def disable_profiling(self) -> typing.Optional[Profiler]:
+        """Stops profiling and returns the profiler holding the counts."""
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            self.memory = self.memory.memory
+            self.invalidate(0, len(self.program))
+        return profiler
+
+    def enable_instrumentation(
+        self, subsystems: typing.Optional[typing.List[str]] = None
+    ) -> Instrumentation:
+        """
+        Starts measuring the host time spent by the subsystems of the interpreter,
+        by default all of `instrumentation.SUBSYSTEMS`. The instructions are decoded
+        again so their handlers use the measured functions.
+        """
+        self.disable_instrumentation()
+        self.instrumentation = Instrumentation(self, subsystems)
+        self.instrumentation.enable()
+        self.invalidate(0, len(self.program))
+        return self.instrumentation
+
+    def disable_instrumentation(self) -> typing.Optional[Instrumentation]:
+        """Stops measuring and returns the instrumentation holding the times."""
+        instrumentation, self.instrumentation = self.instrumentation, None
+        if instrumentation is not None:
+            instrumentation.disable()
+            self.invalidate(0, len(self.program))
+        return instrumentation
+
+    def invalidate(self, first: int, last: int):
+        """Drops the decoded handlers and translated blocks of a range of addresses."""
+        self.program[first:last] = [self.decode_current] * (last - first)
+        if self.translator is not None:
+            self.translator.invalidate(first, last)
+
+    def decode_instruction(
+        self, instruction_data, address: typing.Optional[int] = None
+    ) -> typing.Callable[[], None]:
+        """
+        Handler executing the instruction, counting its executions when profiling
+        and the program address it was decoded from is given.
+        """
         instruction: BaseInstruction = self.instruction_set.get_instruction(
             instruction_data["name"]
         )
-        instruction.execute(self, **instruction_data["params"])
+        handler = instruction.decode(self, **instruction_data["params"])
+        if self.profiler is not None and address is not None:
+            handler = self.profiler.wrap(address, instruction_data["name"], handler)
+        return handler
+
+    def decode_and_execute(self, address: int):
+        handler = self.decode_instruction(self.fetch(address), address)
+        self.program[address] = handler
+        handler()
+
+    def decode_current(self):
+        # the program counter was already moved past the executed instruction
+        self.decode_and_execute(self.registers["pc"] - 1)
+
+    def execute_instruction(self, instruction_data):
+        self.decode_instruction(instruction_data)()
 
     def execute(self):
         self.pc = self.registers.take("pc")
+        get_pc, set_pc = self.registers.getter("pc"), self.pc.set
+        program = self.program
         while True:
-            current_address = self.pc.get()
+            current_address = get_pc()
             assert current_address >= 0
-            if current_address >= len(self.program_data):
+            if current_address >= len(program):
                 break
-            instruction_data = self.program_data[self.pc.get()]
-            self.pc.set(current_address + 1)
-            self.execute_instruction(instruction_data)
+            set_pc(current_address + 1)
+            program[current_address]()
             yield self
 
+    def stops_before(self, first: bool) -> bool:
+        return bool(self.breakpoints.addresses) and self.breakpoints.stops_before(
+            self.registers["pc"], first
+        )
+
+    def block_at(
+        self, address: int, room: float
+    ) -> typing.Optional[typing.Callable[[], int]]:
+        """
+        The translated block starting at `address`, None when it is not hot yet, has
+        more than `room` instructions or holds a breakpoint after its first one.
+        """
+        block = self.translator.lookup(address)
+        if block is None or block[1] > room:
+            return None
+        if self.breakpoints.addresses and self.breakpoints.spans(
+            address + 1, address + block[1]
+        ):
+            return None
+        return block[0]
+
+    def run_batch(self, max_steps=None, until=None) -> int:
+        """
+        Tight loop over the decoded program, see `ProcessorBase.run_batch`.
+
+        The loop is chosen once per call so the instructions only pay for the checks
+        the run needs: without breakpoints, `until` callback or observers, the
+        instructions, or the translated blocks, are executed back to back.
+        """
+        self.pc = self.registers.take("pc")
+        budget = sys.maxsize if max_steps is None else max_steps
+        self.stop_request = None
+        self.stop_reason = "end"
+        if until is not None or self.observers or self.breakpoints.addresses:
+            return self.run_checked(budget, until)
+        self.breakpoints.stopped_at = None
+        if self.translator is not None:
+            return self.run_translated(budget)
+        return self.run_interpreted(budget)
+
+    def run_interpreted(self, budget: int) -> int:
+        """Executes the decoded instructions one by one."""
+        values, pc_slot = self.registers.values, self.pc.slot
+        pc_bytes, pack_pc = self.pc.value.mv, self.pc.packer()
+        program = self.program
+        steps = 0
+        while steps < budget:
+            current_address = values[pc_slot]
+            assert current_address >= 0
+            if current_address >= len(program):
+                return steps
+            # `FileRegister.set` of the program counter, inlined as the call costs
+            # more than the rest of the loop
+            values[pc_slot] = current_address + 1
+            pack_pc(pc_bytes, 0, current_address + 1)
+            program[current_address]()
+            steps += 1
+            if self.halt or self.stop_request:
+                self.stop_reason = "halt" if self.halt else self.stop_request
+                return steps
+        self.stop_reason = "max_steps"
+        return steps
+
+    def run_translated(self, budget: int) -> int:
+        """Executes the translated blocks, and the instructions outside of them."""
+        values, pc_slot = self.registers.values, self.pc.slot
+        pc_bytes, pack_pc = self.pc.value.mv, self.pc.packer()
+        program = self.program
+        translator = self.translator
+        lookup = translator.lookup
+        steps = 0
+        while steps < budget:
+            current_address = values[pc_slot]
+            assert current_address >= 0
+            if current_address >= len(program):
+                return steps
+            block = lookup(current_address)
+            if block is not None and block[1] <= budget - steps:
+                translator.code_written = False
+                steps += block[0]()
+            else:
+                values[pc_slot] = current_address + 1
+                pack_pc(pc_bytes, 0, current_address + 1)
+                program[current_address]()
+                steps += 1
+            if self.halt or self.stop_request:
+                self.stop_reason = "halt" if self.halt else self.stop_request
+                return steps
+        self.stop_reason = "max_steps"
+        return steps
+
+    def run_checked(self, budget: int, until=None) -> int:
+        """
+        Checks the breakpoints before every instruction, and calls the `until`
+        callback and the observers after it.
+
+        The instruction at a breakpoint address is not executed, unless the previous
+        run stopped there so a stopped run can be resumed. Translated blocks are
+        used unless they hold a breakpoint after their first instruction, or there is
+        an `until` callback or an observer.
+        """
+        get_pc, set_pc = self.registers.getter("pc"), self.pc.set
+        program = self.program
+        breakpoints = self.breakpoints
+        addresses = breakpoints.addresses
+        translator = self.translator
+        observers = self.observers
+        if until is not None or observers:
+            translator = None
+        steps = 0
+        while steps < budget:
+            current_address = get_pc()
+            assert current_address >= 0
+            if current_address >= len(program):
+                break
+            if (
+                addresses
+                and (current_address in addresses or breakpoints.stopped_at is not None)
+                and breakpoints.stops_before(current_address, not steps)
+            ):
+                self.stop_reason = "breakpoint"
+                break
+            block = (
+                None
+                if translator is None
+                else self.block_at(current_address, budget - steps)
+            )
+            if block is not None:
+                translator.code_written = False
+                steps += block()
+            else:
+                set_pc(current_address + 1)
+                program[current_address]()
+                steps += 1
+                for observer in observers:
+                    observer.record()
+            if self.halt:
+                self.stop_reason = "halt"
+                break
+            if self.stop_request:
+                self.stop_reason = self.stop_request
+                break
+            if until is not None and until(self):
+                self.stop_reason = "until"
+                break
+        else:
+            self.stop_reason = "max_steps"
+        return steps
+
 
 if __name__ == "__main__":
     registers_spec = {
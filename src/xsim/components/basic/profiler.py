@@ -0,0 +1,295 @@
+import collections
+import json
+import typing
+from pathlib import Path
+
+from xsim.core import memory as memory_module
+
+# name of the region holding the addresses outside of every named region
+OTHER_REGION = "other"
+
+
+class CountedMemory:
+    """
+    Stands for the memory of a profiled processor, counting the reads and writes per
+    region before forwarding them. The other attributes are those of the memory.
+
+    Replacing the processor memory, rather than the access methods of the memory
+    object, leaves the memory as fast as before once the profiling stops.
+    """
+
+    def __init__(self, memory: memory_module.Memory, profiler: "Profiler"):
+        self.memory = memory
+        region_of, reads, writes = profiler.region_of, profiler.reads, profiler.writes
+        forward_read, forward_write = memory.read, memory.write
+        forward_read_block, forward_write_block = memory.read_block, memory.write_block
+        forward_fill, forward_copy = memory.fill, memory.copy
+
+        # the access methods are closures held by the instance, the interpreter does
+        # not specialize the attribute lookups of a class defining `__getattr__`
+        def read(address: int, size: int = 1) -> int:
+            reads[region_of[address]] += 1
+            return forward_read(address, size)
+
+        def write(address: int, value: int, size: int = 1):
+            writes[region_of[address]] += 1
+            forward_write(address, value, size)
+
+        def read_block(address: int, size: int) -> bytes:
+            reads[region_of[address]] += 1
+            return forward_read_block(address, size)
+
+        def write_block(address: int, buffer: typing.Union[bytes, bytearray]):
+            writes[region_of[address]] += 1
+            forward_write_block(address, buffer)
+
+        def fill(address: int, size: int, value: int = 0):
+            writes[region_of[address]] += 1
+            forward_fill(address, size, value)
+
+        def copy(source: int, destination: int, size: int):
+            reads[region_of[source]] += 1
+            writes[region_of[destination]] += 1
+            forward_copy(source, destination, size)
+
+        self.read, self.write = read, write
+        self.read_block, self.write_block = read_block, write_block
+        self.fill, self.copy = fill, copy
+
+    def __getattr__(self, name: str):
+        return getattr(self.memory, name)
+
+
+class Profiler:
+    """
+    Counts what a program executes on a `BasicProcessor`, see
+    `BasicProcessor.enable_profiling`.
+
+    The executions are counted in lists sized to the program: the handlers run one
+    at a time are wrapped to count their address, and the translated blocks count
+    how many times they exited after each of their instructions, in consecutive
+    slots of `block_exits` (see `block_slots`), the executions of the addresses of a
+    block are derived from them when the counts are read. `total` counts all the
+    executed instructions, the handlers of `CALL` and `RET` also follow the calls to
+    build the call graph and the instructions executed by every call stack. The memory
+    accesses are counted per region by a `CountedMemory` and the counts of the
+    opcodes are derived from the counts of the addresses and the current code.
+    """
+
+    def __init__(
+        self,
+        target,
+        regions: typing.Optional[typing.Dict[str, typing.Tuple[int, int]]] = None,
+    ):
+        self.processor = target
+        self.get_pc = target.registers.getter("pc")
+        regions = regions or self.default_regions()
+        self.regions = [OTHER_REGION] + list(regions)
+        self.region_of = bytearray(target.memory.size)
+        for index, (start, size) in enumerate(regions.values(), 1):
+            self.region_of[start : start + size] = bytes([index]) * size
+
+        # lists rather than arrays, incrementing an item of a list is about twice
+        # faster (benchmarks/profiler_overhead.py)
+        self.executed: typing.List[int] = []
+        self.block_exits: typing.List[int] = []
+        self.total = [0]
+        self.reads = [0] * len(self.regions)
+        self.writes = [0] * len(self.regions)
+        self.resize(len(target.program))
+
+    def default_regions(self) -> typing.Dict[str, typing.Tuple[int, int]]:
+        regions = {}
+        registers_memory = self.processor.registers.memory
+        if isinstance(registers_memory, memory_module.MemoryView):
+            regions["registers"] = (registers_memory.offset, registers_memory.size)
+        if self.processor.code_in_memory:
+            regions["code"] = (self.processor.code.offset, self.processor.code.size)
+        return regions
+
+    def resize(self, size: int):
+        """Starts counting a program of `size` instructions."""
+        # resized in place, the handlers and blocks keep references to the lists
+        self.size = size
+        self.executed[:] = [0] * size
+        # the first slot of the translated blocks by address and size
+        self.slots: typing.Dict[typing.Tuple[int, int], int] = {}
+        del self.block_exits[:]
+        self.total[0] = 0
+        self.reads[:] = [0] * len(self.regions)
+        self.writes[:] = [0] * len(self.regions)
+        # the call stacks are numbered in the order they are first entered, the
+        # first one holds the address the program started from
+        self.stack_keys: typing.List[typing.Tuple[int, ...]] = [(self.get_pc(),)]
+        self.parents = [0]
+        self.children: typing.List[typing.Dict[int, int]] = [{}]
+        self.stack_instructions = [0]
+        self.stack_calls = [0]
+        # number of the current call stack
+        self.stack = 0
+        self.attributed = 0
+
+    def block_slots(self, address: int, size: int) -> int:
+        """
+        First of the `size` slots counting the exits of the block translated at
+        `address`, the block increments the slot of the instruction it exits after.
+        The slots are kept when the block is translated again.
+        """
+        slot = self.slots.get((address, size))
+        if slot is None:
+            slot = self.slots[address, size] = len(self.block_exits)
+            self.block_exits.extend([0] * size)
+        return slot
+
+    @property
+    def counts(self) -> typing.List[int]:
+        """Executions of every address of the program."""
+        # the blocks run the addresses from their entry up to their exit
+        entries = [0] * (self.size + 1)
+        for (address, size), slot in self.slots.items():
+            for index in range(size):
+                exits = self.block_exits[slot + index]
+                entries[address] += exits
+                entries[address + index + 1] -= exits
+        counts = []
+        running = 0
+        for executed, difference in zip(self.executed, entries):
+            running += difference
+            counts.append(executed + running)
+        return counts
+
+    def wrap(
+        self, address: int, name: str, handler: typing.Callable[[], None]
+    ) -> typing.Callable[[], None]:
+        """Counting handler of the instruction decoded at `address`."""
+        executed, total = self.executed, self.total
+        enter, leave = self.enter, self.leave
+
+        if name == "CALL":
+
+            def profiled():
+                executed[address] += 1
+                total[0] += 1
+                handler()
+                enter()
+
+        elif name == "RET":
+
+            def profiled():
+                executed[address] += 1
+                total[0] += 1
+                handler()
+                leave()
+
+        else:
+
+            def profiled():
+                executed[address] += 1
+                total[0] += 1
+                handler()
+
+        # the translated blocks count their instructions themselves
+        profiled.__wrapped__ = handler
+        return profiled
+
+    def add_stack(self, parent: int, callee: int) -> int:
+        index = len(self.stack_keys)
+        self.stack_keys.append(self.stack_keys[parent] + (callee,))
+        self.parents.append(parent)
+        self.children.append({})
+        self.children[parent][callee] = index
+        self.stack_instructions.append(0)
+        self.stack_calls.append(0)
+        return index
+
+    def attribute(self):
+        # instructions executed since the previous call or return
+        total = self.total[0]
+        self.stack_instructions[self.stack] += total - self.attributed
+        self.attributed = total
+
+    # `enter` and `leave` run after every call and return, they attribute the
+    # instructions without calling `attribute`
+
+    def enter(self):
+        total = self.total[0]
+        stack = self.stack
+        self.stack_instructions[stack] += total - self.attributed
+        self.attributed = total
+        callee = self.get_pc()
+        child = self.children[stack].get(callee)
+        if child is None:
+            child = self.add_stack(stack, callee)
+        self.stack_calls[child] += 1
+        self.stack = child
+
+    def leave(self):
+        total = self.total[0]
+        stack = self.stack
+        self.stack_instructions[stack] += total - self.attributed
+        self.attributed = total
+        self.stack = self.parents[stack]
+
+    @property
+    def stacks(self) -> typing.Dict[typing.Tuple[int, ...], int]:
+        """Instructions executed by every call stack, starting with the entry point."""
+        self.attribute()
+        return {
+            key: count
+            for key, count in zip(self.stack_keys, self.stack_instructions)
+            if count
+        }
+
+    @property
+    def calls(self) -> typing.Counter[typing.Tuple[int, int]]:
+        """Calls from the routine at a first address to the one at a second."""
+        calls: typing.Counter[typing.Tuple[int, int]] = collections.Counter()
+        for key, count in zip(self.stack_keys[1:], self.stack_calls[1:]):
+            calls[key[-2], key[-1]] += count
+        return calls
+
+    def stack_name(self, stack: typing.Tuple[int, ...]) -> str:
+        return ";".join(["main"] + [f"pc{address}" for address in stack[1:]])
+
+    def report(self) -> dict:
+        """Counts collected so far, as JSON serializable data."""
+        self.attribute()
+        addresses = {
+            address: count for address, count in enumerate(self.counts) if count
+        }
+        opcodes: typing.Counter[str] = collections.Counter()
+        for address, count in addresses.items():
+            opcodes[self.processor.fetch(address)["name"]] += count
+        return {
+            "instructions": self.total[0],
+            "addresses": {str(address): count for address, count in addresses.items()},
+            "opcodes": dict(opcodes.most_common()),
+            "memory": {
+                name: {"reads": self.reads[index], "writes": self.writes[index]}
+                for index, name in enumerate(self.regions)
+            },
+            "calls": [
+                {"caller": caller, "callee": callee, "count": count}
+                for (caller, callee), count in self.calls.most_common()
+            ],
+            "stacks": {
+                self.stack_name(stack): count
+                for stack, count in self.stacks.items()
+                if count
+            },
+        }
+
+    def write_json(self, path: str):
+        with Path(path).open("w") as file:
+            json.dump(self.report(), file, indent=2)
+
+    def collapsed(self) -> str:
+        """The call stacks in the collapsed format read by the flame graph tools."""
+        self.attribute()
+        return "".join(
+            f"{self.stack_name(stack)} {count}\n"
+            for stack, count in sorted(self.stacks.items())
+        )
+
+    def write_collapsed(self, path: str):
+        Path(path).write_text(self.collapsed())
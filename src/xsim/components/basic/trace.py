@@ -0,0 +1,424 @@
+import bisect
+import functools
+import json
+import queue
+import struct
+import threading
+import typing
+import zlib
+from pathlib import Path
+
+from xsim.core.processor import StepObserver
+
+FILE_MAGIC = b"XSTRACE\x01"
+INDEX_MAGIC = b"XSINDEX\x01"
+# magic and size of the JSON metadata following it
+FILE_HEADER = struct.Struct("<8sI")
+# index of the first record, number of records and size of the compressed records
+CHUNK_HEADER = struct.Struct("<QII")
+# offset of the chunk header in the file, index of the first record
+INDEX_ENTRY = struct.Struct("<QQ")
+# offset of the index, number of chunks
+FOOTER = struct.Struct("<QI8s")
+
+# program address, opcode, number of operands, changed registers and memory writes
+RECORD_HEADER = struct.Struct("<IBBBH")
+OPERAND = struct.Struct("<I")
+REGISTER = struct.Struct("<BI")
+# address and size of the written bytes, which follow
+WRITE = struct.Struct("<IH")
+MAX_WRITE = 0xFFFF
+
+
+@functools.lru_cache(maxsize=None)
+def record_header(operands: int) -> struct.Struct:
+    """Structure of a record header followed by the values of its operands."""
+    return struct.Struct(RECORD_HEADER.format + "I" * operands)
+
+
+class TraceRecord(typing.NamedTuple):
+    index: int
+    pc: int
+    opcode: str
+    # values of the operands before the instruction ran, the address of the memory
+    # operands rather than the value they point to
+    operands: typing.Tuple[int, ...]
+    # registers changed by the instruction, but the program counter which is the
+    # address of the next record
+    registers: typing.Dict[str, int]
+    writes: typing.List[typing.Tuple[int, bytes]]
+
+
+class TraceWriter(StepObserver):
+    """
+    Streams every instruction executed by a `BasicProcessor` to a file.
+
+    The writer observes the runs of the processor (see `ProcessorBase.observe`)
+    until it is closed and packs a record per instruction: its address, opcode and
+    operand values, the new values of the registers it changed and the bytes it
+    wrote, collected with a write hook on the memory. The records are packed into a
+    ring of `buffers` preallocated buffers of `chunk_size` bytes; a full buffer is
+    compressed and written as a chunk by a background thread while the next one is
+    filled, so the memory used does not depend on the length of the trace. `close`
+    writes the index of the chunks used by `TraceReader` to seek.
+
+    Recording disables the translated blocks, as any observer does.
+    """
+
+    # buffers in the ring
+    buffers = 4
+    # zlib compression level of the chunks
+    level = 1
+
+    def __init__(self, target, path: str, chunk_size: int = 256 * 1024):
+        self.processor = target
+        self.chunk_size = chunk_size
+        self.path = Path(path)
+        self.file = self.path.open("wb")
+        registers = target.registers
+        self.values = registers.values
+        self.get_pc = registers.getter("pc")
+        self.pc_slot = registers.slot("pc")
+        self.deferred = [
+            registers.resisters[label]
+            for label in sorted(registers.deferred)
+            if label in registers.resisters
+        ]
+        names = [""] * len(self.values)
+        for label, register in registers.resisters.items():
+            names[register.slot] = label
+        metadata = json.dumps(
+            {"opcodes": target.opcode_names, "registers": names}
+        ).encode()
+        self.file.write(FILE_HEADER.pack(FILE_MAGIC, len(metadata)) + metadata)
+
+        self.free: queue.Queue = queue.Queue()
+        for _ in range(self.buffers):
+            self.free.put(bytearray(chunk_size))
+        self.full: queue.Queue = queue.Queue()
+        self.index: typing.List[typing.Tuple[int, int]] = []
+        self.error: typing.Optional[BaseException] = None
+        self.flusher = threading.Thread(target=self.flush_chunks, daemon=True)
+        self.flusher.start()
+
+        self.buffer: bytearray = self.free.get()
+        self.offset = 0
+        self.first = 0
+        # number of recorded instructions
+        self.position = 0
+        self.writes: typing.List[typing.Tuple[int, bytes]] = []
+        # operand getters of the encoded instructions
+        self.getters: typing.Dict[bytes, typing.List[typing.Callable[[], int]]] = {}
+        self.start()
+        target.memory.on_write(self.on_write)
+        target.observe(self)
+
+    def __enter__(self) -> "TraceWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def on_write(self, address: int, values: bytes):
+        self.writes.append((address, bytes(values)))
+
+    def operand_getters(self, address: int) -> typing.List[typing.Callable[[], int]]:
+        cpu = self.processor
+        offsets = cpu.code_offsets
+        code = bytes(cpu.code_memory.mv[offsets[address] : offsets[address + 1]])
+        getters = self.getters.get(code)
+        if getters is None:
+            getters = []
+            for operand in cpu.fetch(address)["params"].values():
+                # the memory operands give the address they point to
+                kind, value = operand[1] if operand[0] == "ADDR" else operand
+                if kind == "REG":
+                    getters.append(cpu.registers.take(value).get)
+                elif kind == "CONST" and isinstance(value, int):
+                    getters.append(lambda value=value: value)
+            self.getters[code] = getters
+        return getters
+
+    @staticmethod
+    def deferred_value(register) -> int:
+        """Value a deferred register takes when read, the update is left pending."""
+        if register.pending is None:
+            return register.values[register.slot]
+        update, argument = register.pending
+        return update(register.values[register.slot], argument)
+
+    def mark(self):
+        """Takes the current state as the one preceding the next instruction."""
+        cpu = self.processor
+        self.pendings = [register.pending for register in self.deferred]
+        self.writes = []
+        self.previous_values = list(self.values)
+        self.pc = pc = self.get_pc()
+        self.opcode = 0
+        self.operands: typing.List[int] = []
+        if 0 <= pc < len(cpu.program):
+            self.opcode = cpu.code_memory.mv[cpu.code_offsets[pc]]
+            try:
+                getters = self.operand_getters(pc)
+            except Exception:
+                # the instruction fails to decode, it is recorded without operands
+                getters = []
+            self.operands = [getter() & 0xFFFFFFFF for getter in getters]
+
+    def start(self):
+        # the state may have been changed since the last recorded instruction
+        self.deferred_values = [
+            self.deferred_value(register) for register in self.deferred
+        ]
+        self.mark()
+
+    def record(self):
+        """Packs the record of the instruction which just ran."""
+        values = self.values
+        previous = self.previous_values
+        # the program counter is the address of the next record
+        previous[self.pc_slot] = values[self.pc_slot]
+        # the deferred registers are compared by the value they take when read, only
+        # evaluated when the instruction replaced their update
+        deferred = []
+        for index, register in enumerate(self.deferred):
+            slot = register.slot
+            previous[slot] = values[slot]
+            pending = register.pending
+            if pending is not None and pending is self.pendings[index]:
+                continue
+            value = self.deferred_value(register)
+            if value != self.deferred_values[index]:
+                self.deferred_values[index] = value
+                deferred.append((slot, value & 0xFFFFFFFF))
+        changed: typing.List[typing.Tuple[int, int]] = deferred
+        if values != previous:
+            changed += [
+                (slot, new & 0xFFFFFFFF)
+                for slot, (old, new) in enumerate(zip(previous, values))
+                if old != new
+            ]
+        writes = ()
+        operands = self.operands
+        header = record_header(len(operands))
+        size = header.size + REGISTER.size * len(changed)
+        if self.writes:
+            writes = [
+                (address + start, data[start : start + MAX_WRITE])
+                for address, data in self.writes
+                for start in range(0, max(len(data), 1), MAX_WRITE)
+            ]
+            size += sum(WRITE.size + len(data) for _, data in writes)
+        if self.offset + size > len(self.buffer):
+            self.hand_off()
+            if size > len(self.buffer):
+                self.buffer = bytearray(size)
+
+        buffer = self.buffer
+        offset = self.offset
+        header.pack_into(
+            buffer,
+            offset,
+            self.pc,
+            self.opcode,
+            len(operands),
+            len(changed),
+            len(writes),
+            *operands,
+        )
+        offset += header.size
+        for slot, value in changed:
+            REGISTER.pack_into(buffer, offset, slot, value)
+            offset += REGISTER.size
+        for address, data in writes:
+            WRITE.pack_into(buffer, offset, address, len(data))
+            offset += WRITE.size
+            buffer[offset : offset + len(data)] = data
+            offset += len(data)
+        self.offset = offset
+        self.position += 1
+        self.mark()
+
+    def hand_off(self):
+        """Queues the filled buffer to be written and takes a free one."""
+        if self.error is not None:
+            raise self.error
+        if self.offset:
+            self.full.put((self.buffer, self.offset, self.first, self.position))
+            self.buffer = self.free.get()
+            if len(self.buffer) != self.chunk_size:
+                # a buffer grown for a large record is not kept in the ring
+                self.buffer = bytearray(self.chunk_size)
+        self.offset = 0
+        self.first = self.position
+
+    def flush_chunks(self):
+        while True:
+            item = self.full.get()
+            if item is None:
+                return
+            buffer, size, first, stop = item
+            try:
+                if self.error is None:
+                    data = zlib.compress(memoryview(buffer)[:size], self.level)
+                    self.index.append((self.file.tell(), first))
+                    self.file.write(CHUNK_HEADER.pack(first, stop - first, len(data)))
+                    self.file.write(data)
+            except BaseException as exc:
+                self.error = exc
+            finally:
+                self.free.put(buffer)
+
+    def close(self):
+        """Writes the remaining records and the index of the chunks."""
+        if self.file.closed:
+            return
+        self.processor.unobserve(self)
+        self.processor.memory.unsubscribe(self.on_write)
+        try:
+            self.hand_off()
+        finally:
+            self.full.put(None)
+            self.flusher.join()
+        try:
+            if self.error is not None:
+                raise self.error
+            index_offset = self.file.tell()
+            for offset, first in self.index:
+                self.file.write(INDEX_ENTRY.pack(offset, first))
+            self.file.write(FOOTER.pack(index_offset, len(self.index), INDEX_MAGIC))
+        finally:
+            self.file.close()
+
+
+class TraceReader:
+    """
+    Reads a trace written by `TraceWriter`. `reader[index]` seeks to the chunk
+    holding the record with the index of the trailer, or of the chunks headers when
+    the trace was not closed, and only decompresses that chunk.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.file = self.path.open("rb")
+        try:
+            magic, size = FILE_HEADER.unpack(self.file.read(FILE_HEADER.size))
+            if magic != FILE_MAGIC:
+                raise ValueError("Not an execution trace")
+            metadata = json.loads(self.file.read(size))
+        except BaseException:
+            self.file.close()
+            raise
+        self.opcodes: typing.List[str] = metadata["opcodes"]
+        self.registers: typing.List[str] = metadata["registers"]
+        self.data_offset = FILE_HEADER.size + size
+        self.offsets: typing.List[int] = []
+        self.firsts: typing.List[int] = []
+        self.length = 0
+        self.read_index()
+        self.cached: typing.Tuple[int, typing.List[int], bytes] = (-1, [], b"")
+
+    def __enter__(self) -> "TraceReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.file.close()
+
+    def read_index(self):
+        end = self.file.seek(0, 2)
+        if end - self.data_offset >= FOOTER.size:
+            self.file.seek(end - FOOTER.size)
+            index_offset, chunks, magic = FOOTER.unpack(self.file.read(FOOTER.size))
+            if magic == INDEX_MAGIC:
+                self.file.seek(index_offset)
+                table = self.file.read(INDEX_ENTRY.size * chunks)
+                for offset, first in INDEX_ENTRY.iter_unpack(table):
+                    self.offsets.append(offset)
+                    self.firsts.append(first)
+                if chunks:
+                    self.length = (
+                        self.chunk_header(self.offsets[-1])[1] + self.firsts[-1]
+                    )
+                return
+        # without index the chunks are walked through, up to a truncated one
+        offset = self.data_offset
+        while offset + CHUNK_HEADER.size <= end:
+            first, count, size = self.chunk_header(offset)
+            if offset + CHUNK_HEADER.size + size > end:
+                break
+            self.offsets.append(offset)
+            self.firsts.append(first)
+            self.length = first + count
+            offset += CHUNK_HEADER.size + size
+
+    def chunk_header(self, offset: int) -> typing.Tuple[int, int, int]:
+        self.file.seek(offset)
+        return CHUNK_HEADER.unpack(self.file.read(CHUNK_HEADER.size))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def chunk(self, number: int) -> typing.Tuple[typing.List[int], bytes]:
+        """Offsets of the records of a chunk and its decompressed data."""
+        if self.cached[0] != number:
+            _, count, size = self.chunk_header(self.offsets[number])
+            data = zlib.decompress(self.file.read(size))
+            starts = []
+            offset = 0
+            for _ in range(count):
+                starts.append(offset)
+                _, _, operands, changed, writes = RECORD_HEADER.unpack_from(
+                    data, offset
+                )
+                offset += (
+                    RECORD_HEADER.size
+                    + OPERAND.size * operands
+                    + REGISTER.size * changed
+                )
+                for _ in range(writes):
+                    offset += WRITE.size + WRITE.unpack_from(data, offset)[1]
+            self.cached = (number, starts, data)
+        return self.cached[1], self.cached[2]
+
+    def __getitem__(self, index: int) -> TraceRecord:
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("Trace index out of range")
+        number = bisect.bisect_right(self.firsts, index) - 1
+        starts, data = self.chunk(number)
+        return self.unpack(index, data, starts[index - self.firsts[number]])
+
+    def __iter__(self) -> typing.Iterator[TraceRecord]:
+        return self.records()
+
+    def records(self, start: int = 0) -> typing.Iterator[TraceRecord]:
+        """The records from the index `start` to the end of the trace."""
+        index = max(start, 0)
+        while index < self.length:
+            number = bisect.bisect_right(self.firsts, index) - 1
+            starts, data = self.chunk(number)
+            for offset in starts[index - self.firsts[number] :]:
+                yield self.unpack(index, data, offset)
+                index += 1
+
+    def unpack(self, index: int, data: bytes, offset: int) -> TraceRecord:
+        pc, opcode, operands, changed, writes = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        values = struct.unpack_from(f"<{operands}I", data, offset)
+        offset += OPERAND.size * operands
+        registers = {}
+        for _ in range(changed):
+            slot, value = REGISTER.unpack_from(data, offset)
+            registers[self.registers[slot]] = value
+            offset += REGISTER.size
+        written = []
+        for _ in range(writes):
+            address, size = WRITE.unpack_from(data, offset)
+            offset += WRITE.size
+            written.append((address, bytes(data[offset : offset + size])))
+            offset += size
+        return TraceRecord(index, pc, self.opcodes[opcode], values, registers, written)
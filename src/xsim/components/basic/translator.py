@@ -0,0 +1,198 @@
+import typing
+
+from xsim.core import processor
+
+BLOCK_TEMPLATE = """
+def make_block({arguments}):
+    def block():
+        index = 0
+        try:
+{body}
+        except BaseException:
+            # the program counter points after the failing instruction, as it would
+            # when the instructions are executed one at a time
+            set_pc({address} + index + 1)
+{on_error}            raise
+        return {size}
+
+    return block
+"""
+
+# calls made by the profiled blocks after the instructions changing the call stack
+CALL_HOOKS = {"CALL": "enter()", "RET": "leave()"}
+
+
+class BlockTranslator:
+    """
+    Translates the hot basic blocks of a program into Python functions.
+
+    A basic block is a straight-line run of instructions ending with an instruction
+    transferring the control (jumps, `CALL`, `RET`, `HALT` or a write to the program
+    counter). When the address starting a block was reached `threshold` times, the
+    block is translated with `compile()` into a single function calling the decoded
+    handlers in sequence, cached by its entry address.
+
+    The function returns the number of executed instructions. The program counter is
+    only updated before the instructions which may observe it, those accessing the
+    memory and the last one, and the block returns early after an instruction
+    accessing the memory if a stop was requested, the program counter was written or
+    the code of the program changed. When the processor is profiling, the block
+    counts where it exits and its executed instructions in the arrays of the
+    profiler.
+    """
+
+    def __init__(
+        self, target: processor.ProcessorBase, threshold: int = 16, max_size: int = 64
+    ):
+        self.processor = target
+        self.threshold = threshold
+        self.max_size = max_size
+        self.blocks: typing.Dict[int, typing.Tuple[typing.Callable[[], int], int]] = {}
+        self.heat: typing.List[int] = []
+        # set when the code is written, checked by the running block
+        self.code_written = False
+
+    def reset(self, size: int):
+        self.blocks.clear()
+        self.heat = [0] * size
+        self.code_written = True
+
+    def invalidate(self, first: int, last: int):
+        """Drops the blocks holding instructions between `first` and `last`."""
+        self.code_written = True
+        for address, (_, size) in list(self.blocks.items()):
+            if address < last and first < address + size:
+                del self.blocks[address]
+
+    def lookup(
+        self, address: int
+    ) -> typing.Optional[typing.Tuple[typing.Callable[[], int], int]]:
+        """Returns the block starting at `address` once it is hot enough."""
+        block = self.blocks.get(address)
+        if block is None:
+            self.heat[address] += 1
+            if self.heat[address] >= self.threshold:
+                block = self.translate(address)
+                if block is not None:
+                    self.blocks[address] = block
+        return block
+
+    def classify(self, instruction_data: dict) -> typing.Tuple[bool, bool]:
+        """Tells whether an instruction ends a block and whether it may observe the
+        program counter or memory hooks."""
+        instruction = self.processor.instruction_set.get_instruction(
+            instruction_data["name"]
+        )
+        ends_block = instruction is None or instruction.ends_block
+        careful = instruction is None or instruction.accesses_memory
+        pc = self.processor.registers.take("pc")
+        for operand_type, operand_value in instruction_data["params"].values():
+            if operand_type == "REG":
+                if self.processor.registers.take(operand_value) is pc:
+                    ends_block = careful = True
+            elif operand_type != "CONST":
+                # memory operands, or operands only resolved when executed
+                careful = True
+        return ends_block, careful
+
+    def decode_block(self, address: int) -> typing.List[tuple]:
+        """
+        Decodes the instructions of the block starting at `address`, as tuples of
+        their handler, name and `classify` result. The block stops before an
+        instruction which cannot be decoded.
+        """
+        cpu = self.processor
+        program = cpu.program
+        decoded = []
+        for current in range(address, min(address + self.max_size, len(program))):
+            try:
+                instruction_data = cpu.fetch(current)
+                if program[current] == cpu.decode_current:
+                    program[current] = cpu.decode_instruction(instruction_data, current)
+                ends_block, careful = self.classify(instruction_data)
+            except Exception:
+                break
+            handler = program[current]
+            if cpu.profiler is not None:
+                handler = handler.__wrapped__
+            decoded.append((handler, instruction_data["name"], ends_block, careful))
+            if ends_block:
+                break
+        return decoded
+
+    def block_lines(
+        self, address: int, decoded: typing.List[tuple]
+    ) -> typing.List[str]:
+        """Body of the function running the decoded instructions of a block."""
+        profiler = self.processor.profiler
+        profiled = profiler is not None
+        slot = profiler.block_slots(address, len(decoded)) if profiled else 0
+        lines = []
+        for index, (_, name, ends_block, careful) in enumerate(decoded):
+            current = address + index
+            last = ends_block or index + 1 == len(decoded)
+            # counts the instructions executed when the block exits after this one
+            on_exit = (
+                [f"block_exits[{slot + index}] += 1", f"total[0] += {index + 1}"]
+                if profiled
+                else []
+            )
+            if index:
+                lines.append(f"index = {index}")
+            if careful or last:
+                lines.append(f"set_pc({current + 1})")
+            lines.append(f"h{index}()")
+            if last:
+                lines.extend(on_exit)
+                if profiled and name in CALL_HOOKS:
+                    lines.append(CALL_HOOKS[name])
+            elif careful:
+                lines.append(
+                    f"if cpu.stop_request or translator.code_written"
+                    f" or get_pc() != {current + 1}:"
+                )
+                lines.extend(f"    {line}" for line in on_exit)
+                lines.append(f"    return {index + 1}")
+        return lines
+
+    def translate(
+        self, address: int
+    ) -> typing.Optional[typing.Tuple[typing.Callable[[], int], int]]:
+        """
+        Builds the block starting at `address`. The block stops before an instruction
+        which cannot be decoded, the error is raised when the instruction is executed
+        on its own; no block is built when it is the first one.
+        """
+        decoded = self.decode_block(address)
+        if not decoded:
+            return None
+
+        cpu = self.processor
+        profiler = cpu.profiler
+        handlers = [handler for handler, *_ in decoded]
+        arguments = ["cpu", "translator", "get_pc", "set_pc"]
+        values = [cpu, self, cpu.registers.getter("pc"), cpu.registers.setter("pc")]
+        on_error = ""
+        if profiler is not None:
+            arguments += ["enter", "leave", "block_exits", "total"]
+            values += [profiler.enter, profiler.leave]
+            values += [profiler.block_exits, profiler.total]
+            on_error = (
+                f"            block_exits[{profiler.block_slots(address, len(handlers))}"
+                f" + index] += 1\n"
+                f"            total[0] += index + 1\n"
+            )
+        names = [f"h{index}" for index in range(len(handlers))]
+        source = BLOCK_TEMPLATE.format(
+            arguments=", ".join(arguments + names),
+            body="\n".join(
+                " " * 12 + line for line in self.block_lines(address, decoded)
+            ),
+            address=address,
+            on_error=on_error,
+            size=len(handlers),
+        )
+        namespace = {}
+        exec(compile(source, f"<block {address}>", "exec"), namespace)
+        block = namespace["make_block"](*values, *handlers)
+        return block, len(handlers)
@@ -0,0 +1,734 @@
+"""
+Lockstep execution of one program over many processor states with NumPy.
+
+`VectorProcessor` holds the state of N processors in arrays, the memories as an
+N x size array of bytes and the registers as an N x registers array, and executes
+the instructions of `BasicProcessor` as array operations over the lanes sharing the
+same program counter, so diverging branches run as separate masked groups.
+
+Lanes reaching a case the arrays do not reproduce exactly (an error, a write to the
+code or to the memory mapped registers, operands out of the supported ranges or an
+instruction without vector implementation) leave the lockstep: their state is
+loaded in a `BasicProcessor` which runs the rest of their steps.
+
+NumPy is an optional dependency, installed with the ``vector`` extra.
+"""
+
+import math
+import typing
+
+try:
+    import numpy as np
+except ImportError as exc:  # pragma: no cover
+    raise ImportError(
+        "The vectorized engine requires NumPy, install x-simulator[vector]"
+    ) from exc
+
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core import const
+
+# operands of arithmetic and bitwise instructions are computed on 64 bits integers,
+# larger operands leave the lockstep
+OPERAND_LIMIT = 2**31
+# largest memory read computed on the arrays, `read(address, address)` reads as many
+# bytes as the address of a register operand
+READ_LIMIT = 7
+# shifts by more bits leave the lockstep
+SHIFT_LIMIT = 32
+
+# lane indices, values and failure masks of the array operations
+Lanes = np.ndarray
+Reader = typing.Callable[[Lanes], typing.Tuple[np.ndarray, np.ndarray]]
+Commit = typing.Callable[[np.ndarray], None]
+Writer = typing.Callable[[Lanes, np.ndarray], typing.Tuple[np.ndarray, Commit]]
+Operation = typing.Callable[[Lanes], np.ndarray]
+
+
+class FlagsContext:
+    """Processor stand-in evaluating a jump condition for one flags value."""
+
+    def __init__(self, flags_mask: typing.Dict[str, int], value: int):
+        self.flags_mask = flags_mask
+        self.registers = {"SREG": value}
+
+
+class VectorProcessor:
+    """
+    Runs a program over `lanes` processor states in lockstep.
+
+    `new_processor` creates a `BasicProcessor` with the program loaded, such as
+    `AppConfiguration.create_processor`. The lanes start from the state of a first
+    one, and the lanes leaving the lockstep continue in new ones. Inputs are set with
+    `set_register` and by writing the `memory` array, outside of the memory mapped
+    registers and the code.
+    """
+
+    def __init__(self, lanes: int, new_processor: typing.Callable[[], BasicProcessor]):
+        self.lanes = lanes
+        self.new_processor = new_processor
+        template = new_processor()
+        self.template = template
+        self.program_data = template.program_data
+        self.endianess = template.memory.endianess
+        self.memory = np.tile(
+            np.frombuffer(template.memory.data, dtype=np.uint8), (lanes, 1)
+        )
+
+        registers = template.registers
+        self.register_names = list(registers.resisters)
+        self.registers = np.tile(
+            np.array([registers[name] for name in self.register_names], dtype=np.int64),
+            (lanes, 1),
+        )
+        # size and address in memory of every register, None when unmapped
+        self.register_layout: typing.List[typing.Tuple[int, typing.Optional[int]]] = []
+        for name in self.register_names:
+            register = registers.take(name)
+            mapped = register.value.root is template.memory
+            self.register_layout.append(
+                (register.size, register.value.base if mapped else None)
+            )
+        self.halted = np.full(lanes, template.halt)
+        self.stop_reasons: typing.List[typing.Optional[str]] = [None] * lanes
+        self.errors: typing.Dict[int, Exception] = {}
+
+        self.code_range = (0, 0)
+        if template.code_in_memory:
+            self.code_range = (
+                template.code.offset,
+                template.code.offset + template.code.size,
+            )
+        # lanes whose code was rewritten no longer run the compiled program
+        self.code_bytes = self.memory[0, slice(*self.code_range)].copy()
+        self.detached = np.zeros(lanes, dtype=bool)
+        # ranges written by lanes leaving the lockstep
+        self.protected = [self.code_range]
+        if registers.memory.root is template.memory and registers.memory.size:
+            self.protected.append(
+                (registers.memory.base, registers.memory.base + registers.memory.size)
+            )
+
+        self.pc_slot = self.slot("pc")
+        self.sp_slot = self.slot("sp")
+        self.flags_slot = self.slot(template.flags_register)
+        self.conditions: typing.Dict[type, typing.Dict[int, bool]] = {}
+        self.operations = [self.compile(item) for item in self.program_data]
+
+    def slot(self, name: str) -> typing.Optional[int]:
+        register = self.template.registers.aliases.get(name)
+        if register is None:
+            register = self.template.registers.resisters.get(name.lower())
+        return None if register is None else register.slot
+
+    def processor(self, lane: int) -> BasicProcessor:
+        """A `BasicProcessor` holding the state of a lane."""
+        scalar = self.new_processor()
+        # the block write reloads the mapped registers and the code
+        scalar.memory.write_block(0, self.memory[lane].tobytes())
+        for name, (_, base), value in zip(
+            self.register_names, self.register_layout, self.registers[lane]
+        ):
+            if base is None:
+                scalar.registers[name] = int(value)
+        scalar.halt = bool(self.halted[lane])
+        return scalar
+
+    def load(self, lane: int, scalar: BasicProcessor):
+        """Copies the state of a `BasicProcessor` into a lane."""
+        self.memory[lane] = np.frombuffer(scalar.memory.data, dtype=np.uint8)
+        self.registers[lane] = [scalar.registers[name] for name in self.register_names]
+        self.halted[lane] = scalar.halt
+        self.detached[lane] = not np.array_equal(
+            self.memory[lane, slice(*self.code_range)], self.code_bytes
+        )
+
+    def register(self, name: str) -> np.ndarray:
+        return self.registers[:, self.slot(name)]
+
+    def set_register(self, name: str, values):
+        values = np.broadcast_to(np.asarray(values, dtype=np.int64), (self.lanes,))
+        size, _ = self.register_layout[self.slot(name)]
+        if ((values < 0) | (values >= 1 << size * 8)).any():
+            raise OverflowError(f"Values out of the range of register {name}")
+        self.store_register(self.slot(name), np.arange(self.lanes), values)
+
+    # array primitives
+
+    def store_register(self, slot: int, lanes: Lanes, values: np.ndarray):
+        self.registers[lanes, slot] = values
+        size, base = self.register_layout[slot]
+        if base is not None:
+            self.store_bytes(lanes, np.full(len(lanes), base), values, size)
+
+    def store_bytes(
+        self, lanes: Lanes, addresses: np.ndarray, values: np.ndarray, size: int
+    ):
+        for index in range(size):
+            shift = 8 * (size - 1 - index if self.endianess == "big" else index)
+            self.memory[lanes, addresses + index] = (values >> shift) & 0xFF
+
+    def load_bytes(
+        self, lanes: Lanes, addresses: np.ndarray, sizes: typing.Union[int, np.ndarray]
+    ) -> np.ndarray:
+        values = np.zeros(len(lanes), dtype=np.int64)
+        largest = sizes if isinstance(sizes, int) else int(sizes.max(initial=0))
+        last = self.memory.shape[1] - 1
+        for index in range(largest):
+            byte = self.memory[lanes, np.minimum(addresses + index, last)].astype(
+                np.int64
+            )
+            inside = index < sizes
+            if self.endianess == "big":
+                values = np.where(inside, values << 8 | byte, values)
+            else:
+                values = np.where(inside, values | byte << 8 * index, values)
+        return values
+
+    def invalid_range(self, addresses: np.ndarray, size) -> np.ndarray:
+        memory_size = self.memory.shape[1]
+        return (
+            (addresses < 0)
+            | (addresses >= memory_size)
+            | (addresses + size > memory_size)
+        )
+
+    def writes_protected(self, addresses: np.ndarray, size) -> np.ndarray:
+        touched = np.zeros(len(addresses), dtype=bool)
+        for start, stop in self.protected:
+            touched |= (addresses < stop) & (start < addresses + size)
+        return touched
+
+    @staticmethod
+    def unsupported(values: np.ndarray) -> np.ndarray:
+        return (values < 0) | (values >= OPERAND_LIMIT)
+
+    def out_of_register(self, slot: int, values: np.ndarray) -> np.ndarray:
+        size, _ = self.register_layout[slot]
+        return (values < 0) | (values >= 1 << size * 8)
+
+    # operands, following `BaseInstruction.decode_operand` and `decode_destination`
+
+    def reader(self, operand) -> typing.Optional[Reader]:
+        operand_type, operand_value = operand
+        if operand_type == "CONST":
+
+            def read_constant(lanes):
+                values = np.full(len(lanes), operand_value, dtype=np.int64)
+                return values, np.zeros(len(lanes), dtype=bool)
+
+            return read_constant
+
+        if operand_type == "REG":
+            slot = self.slot(operand_value)
+            if slot is None:
+                return None
+
+            def read_register(lanes):
+                return self.registers[lanes, slot], np.zeros(len(lanes), dtype=bool)
+
+            return read_register
+
+        if operand_type == "ADDR":
+            return self.memory_reader(operand_value)
+
+        return None
+
+    def memory_reader(self, address) -> typing.Optional[Reader]:
+        address_type, address_value = address
+        if address_type == "CONST":
+            invalid = not 0 <= address_value < self.memory.shape[1]
+
+            def read_at_constant(lanes):
+                failed = np.full(len(lanes), invalid)
+                if invalid:
+                    return np.zeros(len(lanes), dtype=np.int64), failed
+                return self.memory[lanes, address_value].astype(np.int64), failed
+
+            return read_at_constant
+
+        if address_type == "REG":
+            slot = self.slot(address_value)
+            if slot is None:
+                return None
+
+            def read_at_register(lanes):
+                # the register value is both the address and the access size
+                addresses = self.registers[lanes, slot]
+                failed = (addresses > READ_LIMIT) | self.invalid_range(
+                    addresses, addresses
+                )
+                sizes = np.where(failed, 0, addresses)
+                return self.load_bytes(lanes, addresses, sizes), failed
+
+            return read_at_register
+
+        return None
+
+    def writer(self, destination) -> typing.Optional[Writer]:
+        destination_type, destination_value = destination
+        if destination_type == "REG":
+            slot = self.slot(destination_value)
+            if slot is None:
+                return None
+
+            def write_register(lanes, values):
+                def commit(done):
+                    self.store_register(slot, lanes[done], values[done])
+
+                return self.out_of_register(slot, values), commit
+
+            return write_register
+
+        if destination_type == "ADDR":
+            read_address = self.reader(destination_value)
+            if read_address is None:
+                return None
+
+            def write_at_address(lanes, values):
+                addresses, failed = read_address(lanes)
+                failed = (
+                    failed
+                    | self.invalid_range(addresses, 2)
+                    | self.writes_protected(addresses, 2)
+                    | (values < 0)
+                    | (values > const.MAX_U16)
+                )
+
+                def commit(done):
+                    self.store_bytes(lanes[done], addresses[done], values[done], 2)
+
+                return failed, commit
+
+            return write_at_address
+
+        return None
+
+    # instructions
+
+    def compile(self, instruction_data: dict) -> typing.Optional[Operation]:
+        """
+        Array operation of an instruction, None when it is not vectorized. The
+        instruction families are recognized by the hooks they implement.
+        """
+        instruction = self.template.instruction_set.get_instruction(
+            instruction_data["name"]
+        )
+        params = dict(instruction_data["params"])
+        if instruction is None:
+            return None
+        compilers = {
+            "NOP": self.compile_control,
+            "HALT": self.compile_control,
+            "MOV": self.compile_mov,
+            "DB": self.compile_db,
+            "CALL": self.compile_call,
+            "RET": self.compile_ret,
+            "PUSH": self.compile_push,
+            "POP": self.compile_pop,
+        }
+        if instruction.instruction_name in compilers:
+            return compilers[instruction.instruction_name](instruction, params)
+        if hasattr(instruction, "arithmetic_compute"):
+            return self.compile_arithmetic(instruction, params)
+        if hasattr(instruction, "compute_result"):
+            return self.compile_bitwise(instruction, params)
+        if hasattr(instruction, "check_condition"):
+            return self.compile_jump(instruction, params)
+        return None
+
+    def compile_control(self, instruction, params) -> Operation:
+        halts = instruction.instruction_name == "HALT"
+
+        def control(lanes):
+            if halts:
+                self.halted[lanes] = True
+            return np.zeros(len(lanes), dtype=bool)
+
+        return control
+
+    def compile_mov(self, instruction, params) -> typing.Optional[Operation]:
+        if set(params) != {"source", "destination"}:
+            return None
+        read = self.reader(params["source"])
+        write = self.writer(params["destination"])
+        if read is None or write is None:
+            return None
+
+        def mov(lanes):
+            values, failed = read(lanes)
+            write_failed, commit = write(lanes, values)
+            failed |= write_failed
+            commit(~failed)
+            return failed
+
+        return mov
+
+    def compile_db(self, instruction, params) -> typing.Optional[Operation]:
+        if set(params) != {"source", "destination"}:
+            return None
+        read_address = self.reader(params["destination"])
+        source_type, source = params["source"]
+        if read_address is None:
+            return None
+        if source_type == "CONST" and 0 <= source <= const.MAX_U8:
+            data = bytes([source])
+        elif source_type == "STRING" and isinstance(source, str) and source:
+            data = source.encode("utf-8")
+        else:
+            return None
+        values = np.frombuffer(data, dtype=np.uint8)
+
+        def db(lanes):
+            addresses, failed = read_address(lanes)
+            failed = (
+                failed
+                | self.invalid_range(addresses, len(data))
+                | self.writes_protected(addresses, len(data))
+            )
+            done = lanes[~failed]
+            columns = addresses[~failed, None] + np.arange(len(data))
+            self.memory[done[:, None], columns] = values
+            return failed
+
+        return db
+
+    def arithmetic_operands(
+        self, instruction, params
+    ) -> typing.Optional[
+        typing.Tuple[typing.Optional[Reader], Reader, typing.Optional[Writer]]
+    ]:
+        """Source reader, destination reader and writer of an arithmetic instruction,
+        None when it is not vectorized."""
+        destination, source = params.get("destination"), params.get("source")
+        read_only = instruction.instruction_name == "CMP"
+        if read_only:
+            # `Cmp.decode` hands its operands swapped to the arithmetic decoding
+            destination, source = source, destination
+        if destination is None or self.flags_slot is None:
+            return None
+        if not set(params) <= {"source", "destination"}:
+            return None
+        # the address of the result would be read after the flags are updated
+        if destination[0] == "ADDR" and (
+            destination[1][0] == "REG"
+            and self.slot(destination[1][1]) == self.flags_slot
+        ):
+            return None
+        read_source = self.reader(source) if source else None
+        read_destination = self.reader(destination)
+        write = None if read_only else self.writer(destination)
+        if read_destination is None or (source and read_source is None):
+            return None
+        if not read_only and write is None:
+            return None
+        return read_source, read_destination, write
+
+    def compile_arithmetic(self, instruction, params) -> typing.Optional[Operation]:
+        operands = self.arithmetic_operands(instruction, params)
+        if operands is None:
+            return None
+        read_source, read_destination, write = operands
+        read_only = write is None
+        divides = instruction.instruction_name == "DIV"
+        mask_cls, mask_set = instruction.flags_masks(self.template)
+        flags_slot = self.flags_slot
+
+        def arithmetic(lanes):
+            if read_source is None:
+                sources = np.zeros(len(lanes), dtype=np.int64)
+                failed = np.zeros(len(lanes), dtype=bool)
+            else:
+                sources, failed = read_source(lanes)
+            destinations, destination_failed = read_destination(lanes)
+            failed = (
+                failed
+                | destination_failed
+                | self.unsupported(sources)
+                | self.unsupported(destinations)
+            )
+            if divides:
+                failed |= sources == 0
+            sources = np.where(failed, 1, sources)
+            result = next(
+                instruction.arithmetic_compute(self.template, sources, destinations)
+            )
+            if not read_only:
+                write_failed, commit = write(lanes, result)
+                failed |= write_failed
+            done = ~failed
+            flags_lanes = lanes[done]
+            self.store_register(
+                flags_slot,
+                flags_lanes,
+                self.registers[flags_lanes, flags_slot] & mask_cls | mask_set,
+            )
+            if not read_only:
+                commit(done)
+            return failed
+
+        return arithmetic
+
+    def compile_bitwise(self, instruction, params) -> typing.Optional[Operation]:
+        if set(params) != {"source", "destination"}:
+            return None
+        read_source = self.reader(params["source"])
+        read_destination = self.reader(params["destination"])
+        write = self.writer(params["destination"])
+        if read_source is None or read_destination is None or write is None:
+            return None
+        shifts = instruction.instruction_name in ("SHL", "SHR")
+
+        def bitwise(lanes):
+            sources, failed = read_source(lanes)
+            destinations, destination_failed = read_destination(lanes)
+            failed = (
+                failed
+                | destination_failed
+                | self.unsupported(sources)
+                | self.unsupported(destinations)
+            )
+            if shifts:
+                failed |= destinations >= SHIFT_LIMIT
+                destinations = np.where(failed, 0, destinations)
+            result = np.broadcast_to(
+                instruction.compute_result(self.template, sources, destinations),
+                destinations.shape,
+            )
+            write_failed, commit = write(lanes, result)
+            failed |= write_failed
+            commit(~failed)
+            return failed
+
+        return bitwise
+
+    def condition(self, instruction, flags: np.ndarray) -> np.ndarray:
+        """Evaluates the jump condition once per distinct flags value."""
+        known = self.conditions.setdefault(instruction, {})
+        values, inverse = np.unique(flags, return_inverse=True)
+        table = np.zeros(len(values), dtype=bool)
+        for index, value in enumerate(values.tolist()):
+            if value not in known:
+                known[value] = bool(
+                    instruction.check_condition(
+                        FlagsContext(self.template.flags_mask, value)
+                    )
+                )
+            table[index] = known[value]
+        return table[inverse.reshape(-1)]
+
+    def compile_jump(self, instruction, params) -> typing.Optional[Operation]:
+        if set(params) != {"destination"} or self.pc_slot is None:
+            return None
+        unconditional = instruction.instruction_name == "JMP"
+        if not unconditional and self.flags_slot is None:
+            return None
+        read_address = self.reader(params["destination"])
+        if read_address is None:
+            return None
+        try:
+            instruction.check_condition(FlagsContext(self.template.flags_mask, 0))
+        except Exception:
+            # flags missing from the flags names
+            return None
+        pc_slot, flags_slot = self.pc_slot, self.flags_slot
+
+        def jump(lanes):
+            if unconditional:
+                taken = np.ones(len(lanes), dtype=bool)
+            else:
+                taken = self.condition(instruction, self.registers[lanes, flags_slot])
+            jumping = lanes[taken]
+            addresses, jump_failed = read_address(jumping)
+            jump_failed |= self.out_of_register(pc_slot, addresses)
+            self.store_register(pc_slot, jumping[~jump_failed], addresses[~jump_failed])
+            failed = np.zeros(len(lanes), dtype=bool)
+            failed[taken] = jump_failed
+            return failed
+
+        return jump
+
+    def compile_call(self, instruction, params) -> typing.Optional[Operation]:
+        if set(params) != {"destination"} or None in (self.pc_slot, self.sp_slot):
+            return None
+        read_address = self.reader(params["destination"])
+        if read_address is None:
+            return None
+        pc_slot, sp_slot = self.pc_slot, self.sp_slot
+
+        def call(lanes):
+            addresses, failed = read_address(lanes)
+            stack = self.registers[lanes, sp_slot] - 2
+            returns = self.registers[lanes, pc_slot]
+            failed = (
+                failed
+                | self.out_of_register(sp_slot, stack)
+                | self.invalid_range(stack, 2)
+                | self.writes_protected(stack, 2)
+                | (returns > const.MAX_U16)
+                | self.out_of_register(pc_slot, addresses)
+            )
+            done = ~failed
+            self.store_register(sp_slot, lanes[done], stack[done])
+            self.store_bytes(lanes[done], stack[done], returns[done], 2)
+            self.store_register(pc_slot, lanes[done], addresses[done])
+            return failed
+
+        return call
+
+    def compile_ret(self, instruction, params) -> typing.Optional[Operation]:
+        if params or None in (self.pc_slot, self.sp_slot):
+            return None
+        pc_slot, sp_slot = self.pc_slot, self.sp_slot
+
+        def ret(lanes):
+            stack = self.registers[lanes, sp_slot]
+            failed = self.invalid_range(stack, 2)
+            stack = np.where(failed, 0, stack)
+            returns = self.load_bytes(lanes, stack, 2)
+            failed |= self.out_of_register(pc_slot, returns) | self.out_of_register(
+                sp_slot, stack + 2
+            )
+            done = ~failed
+            self.store_register(pc_slot, lanes[done], returns[done])
+            self.store_register(sp_slot, lanes[done], stack[done] + 2)
+            return failed
+
+        return ret
+
+    def compile_push(self, instruction, params) -> typing.Optional[Operation]:
+        # the parser names the single operand "destination"
+        if set(params) != {"destination"} or self.sp_slot is None:
+            return None
+        read = self.reader(params["destination"])
+        if read is None:
+            return None
+        sp_slot = self.sp_slot
+
+        def push(lanes):
+            values, failed = read(lanes)
+            stack = self.registers[lanes, sp_slot] - 2
+            failed = (
+                failed
+                | self.out_of_register(sp_slot, stack)
+                | self.invalid_range(stack, 2)
+                | self.writes_protected(stack, 2)
+                | (values < 0)
+                | (values > const.MAX_U16)
+            )
+            done = ~failed
+            self.store_register(sp_slot, lanes[done], stack[done])
+            self.store_bytes(lanes[done], stack[done], values[done], 2)
+            return failed
+
+        return push
+
+    def compile_pop(self, instruction, params) -> typing.Optional[Operation]:
+        if set(params) != {"destination"} or self.sp_slot is None:
+            return None
+        destination_type, destination_value = params["destination"]
+        slot = self.slot(destination_value) if destination_type == "REG" else None
+        if slot is None:
+            return None
+        sp_slot = self.sp_slot
+
+        def pop(lanes):
+            stack = self.registers[lanes, sp_slot]
+            failed = self.invalid_range(stack, 2)
+            values = self.load_bytes(lanes, np.where(failed, 0, stack), 2)
+            # the stack pointer is read again after the destination is written
+            stack = (values if slot == sp_slot else stack) + 2
+            failed |= self.out_of_register(slot, values) | self.out_of_register(
+                sp_slot, stack
+            )
+            done = ~failed
+            self.store_register(slot, lanes[done], values[done])
+            self.store_register(sp_slot, lanes[done], stack[done])
+            return failed
+
+        return pop
+
+    # execution
+
+    def leave_lockstep(self, lane: int, budget: float) -> int:
+        """Runs the rest of a lane in a `BasicProcessor`, returns its steps."""
+        scalar = self.processor(lane)
+        try:
+            steps = scalar.run(max_steps=None if math.isinf(budget) else int(budget))
+            self.stop_reasons[lane] = scalar.stop_reason
+        except Exception as exc:
+            steps = 0
+            self.errors[lane] = exc
+            self.stop_reasons[lane] = "error"
+        self.load(lane, scalar)
+        return steps
+
+    @staticmethod
+    def groups(
+        lanes: Lanes, addresses: np.ndarray
+    ) -> typing.Iterable[typing.Tuple[int, Lanes]]:
+        """The lanes grouped by program counter."""
+        if addresses.min() == addresses.max():
+            return [(int(addresses[0]), lanes)]
+        order = np.argsort(addresses, kind="stable")
+        values, starts = np.unique(addresses[order], return_index=True)
+        return zip(values.tolist(), np.split(lanes[order], starts[1:]))
+
+    def step(self, lanes: Lanes, addresses: np.ndarray) -> typing.List[int]:
+        """Executes one instruction in every lane, returns the lanes which failed."""
+        leaving = []
+        for address, group in self.groups(lanes, addresses):
+            self.store_register(self.pc_slot, group, np.full(len(group), address + 1))
+            operation = self.operations[address]
+            if operation is None:
+                failed = np.ones(len(group), dtype=bool)
+            else:
+                failed = operation(group)
+            if failed.any():
+                # the instruction is executed again outside of the lockstep
+                lost = group[failed]
+                self.store_register(self.pc_slot, lost, np.full(len(lost), address))
+                leaving.extend(lost.tolist())
+        return leaving
+
+    def run(self, max_steps: typing.Optional[int] = None) -> np.ndarray:
+        """
+        Runs every lane as `BasicProcessor.run` would and returns the executed
+        instructions per lane, the causes are kept in `stop_reasons` and the errors
+        raised by lanes in `errors`. The steps of a failed lane are those executed
+        before it left the lockstep.
+        """
+        budget = math.inf if max_steps is None else max_steps
+        steps = np.zeros(self.lanes, dtype=np.int64)
+        active = np.ones(self.lanes, dtype=bool)
+        self.stop_reasons = ["end"] * self.lanes
+        self.errors = {}
+        if self.pc_slot is None:
+            self.detached[:] = True
+        for lane in np.flatnonzero(self.detached).tolist():
+            active[lane] = False
+            steps[lane] = self.leave_lockstep(lane, budget)
+        program_size = len(self.operations)
+        executed = 0
+        while executed < budget:
+            lanes = np.flatnonzero(active)
+            addresses = self.registers[lanes, self.pc_slot]
+            ended = addresses >= program_size
+            active[lanes[ended]] = False
+            lanes, addresses = lanes[~ended], addresses[~ended]
+            if not len(lanes):
+                break
+
+            for lane in self.step(lanes, addresses):
+                active[lane] = False
+                steps[lane] += self.leave_lockstep(lane, budget - executed)
+            executed += 1
+            stepped = lanes[active[lanes]]
+            steps[stepped] += 1
+            halted = stepped[self.halted[stepped]]
+            active[halted] = False
+            for lane in halted.tolist():
+                self.stop_reasons[lane] = "halt"
+        else:
+            for lane in np.flatnonzero(active).tolist():
+                self.stop_reasons[lane] = "max_steps"
+        return steps
@@ -1,98 +1,57 @@
+import functools
+import hashlib
+import os
+import stat
 import typing
 from pathlib import Path
 
-from lark import Lark, Transformer, v_args
+if typing.TYPE_CHECKING:
+    from lark import Lark
 
+    from xsim.core.asm_transformer import AssemblyTransformer
 
-class AssemblyTransformer(Transformer):
-    def __init__(
-        self,
-        register_names: typing.Optional[typing.List[str]] = None,
-        **kwargs,
-    ):
-        self.register_names = register_names or []
-
-    @v_args(tree=True)
-    def numerical(self, operand: str = ""):
-        # print(args, kwargs)
-        return
-
-    @v_args(inline=True)
-    def numerical_dec(self, token):
-        return int(token)
-
-    @v_args(inline=True)
-    def numerical_hex(self, token):
-        return int(token, 16)
-
-    @v_args(inline=True)
-    def const(self, const):
-        return "CONST", const
-
-    @v_args(inline=True)
-    def reg(self, reg):
-        if reg not in self.register_names:
-            raise ValueError(f"Register {reg} not found in {self.register_names}")
-        return "REG", str(reg)
-
-    @v_args(inline=True)
-    def addr(self, addr):
-        return "ADDR", addr
-
-    @v_args(inline=True)
-    def instruction_name(self, name):
-        return str(name)
 
-    @v_args(inline=True)
-    def term(self, term):
-        return term
+def cache_directory() -> Path:
+    """Directory where compiled artifacts are persisted between runs.
 
-    @v_args(inline=True)
-    def factor(self, factor):
-        return factor
-
-    @v_args(inline=True)
-    def string(self, string):
-        return "STRING", string[1:-1]
-
-    @v_args(inline=True)
-    def operand(self, operand):
-        return operand
-
-    @v_args(inline=True)
-    def instruction(self, instruction_name, *args):
-        return {
-            "name": instruction_name,
-            "params": dict(zip(["destination", "source"], args)),
-        }
-
-    @v_args(inline=True)
-    def add(self, a, b):
-        return "EXPR", (a, "+", b)
+    Defaults to ``xsim`` in the user cache directory, ``XDG_CACHE_HOME`` or
+    ``~/.cache``, and can be moved with the ``XSIM_CACHE_DIR`` environment variable.
+    """
+    location = os.environ.get("XSIM_CACHE_DIR")
+    if location:
+        return Path(location)
+    base = os.environ.get("XDG_CACHE_HOME")
+    return (Path(base) if base else Path.home() / ".cache") / "xsim"
 
-    @v_args(inline=True)
-    def sub(self, a, b):
-        return "EXPR", (a, "-", b)
 
-    @v_args(inline=True)
-    def mul(self, a, b):
-        return "EXPR", (a, "*", b)
+def private_cache_directory() -> typing.Optional[Path]:
+    """
+    The cache directory, created readable by the current user only.
 
-    @v_args(inline=True)
-    def div(self, a, b):
-        return "EXPR", (a, "/", b)
+    The cached parser tables are pickles, so None is returned, disabling the cache,
+    when the directory can not be created or other users could write to it.
+    """
+    directory = cache_directory()
+    try:
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        status = directory.stat()
+    except OSError:
+        return None
+    if status.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        return None
+    if hasattr(os, "getuid") and status.st_uid != os.getuid():
+        return None
+    return directory
 
-    @v_args(inline=True)
-    def expr(self, expr):
-        return expr
 
-    @v_args(inline=True)
-    def instructions(self, *instructions):
-        return [x for x in instructions if isinstance(x, dict)]
+def __getattr__(name: str):
+    # the transformer subclasses a Lark class, it is only imported when needed so
+    # importing the parser does not load Lark
+    if name == "AssemblyTransformer":
+        from xsim.core.asm_transformer import AssemblyTransformer
 
-    @v_args(inline=True)
-    def start(self, instructions):
-        return instructions
+        return AssemblyTransformer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class AssemblyParser:
@@ -101,6 +60,8 @@ class AssemblyParser:
 
     The `AssemblyParser` class provides methods for loading and parsing assembly code source files. It uses
     a grammar to define the syntax of the asm language and a parser to parse the source code.
+    The grammar is compiled for the LALR engine and the compiled tables are cached on disk,
+    pass `parser_mode="cyk"` to use the CYK engine instead.
     Example:
 
         >>> parser = AssemblyParser()
@@ -111,7 +72,7 @@ class AssemblyParser:
     class Grammar:
         r"""
         start: instructions
-        instructions: (instruction NEWLINE)* instruction NEWLINE*
+        instructions: instruction (NEWLINE instruction)* NEWLINE?
         instruction: instruction_name
             | instruction_name operand
             | instruction_name operand "," operand
@@ -167,7 +128,7 @@ class AssemblyParser:
         numerical_hex: /0[Xx][0-9a-fA-F]+/
         numerical_dec: /[1-9][0-9]*/
         reg: /[a-z]+[0-9]*/
-        addr: "[" (const | reg | expr) "]"
+        addr: "[" expr "]"
 
         %import common.WS_INLINE
         %import common.NEWLINE
@@ -175,7 +136,8 @@ class AssemblyParser:
         %ignore WS_INLINE
         """
 
-        _parser: Lark = None
+        parser_mode: str = "lalr"
+        _parsers: typing.Dict[str, "Lark"] = {}
         _vars: typing.Dict[str, str] = {}
         _conf_transform: typing.Dict[str, typing.Any] = {}
         _tree: typing.Any = None
@@ -185,27 +147,78 @@ class AssemblyParser:
             return cls.__doc__
 
         @classmethod
-        def parser(cls, **kwargs):
-            if cls._parser is None:
-                cls._parser = Lark(
+        def digest(cls, parser_mode: str) -> str:
+            """Hash identifying the compiled tables of the grammar for a parser mode."""
+            import lark
+
+            content = f"{lark.__version__}:{parser_mode}:{cls.source()}"
+            return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+        @classmethod
+        def cache_file(cls, parser_mode: str) -> typing.Optional[Path]:
+            """Location of the serialized parser, only LALR tables can be cached."""
+            if parser_mode != "lalr":
+                return None
+            directory = private_cache_directory()
+            if directory is None:
+                return None
+            return directory / f"grammar-{cls.digest(parser_mode)[:16]}.lark"
+
+        @classmethod
+        def parser(cls, parser_mode: typing.Optional[str] = None) -> "Lark":
+            """
+            Parser shared by every register configuration.
+
+            Its transformer only builds the instructions, the registers are validated
+            in a separate pass by `AssemblyParser.transformer`.
+            """
+            parser_mode = parser_mode or cls.parser_mode
+            if parser_mode not in cls._parsers:
+                from lark import Lark
+
+                from xsim.core.asm_transformer import AssemblyTransformer
+
+                cache_file = cls.cache_file(parser_mode)
+                cls._parsers[parser_mode] = Lark(
                     cls.source(),
-                    parser="cyk",
-                    transformer=AssemblyTransformer(**kwargs),
+                    parser=parser_mode,
+                    transformer=AssemblyTransformer(),
+                    cache=str(cache_file) if cache_file else False,
                 )
-            return cls._parser
+            return cls._parsers[parser_mode]
 
         @classmethod
-        def parse(cls, text: str, **kwargs):
-            return cls.parser(**kwargs).parse(text)
+        def parse(cls, text: str, parser_mode: typing.Optional[str] = None):
+            cls._tree = cls.parser(parser_mode).parse(text)
+            return cls._tree
 
         @classmethod
         def last_tree(cls):
             return cls._tree
 
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def transformer(register_names: typing.FrozenSet[str]) -> "AssemblyTransformer":
+        """
+        Transformer validating the operands against a register configuration.
+
+        Instances are kept in a bounded LRU cache keyed by the set of register names,
+        so processors with different configurations never share the validation.
+        """
+        from xsim.core.asm_transformer import AssemblyTransformer
+
+        return AssemblyTransformer(register_names=sorted(register_names))
+
     @classmethod
-    def loads(cls, text, **kwargs):
-        assert "register_names" in kwargs
-        return cls.Grammar.parse(text=text, **kwargs)
+    def loads(
+        cls,
+        text,
+        register_names: typing.Iterable[str],
+        parser_mode: typing.Optional[str] = None,
+    ):
+        instructions = cls.Grammar.parse(text=text, parser_mode=parser_mode)
+        transformer = cls.transformer(frozenset(register_names or ()))
+        return transformer.validate(instructions)
 
     @classmethod
     def load(cls, file: typing.Union[str, Path, typing.TextIO], **kwargs):
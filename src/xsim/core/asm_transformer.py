@@ -0,0 +1,122 @@
+import typing
+
+from lark import Transformer, v_args
+
+
+class AssemblyTransformer(Transformer):
+    """
+    Turns the parse tree into instructions. Registers are only validated when
+    `register_names` is given.
+    """
+
+    def __init__(
+        self,
+        register_names: typing.Optional[typing.List[str]] = None,
+        **kwargs,
+    ):
+        self.register_names = register_names
+
+    @v_args(tree=True)
+    def numerical(self, operand: str = ""):
+        # print(args, kwargs)
+        return
+
+    @v_args(inline=True)
+    def numerical_dec(self, token):
+        return int(token)
+
+    @v_args(inline=True)
+    def numerical_hex(self, token):
+        return int(token, 16)
+
+    @v_args(inline=True)
+    def const(self, const):
+        return "CONST", const
+
+    @v_args(inline=True)
+    def reg(self, reg):
+        self.validate_register(reg)
+        return "REG", str(reg)
+
+    def validate_register(self, reg):
+        if self.register_names is None:
+            return
+        if reg not in self.register_names:
+            raise ValueError(f"Register {reg} not found in {self.register_names}")
+
+    def validate_operand(self, operand):
+        operand_type, operand_value = operand
+        if operand_type == "REG":
+            self.validate_register(operand_value)
+        elif operand_type == "ADDR":
+            self.validate_operand(operand_value)
+        elif operand_type == "EXPR":
+            left, _, right = operand_value
+            self.validate_operand(left)
+            self.validate_operand(right)
+
+    def validate(self, instructions: typing.List[dict]) -> typing.List[dict]:
+        """Check the registers used by already transformed instructions."""
+        for instruction in instructions:
+            for operand in instruction["params"].values():
+                self.validate_operand(operand)
+        return instructions
+
+    @v_args(inline=True)
+    def addr(self, addr):
+        return "ADDR", addr
+
+    @v_args(inline=True)
+    def instruction_name(self, name):
+        return str(name)
+
+    @v_args(inline=True)
+    def term(self, term):
+        return term
+
+    @v_args(inline=True)
+    def factor(self, factor):
+        return factor
+
+    @v_args(inline=True)
+    def string(self, string):
+        return "STRING", string[1:-1]
+
+    @v_args(inline=True)
+    def operand(self, operand):
+        return operand
+
+    @v_args(inline=True)
+    def instruction(self, instruction_name, *args):
+        return {
+            "name": instruction_name,
+            "params": dict(zip(["destination", "source"], args)),
+        }
+
+    @v_args(inline=True)
+    def add(self, a, b):
+        return "EXPR", (a, "+", b)
+
+    @v_args(inline=True)
+    def sub(self, a, b):
+        return "EXPR", (a, "-", b)
+
+    @v_args(inline=True)
+    def mul(self, a, b):
+        return "EXPR", (a, "*", b)
+
+    @v_args(inline=True)
+    def div(self, a, b):
+        return "EXPR", (a, "/", b)
+
+    @v_args(inline=True)
+    def expr(self, expr):
+        return expr
+
+    @v_args(inline=True)
+    def instructions(self, *instructions):
+        return [x for x in instructions if isinstance(x, dict)]
+
+    @v_args(inline=True)
+    def start(self, instructions):
+        return instructions
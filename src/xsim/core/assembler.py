@@ -0,0 +1,356 @@
+"""
+Compiled program format.
+
+A parsed program is assembled into a compact binary stream which can be loaded back
+without parsing the assembly source. The file starts with a header followed by the
+tables of instruction and register names used by the program, so a file does not
+depend on the numbering of the instruction set:
+
+    magic "XSIM" | version | names count | names... | registers count | registers...
+    | instructions count | instructions...
+
+Every instruction is an opcode, the index of its name in the names table, followed
+by its operands count and operands. Operands start with a tag byte:
+
+    CONST  unsigned LEB128 value
+    REG    register index
+    ADDR   inner operand
+    EXPR   operator byte, left operand, right operand
+    STRING LEB128 length, utf-8 bytes
+
+Numbers of the header and of the tables are LEB128 encoded as well.
+"""
+
+import contextlib
+import gc
+import hashlib
+import mmap
+import os
+import typing
+from pathlib import Path
+
+from xsim.core import asm_parser
+
+MAGIC = b"XSIM"
+VERSION = 1
+SUFFIX = ".xsimb"
+PARAMS = ("destination", "source")
+# opcodes and register operands index the names tables with a byte
+MAX_NAMES = 0x100
+
+TAG_CONST = 0
+TAG_REG = 1
+TAG_ADDR = 2
+TAG_EXPR = 3
+TAG_STRING = 4
+
+
+def encode_number(value: int, output: bytearray):
+    if value < 0:
+        raise ValueError(f"Cannot encode negative number: {value}")
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            output.append(byte | 0x80)
+        else:
+            output.append(byte)
+            return
+
+
+def encode_text(value: str, output: bytearray):
+    data = value.encode("utf-8")
+    encode_number(len(data), output)
+    output += data
+
+
+class ProgramReader:
+    """Decodes a compiled program from any buffer, such as a memory mapped file."""
+
+    def __init__(self, buffer: typing.Union[bytes, bytearray, memoryview, mmap.mmap]):
+        self.buffer = buffer
+        self.position = 0
+
+    def number(self) -> int:
+        buffer = self.buffer
+        position = self.position
+        byte = buffer[position]
+        position += 1
+        value = byte & 0x7F
+        shift = 7
+        while byte & 0x80:
+            byte = buffer[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+        self.position = position
+        return value
+
+    def byte(self) -> int:
+        value = self.buffer[self.position]
+        self.position += 1
+        return value
+
+    def text(self) -> str:
+        size = self.number()
+        start = self.position
+        self.position += size
+        return bytes(self.buffer[start : self.position]).decode("utf-8")
+
+    def operand(self, registers: typing.List[str]) -> tuple:
+        tag = self.byte()
+        if tag == TAG_CONST:
+            return "CONST", self.number()
+        if tag == TAG_REG:
+            return "REG", registers[self.byte()]
+        if tag == TAG_ADDR:
+            return "ADDR", self.operand(registers)
+        if tag == TAG_EXPR:
+            operator = chr(self.byte())
+            left = self.operand(registers)
+            return "EXPR", (left, operator, self.operand(registers))
+        if tag == TAG_STRING:
+            return "STRING", self.text()
+        raise ValueError(f"Unknown operand tag: {tag}")
+
+    def instruction(self, names: typing.List[str], registers: typing.List[str]) -> dict:
+        name = names[self.byte()]
+        params = {}
+        for index in range(self.byte()):
+            params[PARAMS[index]] = self.operand(registers)
+        return {"name": name, "params": params}
+
+    def header(self) -> typing.Tuple[typing.List[str], typing.List[str]]:
+        """Checks the header and returns the instruction and register names."""
+        if bytes(self.buffer[: len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a compiled program")
+        self.position = len(MAGIC)
+        version = self.byte()
+        if version != VERSION:
+            raise ValueError(f"Unsupported program version: {version}")
+        names = [self.text() for _ in range(self.number())]
+        registers = [self.text() for _ in range(self.number())]
+        return names, registers
+
+    def program(self) -> typing.List[dict]:
+        names, registers = self.header()
+        instructions = []
+        # decoding allocates only live containers, the collections triggered while
+        # they are created find nothing to free and make loading 100k instructions
+        # about twice slower (benchmarks/program_loading.py)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(self.number()):
+                instructions.append(self.instruction(names, registers))
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return instructions
+
+    def renumber_operand(self, registers: typing.List[int]):
+        """Skips an operand of a mutable buffer, renumbering its registers."""
+        tag = self.byte()
+        if tag == TAG_CONST:
+            self.number()
+        elif tag == TAG_REG:
+            self.buffer[self.position] = registers[self.buffer[self.position]]
+            self.position += 1
+        elif tag == TAG_ADDR:
+            self.renumber_operand(registers)
+        elif tag == TAG_EXPR:
+            self.position += 1
+            self.renumber_operand(registers)
+            self.renumber_operand(registers)
+        elif tag == TAG_STRING:
+            size = self.number()
+            self.position += size
+        else:
+            raise ValueError(f"Unknown operand tag: {tag}")
+
+    def code(
+        self,
+        opcode_index: typing.Callable[[str], int],
+        register_index: typing.Callable[[str], int],
+    ) -> typing.Tuple[typing.List[int], bytearray]:
+        """
+        Instructions of the program as a processor encodes them (see
+        `encode_instruction`) and the offset of each of them. The instructions are
+        copied as they are, only the opcodes and the register operands are renumbered
+        from the names tables of the file to the indices of the processor.
+        """
+        names, register_names = self.header()
+        opcodes = [opcode_index(name) for name in names]
+        registers = [register_index(name) for name in register_names]
+        count = self.number()
+        reader = ProgramReader(bytearray(self.buffer[self.position :]))
+        stream = reader.buffer
+        starts = []
+        for _ in range(count):
+            position = reader.position
+            starts.append(position)
+            stream[position] = opcodes[stream[position]]
+            reader.position = position + 2
+            for _ in range(stream[position + 1]):
+                reader.renumber_operand(registers)
+        del stream[reader.position :]
+        return starts, stream
+
+
+def encode_operand(
+    operand: tuple, register_index: typing.Callable[[str], int], output: bytearray
+):
+    operand_type, value = operand
+    if operand_type == "CONST":
+        output.append(TAG_CONST)
+        encode_number(value, output)
+    elif operand_type == "REG":
+        output.append(TAG_REG)
+        output.append(register_index(value))
+    elif operand_type == "ADDR":
+        output.append(TAG_ADDR)
+        encode_operand(value, register_index, output)
+    elif operand_type == "EXPR":
+        left, operator, right = value
+        output.append(TAG_EXPR)
+        output.append(ord(operator))
+        encode_operand(left, register_index, output)
+        encode_operand(right, register_index, output)
+    elif operand_type == "STRING":
+        output.append(TAG_STRING)
+        encode_text(value, output)
+    else:
+        raise ValueError(f"Unknown operand type: {operand_type}")
+
+
+def encode_instruction(
+    instruction: dict,
+    opcode: int,
+    register_index: typing.Callable[[str], int],
+    output: bytearray,
+):
+    """Appends the opcode, the operands count and the operands of an instruction."""
+    params = instruction["params"]
+    operands = [params[name] for name in PARAMS if name in params]
+    output.append(opcode)
+    output.append(len(operands))
+    for operand in operands:
+        encode_operand(operand, register_index, output)
+
+
+def assemble(instructions: typing.List[dict]) -> bytes:
+    """Encodes parsed instructions into the compiled program format."""
+    names: typing.Dict[str, int] = {}
+    registers: typing.Dict[str, int] = {}
+    stream = bytearray()
+
+    def register_index(name: str) -> int:
+        return registers.setdefault(name, len(registers))
+
+    for instruction in instructions:
+        opcode = names.setdefault(instruction["name"], len(names))
+        encode_instruction(instruction, opcode, register_index, stream)
+
+    if len(names) > MAX_NAMES or len(registers) > MAX_NAMES:
+        raise ValueError("Too many instruction or register names")
+
+    output = bytearray(MAGIC)
+    output.append(VERSION)
+    for table in (names, registers):
+        encode_number(len(table), output)
+        for name in table:
+            encode_text(name, output)
+    encode_number(len(instructions), output)
+    return bytes(output + stream)
+
+
+def disassemble(buffer) -> typing.List[dict]:
+    """Decodes a compiled program back into instructions."""
+    return ProgramReader(buffer).program()
+
+
+def load_binary(path: typing.Union[str, Path]) -> typing.List[dict]:
+    """Loads a compiled program through a memory mapped file."""
+    with (
+        Path(path).open("rb") as file,
+        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer,
+    ):
+        return disassemble(buffer)
+
+
+def load_code(
+    path: typing.Union[str, Path],
+    opcode_index: typing.Callable[[str], int],
+    register_index: typing.Callable[[str], int],
+) -> typing.Tuple[typing.List[int], bytearray]:
+    """
+    Loads a compiled program through a memory mapped file as the encoded
+    instructions of a processor, see `ProgramReader.code`.
+    """
+    with (
+        Path(path).open("rb") as file,
+        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer,
+    ):
+        return ProgramReader(buffer).code(opcode_index, register_index)
+
+
+def save_binary(path: typing.Union[str, Path], instructions: typing.List[dict]):
+    """Writes a compiled program, the file is replaced atomically."""
+    path = Path(path)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(assemble(instructions))
+    temporary.replace(path)
+
+
+def cache_key(source: bytes, register_names: typing.Iterable[str]) -> str:
+    """Identifies the compiled form of a source for a register configuration."""
+    digest = hashlib.sha256()
+    digest.update(f"{VERSION}:".encode())
+    digest.update(asm_parser.AssemblyParser.Grammar.source().encode("utf-8"))
+    digest.update(",".join(sorted(set(register_names or ()))).encode("utf-8"))
+    digest.update(b":")
+    digest.update(source)
+    return digest.hexdigest()
+
+
+def cache_file(source: bytes, register_names: typing.Iterable[str]) -> Path:
+    return asm_parser.cache_directory() / (
+        f"program-{cache_key(source, register_names)[:24]}{SUFFIX}"
+    )
+
+
+def load(
+    path: typing.Union[str, Path],
+    register_names: typing.Iterable[str],
+    use_cache: bool = True,
+) -> typing.List[dict]:
+    """
+    Loads a program, either compiled or assembly source.
+
+    Assembly sources are compiled once and the result is cached, keyed by the hash
+    of the source and the register names, so the next runs skip the parsing. Nothing
+    is cached when the cache directory is not private to the user.
+    """
+    path = Path(path)
+    source = path.read_bytes()
+    if source.startswith(MAGIC):
+        return disassemble(source)
+
+    if not use_cache or asm_parser.private_cache_directory() is None:
+        return asm_parser.AssemblyParser.loads(
+            source.decode("utf-8"), register_names=register_names
+        )
+
+    compiled = cache_file(source, register_names)
+    if compiled.exists():
+        try:
+            return load_binary(compiled)
+        except (OSError, ValueError, IndexError):
+            pass
+
+    instructions = asm_parser.AssemblyParser.loads(
+        source.decode("utf-8"), register_names=register_names
+    )
+    with contextlib.suppress(OSError):
+        save_binary(compiled, instructions)
+    return instructions
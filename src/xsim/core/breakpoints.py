@@ -0,0 +1,172 @@
+import bisect
+import functools
+import typing
+
+from xsim.core import memory as memory_module
+
+# names usable in the conditions besides the registers
+CONDITION_NAMES = {"memory"}
+# largest access made by a single instruction
+WORD_SIZE = 2
+
+
+def view_start(address: int) -> int:
+    """
+    Start of the view watching an address. The hooks of a single access are fired
+    by the memories holding its first byte, the view starts before the address to
+    see the words overlapping it.
+    """
+    return max(0, address - WORD_SIZE + 1)
+
+
+class Breakpoints:
+    """
+    Breakpoints and watchpoints of a processor.
+
+    A breakpoint stops a run before the instruction at its address is executed,
+    when its condition, a Python expression over the registers and the `memory`
+    bytes such as ``r1 == 0x10 and memory[0x300] > 2``, is true or when it has
+    none. The next run goes past the breakpoint it stopped at, which stops the runs
+    again once the instruction is executed. The addresses are kept in a set so a run
+    only evaluates the conditions of the addresses it reaches, and in a sorted list
+    telling the translated blocks holding none of them, which keep being used.
+
+    A watchpoint stops a run after the instruction reading or writing a range of the
+    memory. It subscribes to a view of the range, so the accesses to the other
+    addresses do not go through the memory hooks, and the view is removed with the
+    last watchpoint of the range. The last hit is kept in `hit`.
+    """
+
+    def __init__(self, target):
+        self.processor = target
+        self.addresses: typing.Set[int] = set()
+        self.sorted: typing.List[int] = []
+        self.conditions: typing.Dict[int, typing.Any] = {}
+        self.watchpoints: typing.Dict[typing.Tuple[int, int, str], typing.Callable] = {}
+        self.views: typing.Dict[typing.Tuple[int, int], memory_module.MemoryView] = {}
+        self.hit: typing.Optional[typing.Tuple[str, int]] = None
+        # breakpoint the last run stopped at, until the next instruction is executed
+        self.stopped_at: typing.Optional[int] = None
+
+    def __contains__(self, address: int) -> bool:
+        return address in self.addresses
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def __iter__(self):
+        return iter(self.sorted)
+
+    def add(self, address: int, condition: typing.Optional[str] = None):
+        """Sets a breakpoint, replacing the condition of an existing one."""
+        code = None
+        if condition:
+            code = compile(condition, f"<breakpoint {address}>", "eval")
+            registers = self.processor.registers
+            for name in code.co_names:
+                if not (
+                    name in CONDITION_NAMES
+                    or name in registers.aliases
+                    or name.lower() in registers.resisters
+                ):
+                    raise ValueError(f"Unknown name in the condition: {name}")
+        self.conditions[address] = code
+        if address not in self.addresses:
+            self.addresses.add(address)
+            bisect.insort(self.sorted, address)
+
+    def discard(self, address: int):
+        if address in self.addresses:
+            self.addresses.remove(address)
+            self.sorted.remove(address)
+            del self.conditions[address]
+
+    def remove(self, address: int):
+        if address not in self.addresses:
+            raise KeyError(address)
+        self.discard(address)
+
+    def toggle(self, address: int) -> bool:
+        """Sets or removes the breakpoint at `address`, tells whether it is set."""
+        if address in self.addresses:
+            self.discard(address)
+            return False
+        self.add(address)
+        return True
+
+    def clear(self):
+        self.addresses.clear()
+        self.sorted.clear()
+        self.conditions.clear()
+        for key in list(self.watchpoints):
+            self.unwatch(*key)
+
+    def stops_at(self, address: int) -> bool:
+        """Tells whether the breakpoint at `address` stops the run."""
+        code = self.conditions.get(address)
+        if code is not None and not eval(
+            code,
+            {"__builtins__": {}, "memory": self.processor.memory.mv},
+            self.processor.registers,
+        ):
+            return False
+        self.hit = ("breakpoint", address)
+        return True
+
+    def stops_before(self, address: int, first: bool) -> bool:
+        """
+        Tells whether a run stops before the instruction at `address`, called before
+        every instruction. The `first` instruction of a run is executed when the
+        previous run stopped at its breakpoint, so a stopped run can be resumed.
+        """
+        resume, self.stopped_at = self.stopped_at, None
+        if first and address == resume:
+            return False
+        if address not in self.addresses or not self.stops_at(address):
+            return False
+        self.stopped_at = address
+        return True
+
+    def spans(self, first: int, stop: int) -> bool:
+        """Tells whether a breakpoint is set between `first` and `stop` excluded."""
+        index = bisect.bisect_left(self.sorted, first)
+        return index < len(self.sorted) and self.sorted[index] < stop
+
+    def watch(self, address: int, size: int = 1, kind: str = "write"):
+        """Stops the runs after an instruction accessing the memory range."""
+        if kind not in ("read", "write"):
+            raise ValueError(f"Invalid watchpoint kind: {kind}")
+        key = (address, size, kind)
+        if key in self.watchpoints:
+            return
+        start = view_start(address)
+        view = self.views.get((start, address + size))
+        if view is None:
+            view = self.views[start, address + size] = self.processor.memory.view(
+                start, address + size - start
+            )
+        callback = functools.partial(self.on_access, key)
+        self.watchpoints[key] = callback
+        if kind == "write":
+            view.on_write(callback)
+        else:
+            view.on_read(callback)
+
+    def unwatch(self, address: int, size: int = 1, kind: str = "write"):
+        callback = self.watchpoints.pop((address, size, kind))
+        key = (view_start(address), address + size)
+        view = self.views[key]
+        view.unsubscribe(callback, kind)
+        # the view is shared by the read and write watchpoints of the range
+        if not view.callbacks:
+            del self.views[key]
+            self.processor.memory.remove_view(view)
+
+    def on_access(self, key: typing.Tuple[int, int, str], offset: int, value):
+        address, size, kind = key
+        # writes give the written bytes and reads their size
+        first = view_start(address) + offset
+        last = first + (len(value) if kind == "write" else value)
+        if first < address + size and address < last:
+            self.hit = (kind, max(first, address))
+            self.processor.request_stop("watchpoint")
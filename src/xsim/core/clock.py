@@ -0,0 +1,132 @@
+import threading
+import time
+import typing
+
+from xsim.core import journal, processor
+
+
+class ProcessorClock:
+    """
+    Runs a processor in a background thread at a target frequency.
+
+    Every `slice_duration` seconds the thread executes, in a single batch, the
+    instructions due since the previous slice. When the host cannot keep up the
+    batches are capped to one slice worth of instructions so the processor simply
+    runs as fast as it can. Consumers such as a user interface sample the processor
+    state at their own rate instead of being notified per instruction.
+
+    Once a `journal` is set `back` undoes the instructions it recorded.
+    """
+
+    # instructions per batch when running at full speed
+    full_speed_batch = 10_000
+
+    def __init__(
+        self,
+        target: processor.ProcessorBase,
+        frequency: int,
+        slice_duration: float = 0.01,
+        on_stop: typing.Optional[
+            typing.Callable[[processor.ProcessorBase], None]
+        ] = None,
+    ):
+        self.processor = target
+        self.journal: typing.Optional[journal.Journal] = None
+        self.frequency = frequency
+        self.slice_duration = slice_duration
+        self.on_stop = on_stop
+        self.executed = 0
+        self.error: typing.Optional[Exception] = None
+        self.lock = threading.RLock()
+        self.resumed = threading.Event()
+        self.stopped = False
+        self.full_speed = False
+        self.thread: typing.Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self.resumed.is_set()
+
+    @property
+    def batch_limit(self) -> int:
+        return max(1, int(self.frequency * self.slice_duration))
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self.loop, name="xsim-processor-clock", daemon=True
+            )
+            self.thread.start()
+
+    def resume(self, full_speed: bool = False):
+        """
+        Runs the processor in the background thread, at the clock frequency or as
+        fast as possible with `full_speed`, until it halts, stops on a breakpoint or
+        an error, or is paused.
+        """
+        self.full_speed = full_speed
+        self.start()
+        self.resumed.set()
+
+    def pause(self):
+        self.resumed.clear()
+        self.processor.request_stop("pause")
+
+    def stop(self):
+        self.stopped = True
+        self.pause()
+        self.resumed.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def step(self, steps: int = 1) -> int:
+        """Executes instructions from the calling thread, used while paused."""
+        with self.lock:
+            executed = self.processor.run(max_steps=steps)
+        self.executed += executed
+        return executed
+
+    def back(self, steps: int = 1) -> int:
+        """Undoes the last instructions recorded by the journal, used while paused."""
+        if self.journal is None:
+            return 0
+        with self.lock:
+            undone = self.journal.back(steps)
+        self.executed -= undone
+        return undone
+
+    def loop(self):
+        credit = 0.0
+        while True:
+            self.resumed.wait()
+            if self.stopped:
+                break
+            last = time.perf_counter()
+            while self.resumed.is_set() and not self.stopped:
+                deadline = last + self.slice_duration
+                now = time.perf_counter()
+                if self.full_speed:
+                    credit = self.full_speed_batch
+                else:
+                    credit = min(
+                        credit + (now - last) * self.frequency, self.batch_limit
+                    )
+                last = now
+                if credit >= 1:
+                    with self.lock:
+                        try:
+                            executed = self.processor.run(max_steps=int(credit))
+                        except Exception as exc:
+                            # the error is kept for the consumer, the clock stops
+                            self.error = exc
+                            self.processor.stop_reason = "error"
+                            executed = 0
+                    credit -= executed
+                    self.executed += executed
+                    if self.processor.stop_reason not in ("max_steps", "pause"):
+                        self.resumed.clear()
+                        if self.on_stop is not None:
+                            self.on_stop(self.processor)
+                        break
+                time.sleep(max(0.0, deadline - time.perf_counter()))
@@ -9,9 +9,34 @@ SIGN_U64 = 0x80_00_00_00_00_00_00_00
 MAX_U128 = 0xFF_FF_FF_FF_FF_FF_FF_FF_FF_FF_FF_FF_FF_FF_FF_FF
 SIGN_U128 = 0x80_00_00_00_00_00_00_00_00_00_00_00_00_00_00_00
 
+# bits of the flags lookup tables
+FLAG_S = 0b100
+FLAG_Z = 0b010
+FLAG_P = 0b001
+
+
+def _flags_table(parity_table: bytes, sign: int) -> bytes:
+    """Sign, zero and parity flags of every value given its parity table."""
+    with_sign = bytes(bits | FLAG_S for bits in range(256))
+    table = parity_table[:sign] + parity_table[sign:].translate(with_sign)
+    return bytes([FLAG_Z | table[0]]) + table[1:]
+
+
+# parity of every 8 and 16 bits value, 1 when the number of set bits is even; a 16
+# bits value has an even parity when both of its bytes have the same parity
+PARITY_U8 = bytes(bin(value).count("1") % 2 ^ 1 for value in range(MAX_U8 + 1))
+_ROWS_U16 = (bytes(bit ^ 1 for bit in PARITY_U8), PARITY_U8)
+PARITY_U16 = b"".join(_ROWS_U16[even] for even in PARITY_U8)
+
+# sign, zero and parity flags of every 8 and 16 bits result
+SZP_U8 = _flags_table(PARITY_U8, SIGN_U8)
+SZP_U16 = _flags_table(PARITY_U16, SIGN_U16)
+
 
 def parity(value: int) -> bool:
     """Calculate parity of a given value."""
+    if 0 <= value <= MAX_U16:
+        return PARITY_U16[value] == 1
     return bin(value).count("1") % 2 == 0
 
 
@@ -1,4 +1,5 @@
 import abc
+import typing
 
 from xsim.core import processor
 
@@ -43,6 +44,12 @@ class InstructionSet:
     def get_instruction_names(self):
         return list(self.instruction_set.keys())
 
+    def get_opcodes(self) -> typing.Dict[str, int]:
+        """Numbering of the instructions used to encode programs in memory."""
+        return {
+            name: opcode for opcode, name in enumerate(sorted(self.instruction_set))
+        }
+
     def execute(self, instruction_name, **kwargs):
         instruction = self.get_instruction(instruction_name)
         if instruction is None:
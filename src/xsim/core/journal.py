@@ -0,0 +1,243 @@
+import collections
+import typing
+
+from xsim.core import processor
+
+# rough cost in bytes of the journal structures, used for the memory budget
+ENTRY_COST = 120
+WRITE_COST = 80
+REGISTER_COST = 70
+
+
+def entry_cost(entry: tuple) -> int:
+    writes, changed = entry[:2]
+    return ENTRY_COST + WRITE_COST * len(writes) + REGISTER_COST * len(changed)
+
+
+class Journal(processor.StepObserver):
+    """
+    History of the executed instructions allowing to step a processor backwards.
+
+    Every instruction adds an entry with the previous bytes of the memory it wrote,
+    the previous values of the registers it changed and the previous deferred flags,
+    so going back `n` instructions costs `n` small undo operations. A snapshot of
+    the processor (see `ProcessorBase.snapshot`) is also kept every
+    `checkpoint_interval` instructions, going back far enough restores the closest
+    one instead of undoing every entry after it. The oldest entries and snapshots
+    are dropped once the history exceeds `budget` bytes.
+
+    The memory writes are collected with a write hook on the memory, so they must go
+    through `write`, `write_block` and the like. The journal observes the runs of
+    the processor (see `ProcessorBase.observe`) until it is closed, the changes made
+    between two runs are undone with the instruction preceding them.
+    """
+
+    def __init__(
+        self,
+        target: processor.ProcessorBase,
+        budget: int = 16 * 1024 * 1024,
+        checkpoint_interval: int = 1024,
+    ):
+        self.processor = target
+        self.budget = budget
+        self.checkpoint_interval = checkpoint_interval
+        self.entries: typing.Deque[tuple] = collections.deque()
+        self.checkpoints: typing.Dict[int, bytes] = {}
+        # number of instructions executed since the journal started
+        self.position = 0
+        self.size = 0
+        self.recording = True
+        self.writes: typing.List[typing.Tuple[int, bytes]] = []
+
+        registers = target.registers
+        self.values = registers.values
+        self.by_slot = [None] * len(self.values)
+        for register in registers.resisters.values():
+            self.by_slot[register.slot] = register
+        self.deferred = [
+            registers.resisters[label]
+            for label in sorted(registers.deferred)
+            if label in registers.resisters
+        ]
+        # the mapped registers are written without the memory hooks
+        self.mapped = slice(
+            registers.memory.base, registers.memory.base + registers.memory.size
+        )
+        self.shadow = bytearray(target.memory.mv)
+        self.mark()
+        self.add_checkpoint()
+        target.memory.on_write(self.on_write)
+        target.observe(self)
+
+    @property
+    def first(self) -> int:
+        """Oldest position the processor can go back to."""
+        return self.position - len(self.entries)
+
+    def close(self):
+        """Stops recording the instructions and drops the history."""
+        self.processor.unobserve(self)
+        self.processor.memory.unsubscribe(self.on_write)
+        self.entries.clear()
+        self.checkpoints.clear()
+        self.size = 0
+
+    def on_write(self, address: int, values: bytes):
+        if not self.recording:
+            return
+        stop = address + len(values)
+        self.writes.append((address, bytes(self.shadow[address:stop])))
+        self.shadow[address:stop] = values
+
+    def start(self):
+        self.sync()
+
+    def record(self):
+        """Closes the entry of the instruction which just ran."""
+        values = self.values
+        previous = self.previous_values
+        changed = ()
+        if values != previous:
+            changed = tuple(
+                (slot, old)
+                for slot, (old, new) in enumerate(zip(previous, values))
+                if old != new
+            )
+            self.previous_values = list(values)
+        # a deferred update only holds values, it can be evaluated again once
+        # restored (see `DeferredRegister.defer`)
+        pending = [register.pending for register in self.deferred]
+        entry = (
+            tuple(self.writes),
+            changed,
+            self.previous_pending,
+            self.previous_halt,
+        )
+        self.previous_pending = pending
+        self.previous_halt = self.processor.halt
+        self.writes = []
+        self.shadow[self.mapped] = self.processor.memory.mv[self.mapped]
+
+        self.entries.append(entry)
+        self.size += entry_cost(entry)
+        self.position += 1
+        if not self.position % self.checkpoint_interval:
+            self.add_checkpoint()
+        if self.size > self.budget:
+            self.evict()
+
+    def fail(self):
+        # the writes of the failing instruction can still be undone
+        if self.writes or self.values != self.previous_values:
+            self.record()
+
+    def mark(self):
+        """Takes the current state as the one preceding the next instruction."""
+        self.writes = []
+        self.shadow[self.mapped] = self.processor.memory.mv[self.mapped]
+        self.previous_values = list(self.values)
+        self.previous_pending = [register.pending for register in self.deferred]
+        self.previous_halt = self.processor.halt
+
+    def fold(self):
+        """
+        Adds the changes made since the last recorded instruction, for example by
+        the devices or a debugger, to its entry so they are undone with it.
+        """
+        values = self.values
+        previous = self.previous_values
+        if self.entries and (self.writes or values != previous):
+            writes, changed, pending, halt = self.entries[-1]
+            slots = {slot for slot, _ in changed}
+            added = tuple(
+                (slot, old)
+                for slot, (old, new) in enumerate(zip(previous, values))
+                if old != new and slot not in slots
+            )
+            self.entries[-1] = (
+                writes + tuple(self.writes),
+                changed + added,
+                pending,
+                halt,
+            )
+            self.size += WRITE_COST * len(self.writes) + REGISTER_COST * len(added)
+        self.mark()
+
+    def sync(self):
+        """Records the changes made since the last recorded instruction."""
+        if not self.writes and self.values == self.previous_values:
+            return
+        self.fold()
+        # the snapshot of the current position misses the changes
+        if self.position in self.checkpoints:
+            self.size -= len(self.checkpoints.pop(self.position))
+            self.add_checkpoint()
+
+    def back(self, steps: int = 1) -> int:
+        """
+        Puts the processor back in the state it had `steps` instructions ago, or in
+        the oldest recorded state. Returns the number of instructions undone.
+        """
+        self.sync()
+        target = max(self.position - steps, self.first)
+        undone = self.position - target
+        checkpoint = min(
+            (
+                position
+                for position in self.checkpoints
+                if target <= position < self.position
+            ),
+            default=None,
+        )
+        if checkpoint is not None:
+            self.restore_checkpoint(checkpoint)
+        self.recording = False
+        try:
+            while self.position > target:
+                self.undo(self.entries.pop())
+        finally:
+            self.recording = True
+        self.mark()
+        return undone
+
+    def undo(self, entry: tuple):
+        writes, changed, pending, halt = entry
+        write_block = self.processor.memory.write_block
+        for address, values in reversed(writes):
+            write_block(address, values)
+            self.shadow[address : address + len(values)] = values
+        for slot, value in changed:
+            self.by_slot[slot].set(value)
+        for register, update in zip(self.deferred, pending):
+            register.pending = update
+        self.processor.halt = halt
+        self.shadow[self.mapped] = self.processor.memory.mv[self.mapped]
+        self.size -= entry_cost(entry)
+        # the snapshot of the undone state would be stale once the run resumes
+        self.size -= len(self.checkpoints.pop(self.position, b""))
+        self.position -= 1
+
+    def add_checkpoint(self):
+        snapshot = self.processor.snapshot()
+        self.checkpoints[self.position] = snapshot
+        self.size += len(snapshot)
+        # taking the snapshot applied the deferred flags
+        self.fold()
+
+    def restore_checkpoint(self, position: int):
+        """Restores the snapshot taken at `position`, dropping the later history."""
+        self.processor.restore(self.checkpoints[position])
+        self.shadow[:] = self.processor.memory.mv
+        while self.position > position:
+            self.size -= entry_cost(self.entries.pop())
+            self.position -= 1
+        for later in [item for item in self.checkpoints if item > position]:
+            self.size -= len(self.checkpoints.pop(later))
+
+    def evict(self):
+        """Drops the oldest history until the journal fits in its budget."""
+        while self.size > self.budget and self.entries:
+            self.size -= entry_cost(self.entries.popleft())
+            first = self.first
+            for position in [item for item in self.checkpoints if item < first]:
+                self.size -= len(self.checkpoints.pop(position))
@@ -1,7 +1,10 @@
+import array
 import itertools
+import threading
 import typing
 
-import intervaltree
+# the sub views of a memory are indexed by pages of 2**PAGE_BITS bytes
+PAGE_BITS = 8
 
 
 class Memory:
@@ -12,17 +15,40 @@ class Memory:
         memory: typing.Optional[typing.Union[memoryview, bytearray]] = None,
         origin=None,
     ):
+        self.setup(size, endianess, memory, origin)
+        # per address access limit, 0 when the address is not restricted
+        self.restricts = {
+            "access_at_time": array.array("I", [0]) * size,
+        }
+        # addresses of the root memory with at least one subscriber per hook kind,
+        # shared by all the views so unwatched accesses skip the hook dispatch
+        self.root: Memory = self
+        self.base = 0
+        self.watched: typing.Dict[str, bytearray] = {
+            "read": bytearray(size),
+            "write": bytearray(size),
+        }
+
+    def setup(
+        self,
+        size: int,
+        endianess: str,
+        memory: typing.Optional[typing.Union[memoryview, bytearray]],
+        origin,
+    ):
+        """Sets the attributes of the memories and of the views alike."""
         self.size = size
         self.endianess = endianess
         self.callbacks = []
         self.data = memory or bytearray(size)
         self.mv = memoryview(self.data)
-        self.sub_views = intervaltree.IntervalTree()
+        self.sub_views: typing.List[MemoryView] = []
+        self.pages: typing.List[typing.Tuple[MemoryView, ...]] = [()] * (
+            (size >> PAGE_BITS) + 1
+        )
         self.parent: typing.Optional[typing.Tuple[Memory, int]] = None
         self.origin = origin
-        self.restricts = {
-            "access_at_time": intervaltree.IntervalTree(),
-        }
+        self.restricted = False
 
     def validate_address(self, address: int, size: int = 1):
         if address < 0 or address >= self.size:
@@ -32,21 +58,27 @@ class Memory:
         return True
 
     def get_limit_access_at_time(self, address, size: int = 1) -> int:
-        bound = self.restricts["access_at_time"].overlap(address, address + size)
-        if not bound:
+        if size == 1 or not self.restricted:
             return size
-        interval = bound.pop()
-        limit = interval.data
-        if limit < size:
-            return limit
+        limits = [
+            limit
+            for limit in self.restricts["access_at_time"][address : address + size]
+            if limit
+        ]
+        if limits and min(limits) < size:
+            return min(limits)
         return size
 
     def limit_access_at_time(self, address: int = 0, size: int = None, limit: int = 1):
         size = size or self.size
         if self.parent:
-            return self.parent.limit_access_at_time(address + self.offset, size)
+            return self.parent.limit_access_at_time(address + self.offset, size, limit)
 
-        self.restricts["access_at_time"][address : address + size] = limit
+        stop = min(address + size, self.size)
+        self.restricts["access_at_time"][address:stop] = array.array("I", [limit]) * (
+            stop - address
+        )
+        self.restricted = True
 
     def view(
         self, address: int, size: int = 1, restrict_access_at_time=None
@@ -57,9 +89,36 @@ class Memory:
             memory_view.limit_access_at_time(
                 address=0, size=size, limit=restrict_access_at_time
             )
-        self.sub_views[address : address + size] = memory_view
+        self.sub_views.append(memory_view)
+        for page in range(
+            address >> PAGE_BITS, ((address + size - 1) >> PAGE_BITS) + 1
+        ):
+            self.pages[page] += (memory_view,)
         return memory_view
 
+    def remove_view(self, memory_view: "MemoryView"):
+        """
+        Removes a view created with `view`, its subscribers and those of its views
+        stop being called.
+        """
+        self.sub_views.remove(memory_view)
+        address, size = memory_view.offset, memory_view.size
+        for page in range(
+            address >> PAGE_BITS, ((address + size - 1) >> PAGE_BITS) + 1
+        ):
+            self.pages[page] = tuple(
+                item for item in self.pages[page] if item is not memory_view
+            )
+        if memory_view.callbacks or memory_view.sub_views:
+            for kind in self.watched:
+                self.root.rewatch(kind)
+
+    def views_at(self, address: int) -> typing.Iterator["MemoryView"]:
+        """Sub views containing the address."""
+        for memory_view in self.pages[address >> PAGE_BITS]:
+            if memory_view.offset <= address < memory_view.offset + memory_view.size:
+                yield memory_view
+
     def read(self, address: int, size: int = 1) -> int:
         assert self.validate_address(address, size)
         self.on_read_hook(address, size)
@@ -85,10 +144,16 @@ class Memory:
         return "\n".join(rows)
 
     def on_write_hook(self, address: int, values: list[int]):
-        self.on_hook(address, values, trace=[id(self)], kind="write")
+        if self.watched["write"][self.base + address]:
+            self.on_hook(address, values, trace=[id(self)], kind="write")
 
     def on_read_hook(self, address: int, size: int):
-        self.on_hook(address, size, trace=[id(self)], kind="read")
+        if self.watched["read"][self.base + address]:
+            self.on_hook(address, size, trace=[id(self)], kind="read")
+
+    def watch(self, kind: str):
+        """Marks the addresses of this memory in the index of watched addresses."""
+        self.watched[kind][self.base : self.base + self.size] = b"\x01" * self.size
 
     def on_hook(
         self, address, *args, trace: typing.Optional[list] = None, kind: str = "write"
@@ -100,13 +165,13 @@ class Memory:
             trace = [id(self)]
 
         for item in itertools.chain(
-            zip(itertools.repeat("subset"), self.sub_views[address]),
+            zip(itertools.repeat("subset"), self.views_at(address)),
             [("parent", (self.parent, self.offset) if self.parent else None)],
         ):
             i_kind, _value = item
             if i_kind == "subset":
-                memory = _value.data
-                new_addr = address - _value.begin
+                memory = _value
+                new_addr = address - _value.offset
             elif _value is not None:
                 memory = _value[0]
                 new_addr = address + _value[1]
@@ -118,14 +183,144 @@ class Memory:
             trace.append(id(memory))
             memory.on_hook(new_addr, *args, trace=trace, kind=kind)
 
+    def views_overlapping(self, address: int, size: int) -> typing.List["MemoryView"]:
+        """Sub views sharing at least one address with the range."""
+        stop = address + size
+        found = []
+        for page in range(address >> PAGE_BITS, ((stop - 1) >> PAGE_BITS) + 1):
+            for memory_view in self.pages[page]:
+                if memory_view in found:
+                    continue
+                if memory_view.offset < stop and address < (
+                    memory_view.offset + memory_view.size
+                ):
+                    found.append(memory_view)
+        return found
+
+    def is_watched(self, address: int, size: int, kind: str) -> bool:
+        start = self.base + address
+        return self.watched[kind].find(1, start, start + size) != -1
+
+    def on_range_hook(
+        self,
+        address: int,
+        access: typing.Union[bytes, int],
+        trace: typing.Optional[list] = None,
+        kind: str = "write",
+    ):
+        """
+        Fires the hooks of a block access once per memory sharing the range, with
+        the range clipped to each memory. The access is the written bytes or the
+        size of the read, which is what the callbacks receive, as for single
+        accesses.
+        """
+        for c_kind, callback in self.callbacks:
+            if c_kind == kind:
+                callback(address, access)
+        if trace is None:
+            trace = [id(self)]
+
+        size = len(access) if kind == "write" else access
+        for memory_view in self.views_overlapping(address, size):
+            if id(memory_view) in trace:
+                continue
+            trace.append(id(memory_view))
+            start = max(address, memory_view.offset)
+            stop = min(address + size, memory_view.offset + memory_view.size)
+            memory_view.on_range_hook(
+                start - memory_view.offset,
+                (
+                    access[start - address : stop - address]
+                    if kind == "write"
+                    else stop - start
+                ),
+                trace=trace,
+                kind=kind,
+            )
+
+        if self.parent and id(self.parent) not in trace:
+            trace.append(id(self.parent))
+            self.parent.on_range_hook(
+                address + self.offset, access, trace=trace, kind=kind
+            )
+
+    def write_block(self, address: int, buffer: typing.Union[bytes, bytearray]):
+        """
+        Writes the buffer with one slice assignment and fires a single write hook
+        for the whole range. Access limits do not apply to block transfers.
+        """
+        size = len(buffer)
+        if not size:
+            return
+        assert self.validate_address(address, size)
+        self.mv[address : address + size] = buffer
+        if self.is_watched(address, size, "write"):
+            self.on_range_hook(address, bytes(buffer), kind="write")
+
+    def read_block(self, address: int, size: int) -> bytes:
+        """Reads `size` bytes firing a single read hook for the whole range."""
+        if not size:
+            return b""
+        assert self.validate_address(address, size)
+        if self.is_watched(address, size, "read"):
+            self.on_range_hook(address, size, kind="read")
+        return self.mv[address : address + size].tobytes()
+
+    def fill(self, address: int, size: int, value: int = 0):
+        """Sets `size` bytes starting at the address to the byte value."""
+        self.write_block(address, bytes((value,)) * size)
+
+    def copy(self, source: int, destination: int, size: int):
+        """
+        Copies `size` bytes inside the memory, the ranges may overlap. A read hook
+        is fired for the source range and a write hook for the destination range.
+        """
+        if not size:
+            return
+        assert self.validate_address(source, size)
+        assert self.validate_address(destination, size)
+        if self.is_watched(source, size, "read"):
+            self.on_range_hook(source, size, kind="read")
+        self.mv[destination : destination + size] = self.mv[source : source + size]
+        if self.is_watched(destination, size, "write"):
+            self.on_range_hook(
+                destination,
+                self.mv[destination : destination + size].tobytes(),
+                kind="write",
+            )
+
     def on_write(self, callback):
         self.callbacks.append(("write", callback))
+        self.watch("write")
         return callback
 
     def on_read(self, callback):
         self.callbacks.append(("read", callback))
+        self.watch("read")
         return callback
 
+    def unsubscribe(self, callback, kind: str = "write"):
+        """
+        Removes a callback added with `on_write` or `on_read`, the addresses left
+        without subscriber are dropped from the index of watched addresses. Does
+        nothing when the callback is not subscribed.
+        """
+        if (kind, callback) not in self.callbacks:
+            return
+        self.callbacks.remove((kind, callback))
+        self.root.rewatch(kind)
+
+    def rewatch(self, kind: str):
+        """Rebuilds the index of watched addresses from the subscribers of the memory
+        and of its views."""
+        self.watched[kind][self.base : self.base + self.size] = bytes(self.size)
+        pending = [self]
+        while pending:
+            memory = pending.pop()
+            pending.extend(memory.sub_views)
+            if any(c_kind == kind for c_kind, _ in memory.callbacks):
+                memory.watch(kind)
+
     def __iter__(self):
         return iter(self.mv)
 
@@ -144,14 +339,52 @@ class Memory:
 
 class MemoryView(Memory):
     def __init__(self, memory: Memory, address: int, size: int, origin):
-        super().__init__(
-            size,
-            memory.endianess,
-            memory=memory.mv[address : address + size],
-            origin=origin,
-        )
+        self.setup(size, memory.endianess, memory.mv[address : address + size], origin)
         self.parent = memory
         self.offset = address
+        # the access limits and the watched addresses are kept by the root memory
+        self.restricts = {}
+        self.root = memory.root
+        self.base = memory.base + address
+        self.watched = memory.watched
+
+
+class DirtyTracker:
+    """
+    Collects the rows of a memory written since the last `collect`, so a consumer
+    such as a display can redraw only what changed once per frame.
+    """
+
+    def __init__(self, memory: Memory, row_size: int):
+        self.memory = memory
+        self.row_size = row_size
+        self.rows_count = -(-memory.size // row_size)
+        self.rows: typing.Set[int] = set()
+        # the writes may come from the clock thread while the rows are collected
+        self.lock = threading.Lock()
+        memory.on_write(self.on_write)
+
+    def on_write(self, address: int, values: bytes):
+        first = address // self.row_size
+        last = min(
+            (address + max(len(values), 1) - 1) // self.row_size, self.rows_count - 1
+        )
+        with self.lock:
+            self.rows.update(range(first, last + 1))
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.rows)
+
+    def mark_all(self):
+        with self.lock:
+            self.rows.update(range(self.rows_count))
+
+    def collect(self) -> typing.List[int]:
+        """Returns the sorted dirty rows and starts a new frame."""
+        with self.lock:
+            rows, self.rows = self.rows, set()
+        return sorted(rows)
 
 
 if __name__ == "__main__":
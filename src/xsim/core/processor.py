@@ -1,8 +1,18 @@
 import abc
+import functools
+import math
+import struct
 import typing
 
 from xsim.core import memory
 
+# snapshot layout: magic, memory size, unmapped registers size and halt flag, followed
+# by the memory and the unmapped registers bytes
+SNAPSHOT_MAGIC = b"XSNP"
+SNAPSHOT_HEADER = struct.Struct(">4sIIB")
+# struct codes of the register sizes
+SIZE_CODES = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
 
 class ProcessorRegister:
     def __init__(self, name, size, memory_view=None):
@@ -20,11 +30,104 @@ class ProcessorRegister:
         self.value.write(0, value, self.size)
 
 
+class FileRegister(ProcessorRegister):
+    """
+    Register whose value is held in the register file of `ProcessorRegisters`.
+
+    Reads come from the register file without going through the memory layer. Writes
+    update the register file and the bytes of the register memory view, so the
+    memory mapped registers stay visible to code reading main memory.
+    """
+
+    def __init__(self, name, size, memory_view, values: typing.List[int]):
+        super().__init__(name, size, memory_view)
+        # the register takes the next slot of the register file
+        self.values = values
+        self.slot = len(values)
+        values.append(0)
+        self.reload()
+
+    def get(self):
+        return self.values[self.slot]
+
+    def set(self, value):
+        self.value.mv[:] = value.to_bytes(self.size, self.value.endianess)
+        self.values[self.slot] = value
+
+    def reload(self):
+        """Refresh the register file after its bytes were written in memory."""
+        self.values[self.slot] = int.from_bytes(self.value.mv, self.value.endianess)
+
+    def packer(self) -> typing.Callable[[memoryview, int, int], None]:
+        """
+        `pack_into` writing a value as the bytes of the register, for the loops
+        inlining `set` because they write the register at every step.
+        """
+        order = ">" if self.value.endianess == "big" else "<"
+        return struct.Struct(order + SIZE_CODES[self.size]).pack_into
+
+
+class DeferredRegister(FileRegister):
+    """
+    Register whose updates can be computed when it is read instead of when they are
+    made, used for the flags which most instructions rewrite and few read.
+
+    `defer` records a function computing the new value from the current one and its
+    argument. Only the last update is kept, so an update must recompute every bit it
+    changes, and it must give the same value every time it is evaluated since the
+    journal restores it when stepping back. Registers mapped in memory are updated right away since the memory can
+    be read without going through the register, they clear `lazy`.
+    """
+
+    lazy = True
+
+    def __init__(self, name, size, memory_view, values: typing.List[int]):
+        self.pending: typing.Optional[tuple] = None
+        super().__init__(name, size, memory_view, values)
+
+    def defer(self, update: typing.Callable[[int, typing.Any], int], argument):
+        if self.lazy:
+            self.pending = (update, argument)
+        else:
+            self.set(update(self.values[self.slot], argument))
+
+    def materialize(self):
+        update, argument = self.pending
+        self.set(update(self.values[self.slot], argument))
+
+    def get(self):
+        if self.pending is not None:
+            self.materialize()
+        return self.values[self.slot]
+
+    def set(self, value):
+        self.pending = None
+        super().set(value)
+
+    def reload(self):
+        self.pending = None
+        super().reload()
+
+
 class ProcessorRegisters:
-    def __init__(self, memory_view: memory.MemoryView, registers=None):
+    def __init__(
+        self,
+        memory_view: memory.MemoryView,
+        registers=None,
+        deferred: typing.Sequence[str] = (),
+    ):
         self.memory = memory_view or memory.Memory(32)
-        self.resisters = {}
+        self.resisters: typing.Dict[str, FileRegister] = {}
         self.registers_addr = {}
+        self.values: typing.List[int] = []
+        self.aliases: typing.Dict[str, FileRegister] = {}
+        self.defaults: typing.Dict[str, int] = {}
+        self.deferred = set(deferred)
+        # registers which do not fit in the mapped memory
+        self.unmapped_memory = memory.Memory(0)
+        self.mapped_slots: typing.List[typing.Optional[FileRegister]] = [
+            None
+        ] * self.memory.size
         current_address = 0
         left_space = self.memory.size
         left_mapped = -1
@@ -34,11 +137,12 @@ class ProcessorRegisters:
             if size > left_space:
                 left_mapped = seq
                 break
-            self.resisters[label] = ProcessorRegister(
-                label, size, self.memory.view(current_address, size)
+            self.add_register(
+                register, self.memory.view(current_address, size), mapped=True
             )
-            if "default" in register:
-                self.resisters[label].set(register["default"])
+            self.mapped_slots[current_address : current_address + size] = [
+                self.resisters[label]
+            ] * size
             self.registers_addr[current_address] = label
             current_address += size
             left_space -= size
@@ -50,15 +154,55 @@ class ProcessorRegisters:
             )
             current_address = 0
             for register in unmapped_registers:
-                label = register["name"]
                 size = register["size"]
-                self.resisters[label] = ProcessorRegister(
-                    label, size, self.unmapped_memory.view(current_address, size)
+                self.add_register(
+                    register, self.unmapped_memory.view(current_address, size)
                 )
-                if "default" in register:
-                    self.resisters[label].set(register["default"])
                 current_address += size
 
+        self.memory.on_write(self.on_memory_write)
+
+    def add_register(
+        self, register: dict, memory_view: memory.MemoryView, mapped: bool = False
+    ):
+        label = register["name"]
+        if label in self.deferred:
+            self.resisters[label] = DeferredRegister(
+                label, register["size"], memory_view, self.values
+            )
+            self.resisters[label].lazy = not mapped
+        else:
+            self.resisters[label] = FileRegister(
+                label, register["size"], memory_view, self.values
+            )
+        self.aliases[label] = self.aliases[label.upper()] = self.resisters[label]
+        self.defaults[label] = register.get("default", 0)
+        if "default" in register:
+            self.resisters[label].set(register["default"])
+
+    def reset(self):
+        """Gives every register its default value."""
+        for label, value in self.defaults.items():
+            self.resisters[label].set(value)
+
+    def materialize(self):
+        """Applies the deferred updates, so the registers bytes hold their values."""
+        for label in self.deferred:
+            register = self.resisters.get(label)
+            if register is not None and register.pending is not None:
+                register.materialize()
+
+    def reload(self):
+        """Refreshes every register after its bytes were replaced."""
+        for register in self.resisters.values():
+            register.reload()
+
+    def on_memory_write(self, address: int, values: bytes):
+        # registers whose bytes were written through the memory are reloaded
+        for register in set(self.mapped_slots[address : address + len(values)]):
+            if register is not None:
+                register.reload()
+
     def take(
         self, register: typing.Union[int, str]
     ) -> typing.Optional[ProcessorRegister]:
@@ -66,7 +210,25 @@ class ProcessorRegisters:
             if register not in self.registers_addr:
                 return None
             register = self.registers_addr[register]
-        return self.resisters[register.lower()]
+        found = self.aliases.get(register)
+        if found is None:
+            found = self.resisters[register.lower()]
+        return found
+
+    def slot(self, register: typing.Union[int, str]) -> int:
+        """Index of the register in the `values` register file."""
+        return self.take(register).slot
+
+    def getter(self, register: typing.Union[int, str]) -> typing.Callable[[], int]:
+        """Fastest callable reading a register, used by the decoded instructions."""
+        found = self.take(register)
+        if isinstance(found, DeferredRegister) and found.lazy:
+            return found.get
+        return functools.partial(self.values.__getitem__, found.slot)
+
+    def setter(self, register: typing.Union[int, str]) -> typing.Callable[[int], None]:
+        """Callable writing a register, used by the decoded instructions."""
+        return self.take(register).set
 
     def __getitem__(self, item: typing.Union[int, str]):
         return self.take(item).get()
@@ -75,8 +237,30 @@ class ProcessorRegisters:
         self.take(key).set(value)
 
 
+class StepObserver:
+    """
+    Follows the instructions executed by `ProcessorBase.run` once added with
+    `ProcessorBase.observe`. `start` is called when a run starts, `record` after
+    every instruction and `fail` after an instruction raising an exception, before
+    it propagates out of the run.
+    """
+
+    def start(self):
+        pass
+
+    def record(self):
+        pass
+
+    def fail(self):
+        self.record()
+
+
 class ProcessorBase:
     dbc: typing.Optional[typing.Callable[["ProcessorBase"], None]] = None
+    # register holding the flags, its updates are deferred until it is read
+    flags_register = "sreg"
+    stop_request: typing.Optional[str] = None
+    stop_reason: typing.Optional[str] = None
 
     def __init__(self, rom_size: int, registers_spec: dict, flags_names=None):
         self.memory = memory.Memory(rom_size)
@@ -87,7 +271,10 @@ class ProcessorBase:
         self.flags_mask = {
             flag: 2**i for i, flag in enumerate(reversed(flags_names) or [])
         }
+        # masks clearing and setting the flags register, for each instruction class
+        self.flags_masks: typing.Dict[type, typing.Tuple[int, int]] = {}
         self.halt = False
+        self.observers: typing.List[StepObserver] = []
 
     def make_registers_space(self, registers_spec: dict):
         memory_mapped_start, memory_mapped_stop = registers_spec.get(
@@ -98,7 +285,56 @@ class ProcessorBase:
             memory_mapped = self.memory.view(memory_mapped_start, memory_mapped_size)
         else:
             memory_mapped = memory.Memory(0)
-        return ProcessorRegisters(memory_mapped, registers=registers_spec["registers"])
+        return ProcessorRegisters(
+            memory_mapped,
+            registers=registers_spec["registers"],
+            deferred=[self.flags_register],
+        )
+
+    def reset(self):
+        """Restores the registers to their default values and clears the halt."""
+        self.registers.reset()
+        self.halt = False
+        self.stop_request = None
+        self.stop_reason = None
+
+    def snapshot(self) -> bytes:
+        """
+        State of the processor as bytes: the memory, holding the mapped registers,
+        the registers which are not mapped and the halt flag. The snapshot is
+        immutable, so it can be restored any number of times, in this processor or
+        in another one with the same memory size and registers.
+        """
+        self.registers.materialize()
+        unmapped = self.registers.unmapped_memory
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, self.memory.size, unmapped.size, self.halt
+        )
+        return b"".join((header, self.memory.mv, unmapped.mv))
+
+    def restore(self, snapshot: bytes):
+        """
+        Puts the processor back in the state of a snapshot. The memory is replaced
+        without calling the memory hooks.
+        """
+        unmapped = self.registers.unmapped_memory
+        magic, memory_size, unmapped_size, halt = SNAPSHOT_HEADER.unpack_from(snapshot)
+        if (
+            magic != SNAPSHOT_MAGIC
+            or memory_size != self.memory.size
+            or unmapped_size != unmapped.size
+            or len(snapshot) != SNAPSHOT_HEADER.size + memory_size + unmapped_size
+        ):
+            raise ValueError("The snapshot does not match the processor layout")
+        data = memoryview(snapshot)
+        offset = SNAPSHOT_HEADER.size
+        self.restore_memory(data[offset : offset + memory_size])
+        unmapped.mv[:] = data[offset + memory_size :]
+        self.registers.reload()
+        self.halt = bool(halt)
+
+    def restore_memory(self, data: memoryview):
+        self.memory.mv[:] = data
 
     def attach_debugger(self, dbc):
         self.dbc = dbc
@@ -109,17 +345,128 @@ class ProcessorBase:
         """
         self.dbc = None
 
+    def observe(self, observer: StepObserver):
+        """Calls the observer after every instruction executed by `run`."""
+        self.observers.append(observer)
+
+    def unobserve(self, observer: StepObserver):
+        """Removes an observer, does nothing if it was not added."""
+        if observer in self.observers:
+            self.observers.remove(observer)
+
     @abc.abstractmethod
     def execute(self): ...
 
-    def run(self):
+    def stops_before(self, first: bool) -> bool:
+        """
+        Tells whether a breakpoint stops the run before the next instruction, the
+        `first` one of a run is executed when the previous run stopped there.
+        """
+        return False
+
+    def request_stop(self, reason: str = "event"):
+        """
+        Asks a batch run to return after the current instruction, meant to be
+        called from memory hooks or other events raised while executing.
+        """
+        self.stop_request = reason
+
+    def run_batch(
+        self,
+        max_steps: typing.Optional[int] = None,
+        until: typing.Optional[typing.Callable[["ProcessorBase"], bool]] = None,
+    ) -> int:
+        """
+        Executes instructions without handing the control back to the caller until
+        the processor halts, `max_steps` instructions ran, `until` returns true or a
+        stop is requested. Returns the number of executed instructions and leaves the
+        cause in `stop_reason`.
+        """
+        budget = math.inf if max_steps is None else max_steps
+        steps = 0
+        self.stop_request = None
+        self.stop_reason = "end"
+        executor = self.execute()
+        observers = self.observers
+        while steps < budget:
+            try:
+                next(executor)
+            except StopIteration:
+                break
+            steps += 1
+            for observer in observers:
+                observer.record()
+            if self.halt:
+                self.stop_reason = "halt"
+                break
+            if self.stop_request:
+                self.stop_reason = self.stop_request
+                break
+            if until is not None and until(self):
+                self.stop_reason = "until"
+                break
+        else:
+            self.stop_reason = "max_steps"
+        executor.close()
+        return steps
+
+    def run(
+        self,
+        max_steps: typing.Optional[int] = None,
+        until: typing.Optional[typing.Callable[["ProcessorBase"], bool]] = None,
+    ) -> int:
+        """
+        Runs the program, instructions are executed in batch unless a debugger is
+        attached, in which case it is called after every instruction. The observers
+        are told about the run and every instruction it executes.
+        """
+        observers = self.observers
+        if not observers:
+            return self.run_steps(max_steps, until)
+        for observer in observers:
+            observer.start()
+        try:
+            return self.run_steps(max_steps, until)
+        except Exception:
+            for observer in list(observers):
+                observer.fail()
+            raise
+
+    def run_steps(
+        self,
+        max_steps: typing.Optional[int] = None,
+        until: typing.Optional[typing.Callable[["ProcessorBase"], bool]] = None,
+    ) -> int:
+        if not self.dbc:
+            return self.run_batch(max_steps=max_steps, until=until)
+
+        budget = math.inf if max_steps is None else max_steps
+        steps = 0
+        self.stop_request = None
+        self.stop_reason = "end"
         self.executors = self.execute()
-        while True:
+        while steps < budget:
+            if self.stops_before(not steps):
+                self.stop_reason = "breakpoint"
+                break
             try:
                 nfo = next(self.executors)
             except StopIteration:
                 break
+            steps += 1
             if self.dbc:
                 self.dbc(self, nfo)
+            for observer in self.observers:
+                observer.record()
             if self.halt:
+                self.stop_reason = "halt"
+                break
+            if self.stop_request:
+                self.stop_reason = self.stop_request
                 break
+            if until is not None and until(self):
+                self.stop_reason = "until"
+                break
+        else:
+            self.stop_reason = "max_steps"
+        return steps
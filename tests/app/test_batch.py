@@ -0,0 +1,130 @@
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from xsim.app.batch import Job, Worker, main, run_jobs
+
+from .test_cli import CONFIG
+
+# fields depending on the time taken by the run and on the worker running it
+RUN_FIELDS = ("wall_time", "mips", "warm")
+
+
+def final_state(report: dict) -> dict:
+    return {key: value for key, value in report.items() if key not in RUN_FIELDS}
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name)
+        self.program = self.path / "program.s"
+        # r1 is mapped at the start of the memory
+        self.program.write_text('DB 0x100, "hi"\nADD r1, 0x5\nHALT\n')
+        self.looping = self.path / "loop.s"
+        self.looping.write_text("ADD r1, 0x1\nJMP 0x0\n")
+
+    def test_worker_reuses_processors(self):
+        worker = Worker()
+        job = Job(CONFIG, str(self.program), memory={0: b"\x00\x02"})
+        first = worker.run(job)
+        self.assertEqual(first["registers"]["r1"], 7)
+        self.assertFalse(first["warm"])
+
+        second = worker.run(Job(CONFIG, str(self.program)))
+        self.assertTrue(second["warm"])
+        self.assertEqual(second["registers"]["r1"], 5)
+        self.assertEqual(len(worker.processors), 1)
+        self.assertEqual(len(worker.programs), 1)
+
+        other = worker.run(Job(dict(CONFIG, memory_size=4096), str(self.program)))
+        self.assertFalse(other["warm"])
+        self.assertEqual(len(worker.processors), 2)
+        # the parsed program is shared by both configurations
+        self.assertEqual(len(worker.programs), 1)
+
+    def test_processors_are_evicted(self):
+        worker = Worker(max_processors=1)
+        worker.run(Job(CONFIG, str(self.program)))
+        worker.run(Job(CONFIG, str(self.looping), max_steps=10))
+        self.assertEqual(len(worker.processors), 1)
+        self.assertFalse(worker.run(Job(CONFIG, str(self.program)))["warm"])
+
+    def test_least_recently_used_processor_is_evicted(self):
+        worker = Worker(max_processors=2)
+        worker.run(Job(CONFIG, str(self.program)))
+        worker.run(Job(CONFIG, str(self.looping), max_steps=10))
+        self.assertTrue(worker.run(Job(CONFIG, str(self.program)))["warm"])
+        worker.run(Job(dict(CONFIG, memory_size=4096), str(self.program)))
+        self.assertTrue(worker.run(Job(CONFIG, str(self.program)))["warm"])
+        looping = worker.run(Job(CONFIG, str(self.looping), max_steps=10))
+        self.assertFalse(looping["warm"])
+
+    def test_changed_program_is_not_reused(self):
+        worker = Worker()
+        self.assertEqual(
+            worker.run(Job(CONFIG, str(self.program)))["registers"]["r1"], 5
+        )
+        self.program.write_text("ADD r1, 0x7\nHALT\n")
+        report = worker.run(Job(CONFIG, str(self.program)))
+        self.assertFalse(report["warm"])
+        self.assertEqual(report["registers"]["r1"], 7)
+
+    def test_pool_matches_current_process(self):
+        jobs = [
+            Job(CONFIG, str(self.looping), memory={0: bytes([0, index])}, max_steps=9)
+            for index in range(6)
+        ] + [Job(CONFIG, str(self.path / "missing.s"))]
+        expected = run_jobs(jobs, workers=0)
+        self.assertEqual(
+            [report["registers"]["r1"] for report in expected[:6]], [5, 6, 7, 8, 9, 10]
+        )
+        self.assertIn("FileNotFoundError", expected[-1]["error"])
+        reports = run_jobs(jobs, workers=2)
+        self.assertEqual(
+            [final_state(report) for report in reports],
+            [final_state(report) for report in expected],
+        )
+
+    def test_cli_jobs_file(self):
+        config = self.path / "config.json"
+        config.write_text(json.dumps({**CONFIG, "program_path": str(self.program)}))
+        jobs = self.path / "jobs.json"
+        jobs.write_text(
+            json.dumps(
+                [
+                    {"program": str(self.looping), "max_steps": 4},
+                    {"program": str(self.looping), "memory": {"0x0": "0010"}},
+                ]
+            )
+        )
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            code = main(
+                [
+                    "--config",
+                    str(config),
+                    "--jobs",
+                    str(jobs),
+                    "--workers",
+                    "0",
+                    "--max-steps",
+                    "10",
+                    "--memory",
+                    "0:2",
+                ]
+            )
+        reports = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(code, 0)
+        self.assertEqual([report["instructions"] for report in reports], [4, 10])
+        self.assertEqual([report["warm"] for report in reports], [False, True])
+        self.assertEqual(reports[0]["memory"]["dump"], {"0x0": "0002"})
+        self.assertEqual(reports[1]["memory"]["dump"], {"0x0": "0015"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from xsim.app.cli import main
+from xsim.components.basic.trace import TraceReader
+
+CONFIG = {
+    "memory_size": 2048,
+    "clock_speed": 60,
+    "registers_spec": {
+        "memory_mapped": [0, 7],
+        "registers": [
+            {"name": "r1", "size": 2},
+            {"name": "pc", "size": 2},
+            {"name": "sp", "size": 2},
+            {"name": "sreg", "size": 1},
+        ],
+    },
+    "flags_names": ["S", "Z", "C"],
+    "video_memory_size": 300,
+    "video_memory_location": 0x100,
+}
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name)
+        self.program = self.path / "program.s"
+        self.program.write_text('DB 0x100, "hi"\nMOV r1, 0x5\nHALT\n')
+        self.config = self.path / "config.json"
+        self.config.write_text(
+            json.dumps({**CONFIG, "program_path": str(self.program)})
+        )
+
+    def run_cli(self, *argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            code = main(["--config", str(self.config), *argv])
+        return code, [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_runs_config_program(self):
+        code, (report,) = self.run_cli()
+        self.assertEqual(code, 0)
+        self.assertEqual(report["instructions"], 3)
+        self.assertEqual(report["stop_reason"], "halt")
+        self.assertEqual(report["registers"]["r1"], 5)
+        self.assertTrue(report["memory"]["dump"]["0x100"].startswith("6869"))
+        self.assertGreater(report["mips"], 0)
+
+    def test_runs_several_programs(self):
+        looping = self.path / "loop.s"
+        looping.write_text("MOV r1, 0x1\nJMP 0x0\n")
+        code, reports = self.run_cli(
+            str(self.program), str(looping), "--max-steps", "10", "--memory", "0:2"
+        )
+        self.assertEqual(code, 0)
+        self.assertEqual(
+            [report["program"] for report in reports],
+            [
+                str(self.program),
+                str(looping),
+            ],
+        )
+        self.assertEqual(reports[1]["stop_reason"], "max_steps")
+        self.assertEqual(reports[1]["memory"]["dump"], {"0x0": "0001"})
+
+    def test_profile(self):
+        code, (report,) = self.run_cli("--profile")
+        self.assertEqual(code, 0)
+        profile = report["profile"]
+        self.assertEqual(profile["instructions"], 3)
+        self.assertEqual(profile["opcodes"], {"DB": 1, "MOV": 1, "HALT": 1})
+        self.assertEqual(profile["stacks"], {"main": 3})
+
+    def test_instrument(self):
+        errors = io.StringIO()
+        with contextlib.redirect_stderr(errors):
+            code, (report,) = self.run_cli("--instrument")
+        self.assertEqual(code, 0)
+        subsystems = report["instrumentation"]["subsystems"]
+        self.assertEqual(subsystems["decode"]["calls"], 3)
+        self.assertIn("decode", errors.getvalue())
+
+    def test_trace(self):
+        directory = self.path / "traces"
+        code, (report,) = self.run_cli("--trace", str(directory))
+        self.assertEqual(code, 0)
+        self.assertEqual(report["trace"], str(directory / "program.xtrace"))
+        with TraceReader(report["trace"]) as reader:
+            self.assertEqual(
+                [record.opcode for record in reader], ["DB", "MOV", "HALT"]
+            )
+
+    def test_reports_errors(self):
+        code, (report,) = self.run_cli(str(self.path / "missing.s"))
+        self.assertEqual(code, 1)
+        self.assertIn("FileNotFoundError", report["error"])
+
+    def test_code_address(self):
+        for code_address, error in ((0x600, None), (0x120, "video memory")):
+            with self.subTest(code_address=code_address):
+                self.config.write_text(
+                    json.dumps(
+                        {
+                            **CONFIG,
+                            "program_path": str(self.program),
+                            "code_address": code_address,
+                        }
+                    )
+                )
+                code, (report,) = self.run_cli()
+                if error is None:
+                    self.assertEqual(code, 0)
+                    self.assertEqual(report["registers"]["r1"], 5)
+                else:
+                    self.assertEqual(code, 1)
+                    self.assertIn(error, report["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
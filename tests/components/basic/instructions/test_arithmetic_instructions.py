@@ -23,6 +23,7 @@ class TestArithmeticInstructionSet(unittest.TestCase):
             "P": 0x20,
             "C": 0x10,
         }
+        self.context.flags_masks = {}
         self.sreg_mock.get.return_value = 0
 
     # Teste pentru clasa Add
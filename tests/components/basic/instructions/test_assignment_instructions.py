@@ -3,7 +3,7 @@ from unittest.mock import MagicMock, create_autospec
 
 from xsim.core import processor
 
-from src.xsim.components.basic.instructions.assignment import Mov
+from src.xsim.components.basic.instructions.assignment import Db, Mov
 
 
 class TestMovInstruction(unittest.TestCase):
@@ -12,6 +12,13 @@ class TestMovInstruction(unittest.TestCase):
         self.context.memory = MagicMock()
         self.context.registers = {}
 
+    def tearDown(self):
+        # the instruction registry is shared, so the mocks must not leak into the
+        # processors of other tests
+        for attribute in ("resolve_operand", "compute_require_size"):
+            if attribute in vars(Mov):
+                delattr(Mov, attribute)
+
     def test_mov_to_register(self):
         Mov.resolve_operand = MagicMock(return_value=42)
         Mov.compute_require_size = MagicMock(return_value=4)
@@ -48,5 +55,26 @@ class TestMovInstruction(unittest.TestCase):
         Mov.compute_require_size.assert_called_with(self.context, "UNKNOWN", "ebx")
 
 
+class TestDbInstruction(unittest.TestCase):
+    def setUp(self):
+        self.context = create_autospec(processor.ProcessorBase)
+        self.context.memory = MagicMock()
+
+    def test_db_const(self):
+        Db.execute(self.context, destination=("CONST", 0x100), source=("CONST", 0x41))
+        self.context.memory.write.assert_called_once_with(0x100, 0x41, size=1)
+
+    def test_db_string(self):
+        Db.execute(
+            self.context, destination=("CONST", 0x100), source=("STRING", "hello")
+        )
+        self.context.memory.write_block.assert_called_once_with(0x100, b"hello")
+        self.context.memory.write.assert_not_called()
+
+    def test_db_unknown_source(self):
+        with self.assertRaises(ValueError):
+            Db.execute(self.context, destination=("CONST", 0x100), source=("REG", "r0"))
+
+
 if __name__ == "__main__":
     unittest.main()
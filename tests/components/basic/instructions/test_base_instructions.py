@@ -45,6 +45,31 @@ class TestBaseInstruction(unittest.TestCase):
             BaseInstruction.resolve_operand(self.context, "UNKNOWN", "value", size=1)
         self.assertEqual(str(context.exception), "Unknown operand type: UNKNOWN")
 
+    def test_decode_operand_const(self):
+        getter = BaseInstruction.decode_operand(self.context, "CONST", 123)
+        self.assertEqual(getter(), 123)
+        self.assertEqual(getter(), 123)
+
+    def test_decode_operand_reg(self):
+        self.context.registers = MagicMock()
+        self.context.registers.getter.return_value.return_value = 10
+        getter = BaseInstruction.decode_operand(self.context, "REG", "eax")
+        self.assertEqual(getter(), 10)
+        self.context.registers.getter.assert_called_once_with("eax")
+
+    def test_decode_operand_addr_reg(self):
+        self.context.registers = MagicMock()
+        self.context.registers.getter.return_value.return_value = 2
+        self.context.memory.read.return_value = 42
+        getter = BaseInstruction.decode_operand(self.context, "ADDR", ("REG", "eax"))
+        self.assertEqual(getter(), 42)
+        self.context.memory.read.assert_called_once_with(2, 2)
+
+    def test_decode_operand_default(self):
+        getter = BaseInstruction.decode_operand(self.context, "UNKNOWN", "value")
+        with self.assertRaises(ValueError):
+            getter()
+
 
 class TestNopInstruction(unittest.TestCase):
     def test_nop_execute(self):
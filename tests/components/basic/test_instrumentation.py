@@ -0,0 +1,77 @@
+import unittest
+
+from xsim.components.basic.instrumentation import SUBSYSTEMS, Instrumentation
+from xsim.core import memory
+
+from tests.helpers import PROGRAMS, make_processor, run
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_runs_are_unchanged(self):
+        for name, source in PROGRAMS.items():
+            for translate_blocks in (False, True):
+                with self.subTest(program=name, translate_blocks=translate_blocks):
+                    expected = run(make_processor(source, translate_blocks), 500)
+                    processor = make_processor(source, translate_blocks)
+                    processor.enable_instrumentation()
+                    try:
+                        self.assertEqual(run(processor, 500), expected)
+                    finally:
+                        processor.disable_instrumentation()
+
+    def test_subsystems_are_measured(self):
+        processor = make_processor(PROGRAMS["memory"], True)
+        processor.memory.view(0x300, 2).on_write(lambda *args: None)
+        instrumentation = processor.enable_instrumentation()
+        processor.run(max_steps=200)
+        processor.registers["sreg"]
+        self.assertIs(processor.disable_instrumentation(), instrumentation)
+
+        report = instrumentation.report()
+        self.assertEqual(list(report["subsystems"]), list(SUBSYSTEMS) + ["other"])
+        for subsystem in SUBSYSTEMS:
+            self.assertGreater(report["subsystems"][subsystem]["calls"], 0, subsystem)
+        self.assertAlmostEqual(
+            sum(entry["seconds"] for entry in report["subsystems"].values()),
+            report["seconds"],
+        )
+        table = instrumentation.format_report()
+        self.assertTrue(table.startswith("subsystem"))
+        self.assertIn("memory hooks", table)
+
+        # the clock only runs while enabled
+        processor.run(max_steps=200)
+        self.assertEqual(instrumentation.report(), report)
+
+    def test_disable_restores_the_functions(self):
+        processor = make_processor(PROGRAMS["loop"], True)
+        # the instructions are looked up by name, as the processor does
+        base = processor.instruction_set.get_instruction("MOV").__mro__[1]
+        originals = [
+            base.__dict__["resolve_operand"],
+            memory.Memory.__dict__["on_hook"],
+        ]
+        processor.enable_instrumentation(["operands", "memory hooks"])
+        self.assertIsNot(base.__dict__["resolve_operand"], originals[0])
+        processor.disable_instrumentation()
+        self.assertEqual(
+            [base.__dict__["resolve_operand"], memory.Memory.__dict__["on_hook"]],
+            originals,
+        )
+        self.assertIsNone(processor.disable_instrumentation())
+
+    def test_one_instrumentation_at_a_time(self):
+        processor = make_processor(PROGRAMS["loop"], True)
+        processor.enable_instrumentation(["fetch"])
+        try:
+            with self.assertRaises(RuntimeError):
+                Instrumentation(processor).enable()
+        finally:
+            processor.disable_instrumentation()
+        with self.assertRaises(ValueError):
+            processor.enable_instrumentation(["network"])
+        self.assertIsNone(Instrumentation.active)
+
+
+if __name__ == "__main__":
+    unittest.main()
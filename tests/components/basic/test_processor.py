@@ -0,0 +1,415 @@
+import typing
+import unittest
+from unittest import mock
+
+from xsim.components.basic import instructions
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core.asm_parser import AssemblyParser
+from xsim.core.processor import ProcessorBase, StepObserver
+
+from tests.helpers import FLAGS_NAMES, REGISTERS_SPEC
+
+
+def make_processor(
+    source: str, code_address: typing.Optional[int] = None
+) -> BasicProcessor:
+    processor = BasicProcessor(
+        2048, REGISTERS_SPEC, flags_names=FLAGS_NAMES, code_address=code_address
+    )
+    processor.update_program(
+        AssemblyParser.loads(
+            source,
+            register_names=[item["name"] for item in REGISTERS_SPEC["registers"]],
+        )
+    )
+    return processor
+
+
+class TestBasicProcessorDecoding(unittest.TestCase):
+    def test_instructions_are_decoded_on_first_execution(self):
+        processor = make_processor("MOV r1, 0x5\nADD r1, r1\n")
+        self.assertEqual(processor.program, [processor.decode_current] * 2)
+
+        executor = processor.execute()
+        next(executor)
+        self.assertNotEqual(processor.program[0], processor.decode_current)
+        self.assertEqual(processor.program[1], processor.decode_current)
+
+        next(executor)
+        self.assertEqual(processor.registers["r1"], 10)
+
+    def test_update_program_keeps_program_identity(self):
+        processor = make_processor("NOP\n")
+        program = processor.program
+        processor.update_program([{"name": "NOP", "params": {}}] * 3)
+        self.assertIs(processor.program, program)
+        self.assertEqual(len(program), 3)
+
+    def test_execute_memory_operands(self):
+        processor = make_processor(
+            "MOV [0x300], 0x1234\nMOV r1, [0x301]\nADD [0x300], 0x1\n"
+        )
+        list(processor.execute())
+        self.assertEqual(processor.registers["r1"], 0x34)
+        # a constant address reads a byte and the result is stored as a word
+        self.assertEqual(processor.memory.read(0x300, 2), 0x13)
+
+    def test_execute_jumps(self):
+        processor = make_processor("MOV r1, 0x2\nJMP 0x3\nMOV r1, 0x3\nADD r1, 0x1\n")
+        list(processor.execute())
+        self.assertEqual(processor.registers["r1"], 3)
+
+    def test_execute_stack(self):
+        processor = make_processor(
+            "MOV sp, 0x400\nPUSH 0x7\nCALL 0x5\nPOP r2\nHALT\nPOP r1\nPUSH r1\nRET\n"
+        )
+        for _ in processor.execute():
+            if processor.halt:
+                break
+        self.assertEqual(processor.registers["r1"], 3)
+        self.assertEqual(processor.registers["r2"], 7)
+        self.assertEqual(processor.registers["sp"], 0x400)
+
+    def test_execute_instruction(self):
+        processor = make_processor("NOP\n")
+        processor.execute_instruction(
+            {
+                "name": "MOV",
+                "params": {"destination": ("REG", "r3"), "source": ("CONST", 9)},
+            }
+        )
+        self.assertEqual(processor.registers["r3"], 9)
+
+    def test_flags_are_computed_when_read(self):
+        processor = make_processor("MOV r1, 0x5\nSUB r1, 0x5\nCMP r1, 0x1\n")
+        eager = make_processor("NOP\n")
+        eager.registers["sreg"] = 0x8A
+        processor.registers["sreg"] = 0x8A
+        # `execute` updates the flags right away
+        for instruction_data in processor.program_data:
+            instruction = getattr(instructions, instruction_data["name"].capitalize())
+            instruction.execute(eager, **instruction_data["params"])
+
+        cmp = processor.instruction_set.get_instruction("CMP")
+        # the names of the flags are only read once per processor for the masks
+        cmp.flags_masks(processor)
+        with mock.patch.object(
+            cmp, "flags_compute", wraps=cmp.flags_compute
+        ) as flags_compute:
+            list(processor.execute())
+            flags_compute.assert_not_called()
+            self.assertEqual(processor.registers["sreg"], eager.registers["sreg"])
+        # CMP r1, 0x1 computes 0x1 - r1
+        flags_compute.assert_called_once_with(0x1)
+
+    def test_deferred_flags_can_be_evaluated_again(self):
+        processor = make_processor("MOV r1, 0xffff\nADD r1, 0x2\n")
+        list(processor.execute())
+        sreg = processor.registers.take("sreg")
+        pending = sreg.pending
+        flags = sreg.get()
+        # restoring the update, as undoing a step does, gives the same flags
+        sreg.set(0)
+        sreg.pending = pending
+        self.assertEqual(sreg.get(), flags)
+
+    def test_flags_masks_are_computed_once(self):
+        processor = make_processor("SUB r1, 0x1\nADD r1, 0x1\nJMP 0x0\n")
+        add = processor.instruction_set.get_instruction("ADD")
+        processor.run(max_steps=3)
+        processor.registers["sreg"]
+        masks = processor.flags_masks[add]
+        with mock.patch.object(add, "flags_compute") as flags_compute:
+            processor.run(max_steps=3)
+            processor.registers["sreg"]
+        # only the flags of the last result are computed, not the masks
+        flags_compute.assert_called_once_with(0x10000)
+        self.assertIs(processor.flags_masks[add], masks)
+        self.assertEqual(masks, (0b1110_1000, 0b0001_0111))
+
+    def test_errors_are_raised_when_executed(self):
+        processor = make_processor("MOV r1, 0x1\nMOV [r2 + 0x1], 0x1\n")
+        executor = processor.execute()
+        next(executor)
+        with self.assertRaises(ValueError):
+            next(executor)
+
+
+class TestBasicProcessorCode(unittest.TestCase):
+    SOURCE = "MOV r1, 0x1\nADD r1, 0x1\nJMP 0x1\n"
+    # the code is in the memory of the program, which can rewrite it
+    CODE_ADDRESS = 0x600
+
+    def make_processor(self, source: str) -> BasicProcessor:
+        return make_processor(source, code_address=self.CODE_ADDRESS)
+
+    def test_program_is_kept_out_of_memory(self):
+        processor = make_processor(self.SOURCE)
+        code = processor.code
+        self.assertIsNot(code.root, processor.memory)
+        self.assertFalse(processor.code_in_memory)
+        self.assertEqual(code.offset, 0)
+        self.assertEqual(processor.code_offsets[0], 3 * 2)
+        self.assertEqual(processor.code_memory.read(2, 2), processor.code_offsets[1])
+        self.assertEqual(
+            bytes(processor.memory.data[16:]), bytes(processor.memory.size - 16)
+        )
+        self.assertEqual(
+            processor.program_data,
+            AssemblyParser.loads(self.SOURCE, register_names=["r1"]),
+        )
+
+    def test_memory_is_left_to_the_program(self):
+        # the stack and the data use the top of the memory
+        processor = make_processor(
+            "MOV r1, 0x1234\nMOV [0x7f0], r1\nMOV sp, 0x800\nPUSH r1\nPUSH r1\n"
+            "POP r2\nHALT\n"
+        )
+        self.assertEqual(processor.run(), 7)
+        self.assertEqual(processor.stop_reason, "halt")
+        self.assertEqual(processor.registers["r2"], 0x1234)
+        self.assertEqual(processor.memory.read(0x7F0, 2), 0x1234)
+        self.assertEqual(processor.memory.read(0x7FC, 4), 0x12341234)
+
+    def test_long_programs_fit(self):
+        processor = make_processor("MOV r1, 0x1234\n" * 400 + "HALT\n")
+        self.assertGreater(processor.code.size, processor.memory.size)
+        self.assertEqual(processor.run(), 401)
+        self.assertEqual(
+            bytes(processor.memory.data[16:]), bytes(processor.memory.size - 16)
+        )
+
+    def test_code_address(self):
+        processor = make_processor(self.SOURCE, code_address=0x400)
+        self.assertTrue(processor.code_in_memory)
+        self.assertEqual(processor.code.offset, 0x400)
+        self.assertEqual(processor.code_offsets[0], 0x400 + 3 * 2)
+        self.assertEqual(processor.memory.read(0x402, 2), processor.code_offsets[1])
+        self.assertEqual(processor.run(max_steps=5), 5)
+        self.assertEqual(processor.registers["r1"], 3)
+
+    def test_program_must_fit(self):
+        processor = BasicProcessor(
+            64, REGISTERS_SPEC, flags_names=FLAGS_NAMES, code_address=0x20
+        )
+        with self.assertRaises(ValueError):
+            processor.update_program([{"name": "NOP", "params": {}}] * 40)
+        processor = BasicProcessor(
+            2048, REGISTERS_SPEC, flags_names=FLAGS_NAMES, code_address=0x4
+        )
+        with self.assertRaises(ValueError):
+            processor.update_program([{"name": "NOP", "params": {}}])
+
+    def test_self_modifying_code(self):
+        processor = self.make_processor(self.SOURCE)
+        processor.run(max_steps=3)
+        self.assertEqual(processor.registers["r1"], 2)
+        handler = processor.program[1]
+
+        # the constant is the last byte of the encoded ADD
+        processor.memory.write(processor.code_offsets[2] - 1, 0x5)
+        self.assertEqual(processor.program[1], processor.decode_current)
+        self.assertNotEqual(processor.program[1], handler)
+        processor.run(max_steps=1)
+        self.assertEqual(processor.registers["r1"], 7)
+        self.assertEqual(processor.program_data[1]["params"]["source"], ("CONST", 0x5))
+
+    def test_code_written_by_the_program(self):
+        # the code layout depends on the encoded address, a first load finds it
+        processor = self.make_processor(self.SOURCE)
+        address = processor.code_offsets[2] - 1
+        processor.update_program(
+            AssemblyParser.loads(
+                f"MOV r1, 0x1\nADD r1, 0x1\nDB {address}, 0x9\nJMP 0x1\n",
+                register_names=["r1"],
+            )
+        )
+        patched = processor.code_offsets[2] - 1
+        processor.update_program(
+            AssemblyParser.loads(
+                f"MOV r1, 0x1\nADD r1, 0x1\nDB {patched}, 0x9\nJMP 0x1\n",
+                register_names=["r1"],
+            )
+        )
+        self.assertEqual(processor.run(max_steps=6), 6)
+        # the second ADD runs the patched constant
+        self.assertEqual(processor.registers["r1"], 11)
+
+    def test_rewriting_the_table(self):
+        processor = self.make_processor(self.SOURCE)
+        processor.run(max_steps=3)
+        # the table entry of the JMP now points to the first instruction
+        processor.memory.write(processor.code.offset + 4, processor.code_offsets[0], 2)
+        self.assertEqual(processor.code_offsets[2], processor.code_offsets[0])
+        processor.run(max_steps=2)
+        self.assertEqual(processor.registers["r1"], 1)
+
+    def test_reset_keeps_the_decoded_program(self):
+        processor = self.make_processor(self.SOURCE)
+        fresh = bytes(processor.memory.data)
+        processor.memory.write(0x300, 0x7)
+        processor.run(max_steps=5)
+        handlers = list(processor.program)
+        processor.reset()
+        self.assertEqual(bytes(processor.memory.data), fresh)
+        self.assertEqual(processor.registers["pc"], 0)
+        self.assertEqual(processor.program, handlers)
+        self.assertEqual(processor.run(max_steps=5), 5)
+        self.assertEqual(processor.registers["r1"], 3)
+
+    def test_reset_restores_rewritten_code(self):
+        processor = self.make_processor(self.SOURCE)
+        fresh = bytes(processor.memory.data)
+        processor.run(max_steps=3)
+        processor.memory.write(processor.code_offsets[2] - 1, 0x5)
+        processor.memory.write(processor.code.offset + 4, processor.code_offsets[0], 2)
+        processor.reset()
+        self.assertEqual(bytes(processor.memory.data), fresh)
+        self.assertEqual(
+            processor.program_data, self.make_processor(self.SOURCE).program_data
+        )
+        self.assertEqual(processor.run(max_steps=5), 5)
+        self.assertEqual(processor.registers["r1"], 3)
+
+
+class TestBasicProcessorSnapshot(unittest.TestCase):
+    SOURCE = (
+        "MOV r1, 0x10\nMOV sp, 0x400\nPUSH r1\nADD r2, 0x3\nMUL r1, r2\n"
+        "MOV [0x300], r1\nJMP 0x3\n"
+    )
+
+    def state(self, processor: BasicProcessor):
+        return (
+            bytes(processor.memory.data),
+            [processor.registers[name] for name in processor.registers.resisters],
+            processor.halt,
+        )
+
+    def test_runs_fork_from_a_snapshot(self):
+        processor = make_processor(self.SOURCE)
+        processor.run(max_steps=4)
+        snapshot = processor.snapshot()
+        processor.run(max_steps=20)
+        expected = self.state(processor)
+
+        processor.restore(snapshot)
+        self.assertEqual(processor.registers["pc"], 4)
+        processor.run(max_steps=20)
+        self.assertEqual(self.state(processor), expected)
+
+        other = make_processor(self.SOURCE)
+        other.restore(snapshot)
+        other.run(max_steps=20)
+        self.assertEqual(self.state(other), expected)
+
+    def test_restore_rewritten_code(self):
+        processor = make_processor(self.SOURCE, code_address=0x600)
+        processor.run(max_steps=3)
+        snapshot = processor.snapshot()
+
+        # the constant of the ADD is the last byte of its encoding
+        processor.memory.write(processor.code_offsets[4] - 1, 0x5)
+        processor.run(max_steps=1)
+        self.assertEqual(processor.registers["r2"], 5)
+
+        processor.restore(snapshot)
+        self.assertEqual(processor.program[3], processor.decode_current)
+        processor.run(max_steps=1)
+        self.assertEqual(processor.registers["r2"], 3)
+        # the handlers are kept when the code did not change
+        handlers = list(processor.program)
+        processor.restore(snapshot)
+        self.assertEqual(processor.program, handlers)
+
+
+class TestBasicProcessorRun(unittest.TestCase):
+    LOOP = "MOV r1, 0x0\nADD r1, 0x1\nJMP 0x1\n"
+
+    def test_run_until_end(self):
+        processor = make_processor("MOV r1, 0x2\nADD r1, 0x3\n")
+        self.assertEqual(processor.run(), 2)
+        self.assertEqual(processor.stop_reason, "end")
+        self.assertEqual(processor.registers["r1"], 5)
+
+    def test_run_until_halt(self):
+        processor = make_processor("MOV r1, 0x2\nHALT\nMOV r1, 0x3\n")
+        self.assertEqual(processor.run(), 2)
+        self.assertEqual(processor.stop_reason, "halt")
+        self.assertEqual(processor.registers["r1"], 2)
+
+    def test_run_max_steps(self):
+        processor = make_processor(self.LOOP)
+        self.assertEqual(processor.run(max_steps=21), 21)
+        self.assertEqual(processor.stop_reason, "max_steps")
+        self.assertEqual(processor.registers["r1"], 10)
+        self.assertEqual(processor.run(max_steps=2), 2)
+        self.assertEqual(processor.registers["r1"], 11)
+
+    def test_run_until(self):
+        processor = make_processor(self.LOOP)
+        target = 4
+        steps = processor.run(until=lambda cpu: cpu.registers["r1"] == target)
+        self.assertEqual(steps, 8)
+        self.assertEqual(processor.stop_reason, "until")
+
+    def test_run_observers(self):
+        processor = make_processor("MOV r1, 0x1\nHALT\n")
+        observer = mock.Mock(spec=StepObserver)
+        processor.observe(observer)
+        # the halting instruction is recorded as well
+        self.assertEqual(processor.run(max_steps=10), 2)
+        self.assertEqual(
+            observer.mock_calls,
+            [mock.call.start(), mock.call.record(), mock.call.record()],
+        )
+
+        processor = make_processor("MOV r1, 0x0\nDIV r1, r1\n")
+        processor.observe(observer)
+        observer.reset_mock()
+        with self.assertRaises(ZeroDivisionError):
+            processor.run(max_steps=10)
+        self.assertEqual(
+            observer.mock_calls,
+            [mock.call.start(), mock.call.record(), mock.call.fail()],
+        )
+        processor.unobserve(observer)
+        processor.unobserve(observer)
+        self.assertEqual(processor.observers, [])
+
+    def test_run_breakpoint(self):
+        processor = make_processor(self.LOOP)
+        processor.breakpoints.add(2)
+        self.assertEqual(processor.run(), 2)
+        self.assertEqual(processor.stop_reason, "breakpoint")
+        self.assertEqual(processor.registers["pc"], 2)
+        # resuming executes the instruction at the breakpoint
+        self.assertEqual(processor.run(), 2)
+        self.assertEqual(processor.registers["r1"], 2)
+
+    def test_run_stop_request(self):
+        processor = make_processor("MOV r1, 0x1\nMOV [0x300], 0x1\nMOV r1, 0x2\n")
+        processor.memory.view(0x300, 4).on_write(
+            lambda *args: processor.request_stop("video")
+        )
+        self.assertEqual(processor.run(), 2)
+        self.assertEqual(processor.stop_reason, "video")
+        self.assertEqual(processor.registers["r1"], 1)
+
+    def test_run_with_debugger_steps_every_instruction(self):
+        processor = make_processor(self.LOOP)
+        seen = []
+        processor.attach_debugger(lambda cpu, nfo: seen.append(cpu.registers["pc"]))
+        self.assertEqual(processor.run(max_steps=4), 4)
+        self.assertEqual(seen, [1, 2, 1, 2])
+        self.assertEqual(processor.stop_reason, "max_steps")
+
+    def test_generic_batch_matches(self):
+        processor = make_processor(self.LOOP)
+        steps = ProcessorBase.run_batch(processor, max_steps=21)
+        self.assertEqual(steps, 21)
+        self.assertEqual(processor.stop_reason, "max_steps")
+        self.assertEqual(processor.registers["r1"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
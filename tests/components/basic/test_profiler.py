@@ -0,0 +1,149 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from xsim.core.asm_parser import AssemblyParser
+
+from tests.helpers import PROGRAMS, REGISTER_NAMES, make_processor, run
+
+
+def reference_counts(source: str, max_steps: int):
+    """Executions of every address, stepping a processor without profiling."""
+    processor = make_processor(source, False)
+    counts = [0] * len(processor.program)
+    for _ in range(max_steps):
+        address = processor.registers["pc"]
+        try:
+            if not processor.run(max_steps=1):
+                break
+        except Exception:
+            counts[address] += 1
+            break
+        counts[address] += 1
+    return counts
+
+
+class TestProfiler(unittest.TestCase):
+    def test_counts_match_unprofiled_runs(self):
+        for name, source in PROGRAMS.items():
+            expected_counts = reference_counts(source, 500)
+            for translate_blocks in (False, True):
+                with self.subTest(program=name, translate_blocks=translate_blocks):
+                    profiled = make_processor(source, translate_blocks)
+                    profiler = profiled.enable_profiling()
+                    expected = run(make_processor(source, translate_blocks), 500)
+                    self.assertEqual(run(profiled, 500), expected)
+                    self.assertEqual(profiler.counts, expected_counts)
+                    self.assertEqual(profiler.total[0], sum(expected_counts))
+
+    def test_report(self):
+        processor = make_processor(PROGRAMS["stack"], True)
+        profiler = processor.enable_profiling()
+        processor.run(max_steps=1000)
+        report = profiler.report()
+
+        self.assertEqual(report["instructions"], 1000)
+        self.assertEqual(sum(report["addresses"].values()), 1000)
+        opcodes = report["opcodes"]
+        self.assertEqual(
+            set(opcodes), {"MOV", "PUSH", "CALL", "POP", "JMP", "ADD", "RET"}
+        )
+        self.assertEqual(opcodes["CALL"], report["addresses"]["2"])
+        self.assertEqual(opcodes["RET"], opcodes["CALL"] - 1)
+
+        # the stack is outside of the registers, the code is not in the memory
+        self.assertEqual(
+            report["memory"]["other"],
+            {
+                "reads": opcodes["POP"] + opcodes["RET"],
+                "writes": opcodes["PUSH"] + opcodes["CALL"],
+            },
+        )
+        self.assertNotIn("code", report["memory"])
+        self.assertEqual(
+            report["calls"], [{"caller": 0, "callee": 6, "count": opcodes["CALL"]}]
+        )
+        routine = sum(report["addresses"][str(address)] for address in range(6, 10))
+        self.assertEqual(
+            report["stacks"], {"main": 1000 - routine, "main;pc6": routine}
+        )
+        self.assertEqual(
+            profiler.collapsed(), f"main {1000 - routine}\nmain;pc6 {routine}\n"
+        )
+
+    def test_nested_calls(self):
+        processor = make_processor(
+            "MOV sp, 0x400\nCALL 0x4\nCALL 0x7\nHALT\nCALL 0x7\nADD r1, 0x1\nRET\n"
+            "ADD r2, 0x1\nRET\n",
+            True,
+        )
+        profiler = processor.enable_profiling()
+        self.assertEqual(processor.run(), 11)
+        self.assertEqual(profiler.stacks, {(0,): 4, (0, 4): 3, (0, 4, 7): 2, (0, 7): 2})
+        self.assertEqual(profiler.calls, {(0, 4): 1, (4, 7): 1, (0, 7): 1})
+        self.assertEqual(
+            profiler.collapsed(),
+            "main 4\nmain;pc4 3\nmain;pc4;pc7 2\nmain;pc7 2\n",
+        )
+
+    def test_regions(self):
+        processor = make_processor(
+            "MOV r1, 0x0\nADD r1, 0x1\nMOV [0x300], r1\nMOV r2, [0x302]\nJMP 0x1\n",
+            True,
+        )
+        profiler = processor.enable_profiling({"data": (0x300, 2)})
+        processor.run(max_steps=41)
+        self.assertEqual(profiler.regions, ["other", "data"])
+        self.assertEqual(list(profiler.writes), [0, 10])
+        self.assertEqual(list(profiler.reads), [10, 0])
+
+        # the block transfers count as one access of the region they start in
+        processor.memory.fill(0x300, 4, 0xFF)
+        processor.memory.copy(0x300, 0x310, 2)
+        processor.memory.copy(0x310, 0x300, 2)
+        self.assertEqual(profiler.writes, [1, 12])
+        self.assertEqual(profiler.reads, [11, 1])
+        self.assertEqual(processor.memory.read_block(0x310, 2), b"\xff\xff")
+
+    def test_disable_profiling(self):
+        processor = make_processor(PROGRAMS["stack"], True)
+        memory = processor.memory
+        profiler = processor.enable_profiling()
+        processor.run(max_steps=100)
+        self.assertIsNot(processor.memory, memory)
+
+        self.assertIs(processor.disable_profiling(), profiler)
+        self.assertIs(processor.memory, memory)
+        self.assertIsNone(processor.disable_profiling())
+        processor.run(max_steps=100)
+        self.assertEqual(profiler.total[0], 100)
+        self.assertFalse(
+            any(hasattr(handler, "__wrapped__") for handler in processor.program)
+        )
+
+    def test_update_program_resets_counts(self):
+        processor = make_processor(PROGRAMS["loop"], True)
+        profiler = processor.enable_profiling()
+        processor.run(max_steps=100)
+        processor.update_program(AssemblyParser.loads(PROGRAMS["loop"], REGISTER_NAMES))
+        self.assertEqual(profiler.total[0], 0)
+        processor.reset()
+        processor.run(max_steps=10)
+        self.assertEqual(profiler.counts, [1, 5, 4])
+
+    def test_exports(self):
+        processor = make_processor(PROGRAMS["stack"], False)
+        profiler = processor.enable_profiling()
+        processor.run(max_steps=50)
+        with tempfile.TemporaryDirectory() as directory:
+            profiler.write_json(Path(directory) / "profile.json")
+            profiler.write_collapsed(Path(directory) / "profile.folded")
+            report = json.loads((Path(directory) / "profile.json").read_text())
+            collapsed = (Path(directory) / "profile.folded").read_text()
+        self.assertEqual(report, profiler.report())
+        self.assertEqual(collapsed, profiler.collapsed())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import contextlib
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from xsim.components.basic.trace import FOOTER, INDEX_ENTRY, TraceReader, TraceWriter
+
+from tests.helpers import PROGRAMS, REGISTERS_SPEC, make_processor
+
+# the memory mapped registers are written without the memory hooks
+MAPPED_STOP = REGISTERS_SPEC["memory_mapped"][1]
+
+
+def reference_records(source: str, max_steps: int):
+    """Address, changed registers and memory after every instruction, stepping."""
+    processor = make_processor(source, False)
+    registers = processor.registers
+    records = []
+    for _ in range(max_steps):
+        registers.materialize()
+        pc = registers["pc"]
+        before = list(registers.values)
+        try:
+            steps = processor.run(max_steps=1)
+        except Exception:
+            steps = 1
+        if not steps:
+            break
+        registers.materialize()
+        changed = {
+            label: registers.values[register.slot]
+            for label, register in registers.resisters.items()
+            if registers.values[register.slot] != before[register.slot]
+            and label != "pc"
+        }
+        records.append((pc, changed, bytes(processor.memory.data)))
+        if processor.halt or processor.stop_reason not in ("max_steps", None):
+            break
+    return records, bytes(make_processor(source, False).memory.data)
+
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name) / "run.xtrace"
+
+    def write_trace(self, source: str, max_steps: int, **kwargs):
+        processor = make_processor(source, True)
+        with (
+            TraceWriter(processor, self.path, **kwargs),
+            contextlib.suppress(Exception),
+        ):
+            processor.run(max_steps=max_steps)
+        return processor
+
+    def test_records_match_stepped_runs(self):
+        for name, source in PROGRAMS.items():
+            expected, memory = reference_records(source, 300)
+            for chunk_size in (16, 256, 65536):
+                with self.subTest(program=name, chunk_size=chunk_size):
+                    self.write_trace(source, 300, chunk_size=chunk_size)
+                    with TraceReader(self.path) as reader:
+                        records = list(reader)
+                    self.assertEqual(len(records), len(expected))
+                    data = bytearray(memory)
+                    for record, (pc, changed, after) in zip(records, expected):
+                        self.assertEqual(record.pc, pc)
+                        self.assertEqual(record.registers, changed)
+                        for address, values in record.writes:
+                            data[address : address + len(values)] = values
+                        self.assertEqual(data[MAPPED_STOP:], after[MAPPED_STOP:])
+
+    def test_opcodes_and_operands(self):
+        self.write_trace(PROGRAMS["stack"], 6)
+        with TraceReader(self.path) as reader:
+            self.assertEqual(
+                [(record.opcode, record.operands) for record in reader],
+                [
+                    ("MOV", (0, 0x400)),
+                    ("PUSH", (7,)),
+                    ("CALL", (6,)),
+                    # the routine pops the return address
+                    ("POP", (0,)),
+                    ("ADD", (3, 1)),
+                    ("PUSH", (4,)),
+                ],
+            )
+            self.assertEqual(reader[2].writes, [(0x3FC, b"\x00\x03")])
+
+    def test_seek(self):
+        self.write_trace(PROGRAMS["loop"], 1000, chunk_size=64)
+        with TraceReader(self.path) as reader:
+            records = list(reader)
+            self.assertGreater(len(reader.offsets), 3)
+            for index in (0, 5, len(records) // 2, len(records) - 1):
+                self.assertEqual(reader[index], records[index])
+            self.assertEqual(reader[-1], records[-1])
+            self.assertEqual(list(reader.records(7)), records[7:])
+            with self.assertRaises(IndexError):
+                reader[len(records)]
+
+    def test_trace_without_index(self):
+        self.write_trace(PROGRAMS["loop"], 500, chunk_size=128)
+        with TraceReader(self.path) as reader:
+            records = list(reader)
+        # drops the index and the footer, as when the writer did not close
+        size = self.path.stat().st_size
+        with self.path.open("rb") as file:
+            file.seek(size - FOOTER.size)
+            index_offset, chunks, _ = FOOTER.unpack(file.read())
+        self.assertEqual(size, index_offset + INDEX_ENTRY.size * chunks + FOOTER.size)
+        os.truncate(self.path, index_offset)
+        with TraceReader(self.path) as reader:
+            self.assertEqual(list(reader), records)
+        # the chunk being written is ignored
+        os.truncate(self.path, index_offset - 3)
+        with TraceReader(self.path) as reader:
+            self.assertLess(len(reader), len(records))
+            self.assertEqual(list(reader), records[: len(reader)])
+
+    def test_failing_instruction_is_recorded(self):
+        processor = make_processor(PROGRAMS["division by zero"], False)
+        writer = TraceWriter(processor, self.path)
+        with writer, self.assertRaises(ZeroDivisionError):
+            processor.run(max_steps=100)
+        with TraceReader(self.path) as reader:
+            self.assertEqual(reader[-1].opcode, "DIV")
+        self.assertNotIn(writer, processor.observers)
+        self.assertNotIn(("write", writer.on_write), processor.memory.callbacks)
+        self.assertFalse(processor.memory.is_watched(0x300, 1, "write"))
+
+    def test_flags_stay_deferred(self):
+        processor = self.write_trace(PROGRAMS["loop"], 5)
+        # the last instruction is the jump following an addition
+        self.assertIsNotNone(processor.registers.take("SREG").pending)
+        with TraceReader(self.path) as reader:
+            self.assertIn("sreg", reader[1].registers)
+
+    def test_not_a_trace(self):
+        self.path.write_bytes(b"not a trace file")
+        with self.assertRaises(ValueError):
+            TraceReader(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
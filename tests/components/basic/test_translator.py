@@ -0,0 +1,88 @@
+import unittest
+
+from tests.helpers import PROGRAMS, REGISTERS_SPEC, make_processor, run
+
+
+class TestTranslationCrossCheck(unittest.TestCase):
+    def assert_same_runs(self, source: str, batches, registers_spec=REGISTERS_SPEC):
+        interpreted = make_processor(source, False, registers_spec)
+        translated = make_processor(source, True, registers_spec)
+        for index, max_steps in enumerate(batches):
+            expected = run(interpreted, max_steps)
+            self.assertEqual(run(translated, max_steps), expected, f"batch {index}")
+            if expected[1] in ("end", "halt") or isinstance(expected[0], str):
+                break
+        return translated
+
+    def test_programs(self):
+        for name, source in PROGRAMS.items():
+            for batch_size in (1, 3, 7, 50, 1000):
+                with self.subTest(program=name, batch_size=batch_size):
+                    self.assert_same_runs(source, [batch_size] * (2000 // batch_size))
+
+    def test_program_counter_written_in_memory(self):
+        # the program counter is mapped after the general purpose registers
+        registers_spec = dict(REGISTERS_SPEC, memory_mapped=[0, 20])
+        translated = self.assert_same_runs(
+            "MOV r1, 0x0\nADD r1, 0x1\nMOV [0x10], 0x4\nADD r1, 0x2\nJMP 0x1\n",
+            [5, 100],
+            registers_spec,
+        )
+        self.assertEqual(translated.registers["r1"], 35)
+
+    def test_instruction_failing_to_decode(self):
+        # without flags register the arithmetic instructions cannot be decoded
+        registers_spec = dict(
+            REGISTERS_SPEC, registers=REGISTERS_SPEC["registers"][:-1]
+        )
+        for batches in ([1] * 5, [5]):
+            with self.subTest(batches=batches):
+                self.assert_same_runs(
+                    "MOV r1, 0x1\nMOV r2, 0x1\nADD r1, 0x1\nJMP 0x0\n",
+                    batches,
+                    registers_spec,
+                )
+
+    def test_blocks_are_used(self):
+        translated = self.assert_same_runs(PROGRAMS["stack"], [1000])
+        blocks = translated.translator.blocks
+        # blocks end with CALL and RET, the first one also holds the setup
+        self.assertEqual(blocks[0][1], 3)
+        self.assertEqual(blocks[1][1], 2)
+        self.assertEqual(blocks[6][1], 4)
+
+
+class TestBlockTranslator(unittest.TestCase):
+    def test_blocks_are_translated_when_hot(self):
+        processor = make_processor(PROGRAMS["loop"], translate_blocks=True)
+        translator = processor.translator
+        translator.threshold = 3
+        processor.run(max_steps=5)
+        self.assertEqual(list(translator.blocks), [])
+        processor.run(max_steps=20)
+        self.assertEqual(list(translator.blocks), [1])
+        self.assertEqual(processor.registers["r1"], 12)
+
+    def test_code_write_invalidates_blocks(self):
+        processor = make_processor(PROGRAMS["loop"], translate_blocks=True)
+        processor.run(max_steps=9)
+        self.assertIn(1, processor.translator.blocks)
+
+        # the constant is the last byte of the encoded ADD
+        processor.code_memory.write(processor.code_offsets[2] - 1, 0x5)
+        self.assertNotIn(1, processor.translator.blocks)
+        processor.run(max_steps=2)
+        self.assertEqual(processor.registers["r1"], 9)
+
+    def test_stop_request_returns_from_block(self):
+        processor = make_processor(PROGRAMS["countdown"], translate_blocks=True)
+        processor.memory.view(0x300, 2).on_write(
+            lambda *args: processor.request_stop("video")
+        )
+        self.assertEqual(processor.run(), 4)
+        self.assertEqual(processor.stop_reason, "video")
+        self.assertEqual(processor.registers["pc"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import functools
+import importlib.util
+import random
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core.asm_parser import AssemblyParser
+
+from tests.helpers import FLAGS_NAMES, REGISTERS_SPEC
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+if HAS_NUMPY:
+    from xsim.components.basic.vector import VectorProcessor
+
+SOURCE = Path(__file__).parent.parent.parent / "source.asm"
+REGISTER_NAMES = [item["name"] for item in REGISTERS_SPEC["registers"]]
+
+# the test programs with the ranges of their random inputs
+PROGRAMS = {
+    "source": (SOURCE.read_text(), {}),
+    "branches": (
+        "JZ 0x3\nADD r1, r2\nJMP 0x4\nMUL r1, 0x3\nMOV [0x300], r1\nSHL r3, 0x1\n"
+        "XOR r1, r3\nNOT r4, r4\nHALT\n",
+        {"sreg": 0x100, "r1": 0x100, "r2": 0x100, "r3": 0x24},
+    ),
+    "jump table": (
+        "MOV sp, 0x400\nJMP r1\nADD r2, 0x1\nADD r2, 0x2\nADD r2, 0x3\nPUSH r2\n"
+        "CALL 0x8\nHALT\nPOP r3\nPOP r4\nPUSH r3\nRET\n",
+        {"r1": 6, "r2": 0x10},
+    ),
+    "loop": (
+        "SUB r1, 0x1\nCMP r1, r2\nOR r3, r1\nAND r3, 0x1f\nSHR r3, r2\nJMP 0x0\n",
+        {"r1": 0x20, "r2": 3},
+    ),
+    "division by zero": ("DIV r1, r2\nADD r3, r1\nHALT\n", {"r1": 0x100, "r2": 3}),
+    "memory reads": (
+        "MOV r5, [r6]\nADD r4, [0x7]\nMOV r3, [r4]\nPOP r2\nRET\n",
+        {"r6": 10, "r4": 8, "sp": 2048},
+    ),
+    "memory writes": (
+        'MOV [r1], 0x1\nDB r2, "xy"\nDB [0x5], 0x7\nADD [r1], r2\nJMP 0x0\n',
+        {"r1": 2048, "r2": 2048},
+    ),
+}
+
+
+def make_processor(source: str, registers_spec: dict = REGISTERS_SPEC):
+    processor = BasicProcessor(2048, registers_spec, flags_names=FLAGS_NAMES)
+    processor.update_program(AssemblyParser.loads(source, REGISTER_NAMES))
+    return processor
+
+
+def state(processor: BasicProcessor):
+    return (
+        processor.halt,
+        bytes(processor.memory.data),
+        [processor.registers[name] for name in processor.registers.resisters],
+    )
+
+
+@unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+class TestVectorCrossCheck(unittest.TestCase):
+    LANES = 24
+
+    def assert_same_runs(self, source, inputs, batches, registers_spec=REGISTERS_SPEC):
+        lanes = self.LANES
+        vector = VectorProcessor(
+            lanes, functools.partial(make_processor, source, registers_spec)
+        )
+        scalars = [make_processor(source, registers_spec) for _ in range(lanes)]
+        rng = random.Random(lanes)
+        for name, limit in inputs.items():
+            values = [rng.randrange(limit) for _ in range(lanes)]
+            vector.set_register(name, values)
+            for scalar, value in zip(scalars, values):
+                scalar.registers[name] = value
+
+        for index, max_steps in enumerate(batches):
+            steps = vector.run(max_steps=max_steps)
+            for lane, scalar in enumerate(scalars):
+                with self.subTest(batch=index, lane=lane):
+                    try:
+                        expected = scalar.run(max_steps=max_steps)
+                    except Exception as exc:
+                        self.assertIsInstance(vector.errors[lane], type(exc))
+                        scalar.stop_reason = "error"
+                    else:
+                        self.assertEqual(steps[lane], expected)
+                    self.assertEqual(vector.stop_reasons[lane], scalar.stop_reason)
+                    self.assertEqual(state(vector.processor(lane)), state(scalar))
+        return vector
+
+    def test_programs(self):
+        for name, (source, inputs) in PROGRAMS.items():
+            with self.subTest(program=name):
+                self.assert_same_runs(source, inputs, [7, 150])
+
+    def test_registers_in_memory(self):
+        # every register is mapped, the program counter included
+        registers_spec = dict(REGISTERS_SPEC, memory_mapped=[0, 21])
+        for name in ("branches", "jump table", "memory reads"):
+            source, inputs = PROGRAMS[name]
+            with self.subTest(program=name):
+                self.assert_same_runs(
+                    source, inputs, [5, 100], registers_spec=registers_spec
+                )
+
+    def test_lanes_leave_lockstep_only_when_needed(self):
+        source, _ = PROGRAMS["division by zero"]
+        vector = VectorProcessor(4, functools.partial(make_processor, source))
+        vector.set_register("r1", 0x9)
+        vector.set_register("r2", [1, 0, 3, 0])
+        with mock.patch.object(
+            vector, "leave_lockstep", wraps=vector.leave_lockstep
+        ) as leave_lockstep:
+            steps = vector.run()
+        self.assertEqual(
+            [call.args[0] for call in leave_lockstep.call_args_list], [1, 3]
+        )
+        self.assertEqual(steps.tolist(), [3, 0, 3, 0])
+        self.assertEqual(vector.stop_reasons, ["halt", "error", "halt", "error"])
+        self.assertIsInstance(vector.errors[1], ZeroDivisionError)
+        self.assertEqual(vector.register("r3").tolist(), [9, 0, 3, 0])
+
+
+@unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+class TestVectorProcessor(unittest.TestCase):
+    def make_vector(self, source: str, lanes: int = 3):
+        return VectorProcessor(lanes, functools.partial(make_processor, source))
+
+    def test_registers_are_written_through_to_memory(self):
+        vector = self.make_vector("NOP\n")
+        vector.set_register("r1", [0x1234, 0x5, 0xFF00])
+        self.assertEqual(
+            vector.memory[:, 2:4].tolist(), [[0x12, 0x34], [0, 5], [255, 0]]
+        )
+        self.assertEqual(vector.processor(2).registers["r1"], 0xFF00)
+        with self.assertRaises(OverflowError):
+            vector.set_register("sreg", 0x100)
+
+    def test_code_is_shared_by_the_lanes(self):
+        vector = self.make_vector("MOV r1, 0x5\nHALT\n")
+        processor = make_processor("MOV r1, 0x5\nHALT\n")
+        for lane in range(vector.lanes):
+            self.assertEqual(bytes(vector.memory[lane]), bytes(processor.memory.data))
+        self.assertEqual(vector.run().tolist(), [2, 2, 2])
+        self.assertEqual(vector.register("r1").tolist(), [5, 5, 5])
+        self.assertTrue(vector.halted.all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,16 @@
+import os
+import tempfile
 import unittest
+from pathlib import Path
+from unittest import mock
 
 import coverage
 
-from src.xsim.core.asm_parser import AssemblyTransformer
+from src.xsim.core.asm_parser import (
+    AssemblyParser,
+    AssemblyTransformer,
+    private_cache_directory,
+)
 
 
 class TestAssemblyTransformer(unittest.TestCase):
@@ -25,6 +33,25 @@ class TestAssemblyTransformer(unittest.TestCase):
         result = self.transformer.reg("r1")
         self.assertEqual(result, ("REG", "r1"))
 
+    def test_validate(self):
+        instructions = [
+            {
+                "name": "MOV",
+                "params": {
+                    "destination": (
+                        "ADDR",
+                        ("EXPR", (("REG", "r1"), "+", ("CONST", 2))),
+                    ),
+                    "source": ("REG", "r2"),
+                },
+            }
+        ]
+        self.assertEqual(self.transformer.validate(instructions), instructions)
+
+        instructions[0]["params"]["source"] = ("REG", "r3")
+        with self.assertRaises(ValueError):
+            self.transformer.validate(instructions)
+
     def test_add(self):
         result = self.transformer.add(2, 3)
         expected = ("EXPR", (2, "+", 3))
@@ -103,6 +130,105 @@ class TestAssemblyTransformer(unittest.TestCase):
         self.assertEqual(result, expected)
 
 
+class TestAssemblyParser(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.environ = mock.patch.dict(
+            "os.environ", {"XSIM_CACHE_DIR": self.cache_dir.name}
+        )
+        self.environ.start()
+        self.parsers = AssemblyParser.Grammar._parsers
+        AssemblyParser.Grammar._parsers = {}
+
+    def tearDown(self):
+        AssemblyParser.Grammar._parsers = self.parsers
+        self.environ.stop()
+        self.cache_dir.cleanup()
+
+    def test_loads(self):
+        result = AssemblyParser.loads(
+            "NOP\n\nMOV [r2 + 0x10], 0x11\nMOV r1, [r2]\n",
+            register_names=["r1", "r2"],
+        )
+        expected = [
+            {"name": "NOP", "params": {}},
+            {
+                "name": "MOV",
+                "params": {
+                    "destination": (
+                        "ADDR",
+                        ("EXPR", (("REG", "r2"), "+", ("CONST", 16))),
+                    ),
+                    "source": ("CONST", 17),
+                },
+            },
+            {
+                "name": "MOV",
+                "params": {
+                    "destination": ("REG", "r1"),
+                    "source": ("ADDR", ("REG", "r2")),
+                },
+            },
+        ]
+        self.assertEqual(result, expected)
+
+    def test_load_source_file(self):
+        source = Path(__file__).parent.parent / "source.asm"
+        result = AssemblyParser.load(
+            source,
+            register_names=["r0", "r1", "r2", "r3", "r4", "r5", "r6", "r7", "sp"],
+        )
+        self.assertEqual(len(result), 52)
+        self.assertEqual(result[-1], {"name": "HALT", "params": {}})
+
+    def test_register_sets_are_validated_independently(self):
+        result = AssemblyParser.loads("MOV r9, 0x1\n", register_names=["r9"])
+        self.assertEqual(result[0]["params"]["destination"], ("REG", "r9"))
+
+        with self.assertRaises(ValueError):
+            AssemblyParser.loads("MOV r9, 0x1\n", register_names=["r1"])
+
+        result = AssemblyParser.loads("MOV r1, 0x1\n", register_names=["r1"])
+        self.assertEqual(result[0]["params"]["destination"], ("REG", "r1"))
+
+    def test_registers_nested_in_expressions_are_validated(self):
+        with self.assertRaises(ValueError):
+            AssemblyParser.loads("MOV [r2 + 0x10], r1\n", register_names=["r1"])
+
+    def test_parser_is_shared_between_register_sets(self):
+        AssemblyParser.loads("NOP\n", register_names=["r1"])
+        AssemblyParser.loads("NOP\n", register_names=["r2"])
+        self.assertEqual(list(AssemblyParser.Grammar._parsers), ["lalr"])
+        self.assertIs(
+            AssemblyParser.transformer(frozenset(["r1"])),
+            AssemblyParser.transformer(frozenset(["r1"])),
+        )
+        self.assertIsNot(
+            AssemblyParser.transformer(frozenset(["r1"])),
+            AssemblyParser.transformer(frozenset(["r2"])),
+        )
+
+    def test_parser_tables_are_cached(self):
+        AssemblyParser.loads("NOP\n", register_names=[])
+        cache_file = AssemblyParser.Grammar.cache_file("lalr")
+        self.assertEqual(cache_file.parent, Path(self.cache_dir.name))
+        self.assertTrue(cache_file.exists())
+        self.assertIsNone(AssemblyParser.Grammar.cache_file("cyk"))
+
+    def test_shared_cache_directory_is_not_used(self):
+        Path(self.cache_dir.name).chmod(0o777)
+        self.assertIsNone(AssemblyParser.Grammar.cache_file("lalr"))
+        AssemblyParser.loads("NOP\n", register_names=[])
+        self.assertEqual(list(Path(self.cache_dir.name).iterdir()), [])
+
+    def test_default_cache_directory_is_private(self):
+        with mock.patch.dict("os.environ", {"XDG_CACHE_HOME": self.cache_dir.name}):
+            del os.environ["XSIM_CACHE_DIR"]
+            directory = private_cache_directory()
+        self.assertEqual(directory, Path(self.cache_dir.name) / "xsim")
+        self.assertEqual(directory.stat().st_mode & 0o777, 0o700)
+
+
 if __name__ == "__main__":
     unittest.main()
     cov = coverage.Coverage()
@@ -0,0 +1,159 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core import assembler
+from xsim.core.asm_parser import AssemblyParser
+
+from tests import helpers
+
+SOURCE = Path(__file__).parent.parent / "source.asm"
+REGISTER_NAMES = ["r0", "r1", "r2", "r3", "r4", "r5", "r6", "r7", "sp"]
+
+PROGRAM = [
+    {"name": "NOP", "params": {}},
+    {
+        "name": "MOV",
+        "params": {
+            "destination": ("ADDR", ("EXPR", (("REG", "r2"), "+", ("CONST", 16)))),
+            "source": ("CONST", 0x12345678),
+        },
+    },
+    {
+        "name": "MOV",
+        "params": {"destination": ("REG", "r1"), "source": ("ADDR", ("REG", "r2"))},
+    },
+    {
+        "name": "DB",
+        "params": {"destination": ("CONST", 0x100), "source": ("STRING", "hé")},
+    },
+    {"name": "JMP", "params": {"destination": ("CONST", 0)}},
+]
+
+
+class TestAssembler(unittest.TestCase):
+    def test_round_trip(self):
+        data = assembler.assemble(PROGRAM)
+        self.assertTrue(data.startswith(assembler.MAGIC))
+        self.assertEqual(assembler.disassemble(data), PROGRAM)
+
+    def test_round_trip_source_file(self):
+        program = AssemblyParser.load(SOURCE, register_names=REGISTER_NAMES)
+        data = assembler.assemble(program)
+        self.assertEqual(assembler.disassemble(memoryview(data)), program)
+        # a few bytes per instruction instead of nested dictionaries
+        self.assertLess(len(data), len(program) * 10)
+
+    def test_invalid_programs(self):
+        with self.assertRaises(ValueError):
+            assembler.disassemble(b"NOPE")
+        with self.assertRaises(ValueError):
+            assembler.disassemble(assembler.MAGIC + bytes([assembler.VERSION + 1]))
+        with self.assertRaises(ValueError):
+            assembler.assemble(
+                [{"name": "MOV", "params": {"destination": ("CONST", -1)}}]
+            )
+        with self.assertRaises(ValueError):
+            assembler.assemble(
+                [{"name": "MOV", "params": {"destination": ("LABEL", "x")}}]
+            )
+
+
+class TestProgramCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        environ = mock.patch.dict("os.environ", {"XSIM_CACHE_DIR": self.cache_dir.name})
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.source = Path(self.cache_dir.name) / "program.s"
+        self.source.write_text("MOV r1, 0x5\nADD r1, r2\n")
+
+    def test_second_load_skips_parsing(self):
+        expected = assembler.load(self.source, register_names=["r1", "r2"])
+        cached = assembler.cache_file(self.source.read_bytes(), ["r2", "r1"])
+        self.assertTrue(cached.exists())
+
+        with mock.patch.object(AssemblyParser, "loads") as loads:
+            self.assertEqual(
+                assembler.load(self.source, register_names=["r2", "r1"]), expected
+            )
+        loads.assert_not_called()
+
+    def test_cache_is_keyed_by_source_and_registers(self):
+        source = self.source.read_bytes()
+        key = assembler.cache_key(source, ["r1", "r2"])
+        self.assertEqual(key, assembler.cache_key(source, ["r2", "r1"]))
+        self.assertNotEqual(key, assembler.cache_key(source, ["r1", "r2", "r3"]))
+        self.assertNotEqual(key, assembler.cache_key(source + b"NOP\n", ["r1", "r2"]))
+
+        assembler.load(self.source, register_names=["r1", "r2"])
+        with self.assertRaises(ValueError):
+            assembler.load(self.source, register_names=["r1"])
+
+    def test_corrupted_cache_is_rebuilt(self):
+        cached = assembler.cache_file(self.source.read_bytes(), ["r1", "r2"])
+        cached.write_bytes(assembler.MAGIC + b"\x01\x05")
+        program = assembler.load(self.source, register_names=["r1", "r2"])
+        self.assertEqual(len(program), 2)
+        self.assertEqual(assembler.load_binary(cached), program)
+
+    def test_shared_cache_directory_is_not_used(self):
+        directory = Path(self.cache_dir.name) / "shared"
+        directory.mkdir(mode=0o777)
+        directory.chmod(0o777)
+        with mock.patch.dict("os.environ", {"XSIM_CACHE_DIR": str(directory)}):
+            assembler.load(self.source, register_names=["r1", "r2"])
+        self.assertEqual(list(directory.iterdir()), [])
+
+    def test_load_compiled_program(self):
+        compiled = Path(self.cache_dir.name) / f"program{assembler.SUFFIX}"
+        assembler.save_binary(compiled, PROGRAM)
+        self.assertEqual(assembler.load(compiled, register_names=[]), PROGRAM)
+
+    def test_processor_loads_compiled_program(self):
+        compiled = Path(self.cache_dir.name) / f"program{assembler.SUFFIX}"
+        assembler.save_binary(
+            compiled, AssemblyParser.loads(self.source.read_text(), ["r1", "r2"])
+        )
+        processor = BasicProcessor(
+            1024,
+            {
+                "memory_mapped": [0, 9],
+                "registers": [
+                    {"name": "r1", "size": 2},
+                    {"name": "r2", "size": 2},
+                    {"name": "pc", "size": 2},
+                    {"name": "sp", "size": 2},
+                    {"name": "sreg", "size": 1},
+                ],
+            },
+            flags_names=["S", "Z", "C"],
+        )
+        processor.registers["r2"] = 2
+        processor.update_program(compiled)
+        self.assertEqual(processor.run(), 2)
+        self.assertEqual(processor.registers["r1"], 7)
+
+    def test_compiled_code_is_not_decoded(self):
+        program = AssemblyParser.load(SOURCE, register_names=helpers.REGISTER_NAMES)
+        compiled = Path(self.cache_dir.name) / f"program{assembler.SUFFIX}"
+        assembler.save_binary(compiled, program)
+        encoded, loaded = (
+            BasicProcessor(2048, helpers.REGISTERS_SPEC, helpers.FLAGS_NAMES)
+            for _ in range(2)
+        )
+        encoded.update_program(program)
+        with mock.patch.object(assembler.ProgramReader, "instruction") as instruction:
+            loaded.update_program(compiled)
+        instruction.assert_not_called()
+        # the registers are numbered in the order of the processor, not of the file
+        self.assertEqual(loaded.code_image, encoded.code_image)
+        self.assertEqual(loaded.code_offsets, encoded.code_offsets)
+        self.assertEqual(loaded.program_data, program)
+
+
+if __name__ == "__main__":
+    unittest.main()
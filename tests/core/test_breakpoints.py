@@ -0,0 +1,137 @@
+import unittest
+
+from tests.helpers import PROGRAMS, make_processor
+
+LOOP = "MOV r1, 0x0\nADD r1, 0x1\nMOV [0x300], r1\nMOV r2, [0x302]\nJMP 0x1\n"
+
+
+class TestBreakpoints(unittest.TestCase):
+    def test_conditional_breakpoint(self):
+        processor = make_processor(LOOP, True)
+        processor.breakpoints.add(2, "r1 == 0x5 and memory[0x301] == 4")
+        self.assertEqual(processor.run(max_steps=1000), 18)
+        self.assertEqual(processor.stop_reason, "breakpoint")
+        self.assertEqual(processor.registers["r1"], 5)
+        self.assertEqual(processor.breakpoints.hit, ("breakpoint", 2))
+
+        # the condition of an existing breakpoint is replaced
+        processor.breakpoints.add(2, "R1 == 0x7")
+        self.assertEqual(processor.run(max_steps=1000), 8)
+        self.assertEqual(processor.registers["r1"], 7)
+        processor.breakpoints.discard(2)
+        self.assertEqual(processor.run(max_steps=1000), 1000)
+
+    def test_single_steps_stop_at_breakpoints(self):
+        for translate_blocks in (False, True):
+            with self.subTest(translate_blocks=translate_blocks):
+                processor = make_processor(LOOP, translate_blocks)
+                processor.breakpoints.add(2)
+                runs = [processor.run(max_steps=1) for _ in range(10)]
+                # stopped before the instruction, then resumed past it
+                self.assertEqual(runs, [1, 1, 0, 1, 1, 1, 1, 0, 1, 1])
+                self.assertEqual(processor.registers["r1"], 2)
+
+    def test_debugger_runs_stop_at_breakpoints(self):
+        processor = make_processor(LOOP, False)
+        processor.breakpoints.add(2)
+        steps = []
+        processor.attach_debugger(lambda target, info: steps.append(target))
+        self.assertEqual(processor.run(max_steps=100), 2)
+        self.assertEqual(processor.stop_reason, "breakpoint")
+        self.assertEqual(processor.run(max_steps=100), 4)
+        self.assertEqual(processor.registers["pc"], 2)
+        self.assertEqual(len(steps), 6)
+
+    def test_unknown_names_are_rejected(self):
+        processor = make_processor(LOOP, True)
+        with self.assertRaises(ValueError):
+            processor.breakpoints.add(1, "r9 == 1")
+        with self.assertRaises(ValueError):
+            processor.breakpoints.add(1, "open('file')")
+        with self.assertRaises(SyntaxError):
+            processor.breakpoints.add(1, "r1 ==")
+        self.assertNotIn(1, processor.breakpoints)
+
+    def test_toggle_and_spans(self):
+        processor = make_processor(LOOP, True)
+        breakpoints = processor.breakpoints
+        self.assertTrue(breakpoints.toggle(3))
+        breakpoints.add(8)
+        self.assertEqual(list(breakpoints), [3, 8])
+        self.assertTrue(breakpoints.spans(2, 4))
+        self.assertFalse(breakpoints.spans(4, 8))
+        self.assertFalse(breakpoints.toggle(3))
+        self.assertEqual(len(breakpoints), 1)
+        with self.assertRaises(KeyError):
+            breakpoints.remove(3)
+
+    def test_translated_blocks_stop_at_breakpoints(self):
+        for name, source in PROGRAMS.items():
+            for address in (1, 2, 3, 5):
+                with self.subTest(program=name, address=address):
+                    stops = []
+                    for translate_blocks in (False, True):
+                        processor = make_processor(source, translate_blocks)
+                        processor.breakpoints.add(address)
+                        runs = []
+                        for _ in range(5):
+                            try:
+                                runs.append(processor.run(max_steps=500))
+                            except Exception as exc:
+                                runs.append(type(exc).__name__)
+                                break
+                            runs.append(processor.stop_reason)
+                            runs.append(processor.registers["pc"])
+                        stops.append(runs)
+                    self.assertEqual(stops[0], stops[1])
+
+    def test_blocks_without_breakpoints_are_used(self):
+        processor = make_processor(LOOP, True)
+        processor.breakpoints.add(0)
+        self.assertEqual(processor.run(max_steps=100), 0)
+        self.assertEqual(processor.stop_reason, "breakpoint")
+        processor.run(max_steps=100)
+        self.assertIn(1, processor.translator.blocks)
+        self.assertEqual(processor.stop_reason, "max_steps")
+
+    def test_watchpoints(self):
+        processor = make_processor(LOOP, True)
+        breakpoints = processor.breakpoints
+        breakpoints.watch(0x301, 1)
+        self.assertEqual(processor.run(max_steps=100), 3)
+        self.assertEqual(processor.stop_reason, "watchpoint")
+        self.assertEqual(breakpoints.hit, ("write", 0x301))
+        self.assertEqual(processor.registers["pc"], 3)
+
+        breakpoints.unwatch(0x301, 1)
+        breakpoints.watch(0x302, 2, kind="read")
+        self.assertEqual(processor.run(max_steps=100), 1)
+        self.assertEqual(breakpoints.hit, ("read", 0x302))
+        with self.assertRaises(ValueError):
+            breakpoints.watch(0x302, kind="execute")
+
+        breakpoints.clear()
+        self.assertEqual(breakpoints.watchpoints, {})
+        self.assertEqual(breakpoints.views, {})
+        self.assertEqual(processor.memory.views_overlapping(0x2FF, 8), [])
+        self.assertFalse(processor.memory.is_watched(0x2FF, 8, "read"))
+        self.assertFalse(processor.memory.is_watched(0x2FF, 8, "write"))
+        self.assertEqual(processor.run(max_steps=100), 100)
+
+    def test_watchpoints_share_their_view(self):
+        processor = make_processor(LOOP, True)
+        breakpoints = processor.breakpoints
+        # the views of the registers mapped in the memory
+        views = list(processor.memory.sub_views)
+        for _ in range(3):
+            breakpoints.watch(0x300, 2)
+            breakpoints.watch(0x300, 2, kind="read")
+            breakpoints.unwatch(0x300, 2)
+            self.assertEqual(len(processor.memory.sub_views), len(views) + 1)
+            breakpoints.unwatch(0x300, 2, kind="read")
+            self.assertEqual(processor.memory.sub_views, views)
+        self.assertEqual(processor.run(max_steps=100), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
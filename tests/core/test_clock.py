@@ -0,0 +1,143 @@
+import time
+import unittest
+
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core.asm_parser import AssemblyParser
+from xsim.core.clock import ProcessorClock
+from xsim.core.journal import Journal
+
+REGISTERS_SPEC = {
+    "memory_mapped": [0, 7],
+    "registers": [
+        {"name": "r1", "size": 2},
+        {"name": "pc", "size": 2},
+        {"name": "sp", "size": 2},
+        {"name": "sreg", "size": 1},
+    ],
+}
+
+
+def make_processor(source: str) -> BasicProcessor:
+    processor = BasicProcessor(1024, REGISTERS_SPEC, flags_names=["S", "Z", "C"])
+    processor.update_program(AssemblyParser.loads(source, register_names=["r1"]))
+    return processor
+
+
+def wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class TestProcessorClock(unittest.TestCase):
+    LOOP = "ADD r1, 0x1\nJMP 0x0\n"
+    # instructions recorded before going back
+    RECORDED = 20
+
+    def test_runs_in_batches_at_frequency(self):
+        processor = make_processor(self.LOOP)
+        clock = ProcessorClock(processor, frequency=2000)
+        self.addCleanup(clock.stop)
+        self.assertEqual(clock.batch_limit, 20)
+
+        clock.resume()
+        time.sleep(0.3)
+        clock.pause()
+        executed = clock.executed
+        # the rate is bounded by the target frequency
+        self.assertGreater(executed, 50)
+        self.assertLess(executed, 2000)
+        self.assertFalse(clock.running)
+
+        time.sleep(0.05)
+        self.assertEqual(clock.executed, executed)
+
+    def test_stops_when_the_program_halts(self):
+        stopped = []
+        processor = make_processor("MOV r1, 0x5\nHALT\nMOV r1, 0x6\n")
+        clock = ProcessorClock(processor, frequency=10_000, on_stop=stopped.append)
+        self.addCleanup(clock.stop)
+
+        clock.resume()
+        self.assertTrue(wait_for(lambda: stopped))
+        self.assertIs(stopped[0], processor)
+        self.assertFalse(clock.running)
+        self.assertEqual(processor.stop_reason, "halt")
+        self.assertEqual(processor.registers["r1"], 5)
+
+    def test_stops_on_errors(self):
+        stopped = []
+        processor = make_processor("MOV r1, 0x5\nMOV [r1 + 0x1], 0x1\n")
+        clock = ProcessorClock(processor, frequency=10_000, on_stop=stopped.append)
+        self.addCleanup(clock.stop)
+
+        clock.resume()
+        self.assertTrue(wait_for(lambda: stopped))
+        self.assertEqual(processor.stop_reason, "error")
+        self.assertIsInstance(clock.error, ValueError)
+
+    def test_full_speed_stops_at_breakpoints(self):
+        stopped = []
+        processor = make_processor(self.LOOP)
+        processor.breakpoints.add(1, "r1 == 5000")
+        clock = ProcessorClock(processor, frequency=1, on_stop=stopped.append)
+        self.addCleanup(clock.stop)
+
+        clock.resume(full_speed=True)
+        self.assertTrue(wait_for(lambda: stopped))
+        self.assertEqual(processor.stop_reason, "breakpoint")
+        self.assertEqual(processor.registers["r1"], 5000)
+        self.assertEqual(clock.executed, 9999)
+
+    def test_stops_at_breakpoints(self):
+        stopped = []
+        processor = make_processor(self.LOOP)
+        processor.breakpoints.add(1)
+        # a single instruction per batch
+        clock = ProcessorClock(processor, frequency=60, on_stop=stopped.append)
+        self.addCleanup(clock.stop)
+        self.assertEqual(clock.batch_limit, 1)
+
+        clock.resume()
+        self.assertTrue(wait_for(lambda: stopped))
+        self.assertEqual(processor.stop_reason, "breakpoint")
+        self.assertEqual(processor.registers["pc"], 1)
+        self.assertEqual(clock.executed, 1)
+
+        clock.resume()
+        self.assertTrue(wait_for(lambda: stopped[1:]))
+        self.assertEqual(processor.registers["r1"], 2)
+        self.assertEqual(clock.executed, 3)
+
+    def test_step(self):
+        processor = make_processor(self.LOOP)
+        clock = ProcessorClock(processor, frequency=1)
+        self.assertEqual(clock.step(3), 3)
+        self.assertEqual(processor.registers["r1"], 2)
+        self.assertEqual(clock.executed, 3)
+
+    def test_back(self):
+        processor = make_processor(self.LOOP)
+        clock = ProcessorClock(processor, frequency=10_000)
+        self.assertEqual(clock.back(), 0)
+        clock.journal = Journal(processor)
+        self.addCleanup(clock.stop)
+
+        clock.resume()
+        self.assertTrue(wait_for(lambda: clock.executed > self.RECORDED))
+        clock.pause()
+        clock.stop()
+        executed = clock.executed
+        self.assertEqual(clock.journal.position, executed)
+        self.assertEqual(clock.back(4), 4)
+        self.assertEqual(clock.executed, executed - 4)
+        r1 = processor.registers["r1"]
+        self.assertEqual(clock.step(4), 4)
+        self.assertEqual(processor.registers["r1"], r1 + 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
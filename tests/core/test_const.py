@@ -0,0 +1,36 @@
+import unittest
+
+from xsim.core import const
+
+
+class TestFlagsTables(unittest.TestCase):
+    def test_parity_tables(self):
+        for table, size in ((const.PARITY_U8, 0x100), (const.PARITY_U16, 0x10000)):
+            self.assertEqual(len(table), size)
+            for value in range(size):
+                self.assertEqual(table[value], bin(value).count("1") % 2 == 0)
+
+    def test_flags_tables(self):
+        for table, sign in (
+            (const.SZP_U8, const.SIGN_U8),
+            (const.SZP_U16, const.SIGN_U16),
+        ):
+            self.assertEqual(len(table), sign * 2)
+            for value in (0, 1, 3, sign - 1, sign, sign + 1, sign * 2 - 1):
+                with self.subTest(value=value):
+                    self.assertEqual(table[value] & const.FLAG_S != 0, value >= sign)
+                    self.assertEqual(table[value] & const.FLAG_Z != 0, value == 0)
+                    self.assertEqual(
+                        table[value] & const.FLAG_P != 0,
+                        bin(value).count("1") % 2 == 0,
+                    )
+
+    def test_parity(self):
+        self.assertTrue(const.parity(0))
+        self.assertFalse(const.parity(0x8000))
+        self.assertTrue(const.parity(0x18000))
+        self.assertFalse(const.parity(0x10000))
+
+
+if __name__ == "__main__":
+    unittest.main()
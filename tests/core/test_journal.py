@@ -0,0 +1,123 @@
+import unittest
+
+from xsim.core.journal import Journal
+
+from tests.helpers import PROGRAMS, make_processor
+
+
+def state(processor) -> tuple:
+    return (
+        processor.halt,
+        bytes(processor.memory.data),
+        [processor.registers[name] for name in processor.registers.resisters],
+    )
+
+
+def run(processor, max_steps: int):
+    try:
+        return processor.run(max_steps=max_steps)
+    except Exception as exc:
+        return type(exc).__name__
+
+
+class TestJournal(unittest.TestCase):
+    def test_steps_back_through_the_programs(self):
+        for name, source in PROGRAMS.items():
+            with self.subTest(program=name):
+                processor = make_processor(source, True)
+                journal = Journal(processor, checkpoint_interval=16)
+                states = [state(processor)]
+                for _ in range(120):
+                    if isinstance(run(processor, 1), str) or processor.halt:
+                        states.append(state(processor))
+                        break
+                    states.append(state(processor))
+                self.assertEqual(journal.position, len(states) - 1)
+
+                for expected in reversed(states[:-1]):
+                    self.assertEqual(journal.back(), 1)
+                    self.assertEqual(state(processor), expected)
+                self.assertEqual(journal.back(), 0)
+                self.assertEqual(journal.size, len(journal.checkpoints[0]))
+
+    def test_goes_back_over_batches(self):
+        for name, source in PROGRAMS.items():
+            if name == "division by zero":
+                continue
+            for steps in (1, 5, 40, 300):
+                with self.subTest(program=name, steps=steps):
+                    reference = make_processor(source, False)
+                    expected = [state(reference)]
+                    for _ in range(300):
+                        reference.run(max_steps=1)
+                        expected.append(state(reference))
+                        if reference.halt:
+                            break
+
+                    processor = make_processor(source, True)
+                    journal = Journal(processor, checkpoint_interval=32)
+                    run(processor, 150)
+                    run(processor, 150)
+                    position = journal.position
+                    undone = journal.back(steps)
+                    self.assertEqual(undone, min(steps, position))
+                    self.assertEqual(state(processor), expected[position - undone])
+                    # the run continues from the earlier state as it did before
+                    run(processor, undone)
+                    self.assertEqual(journal.position, position)
+                    self.assertEqual(state(processor), expected[position])
+
+    def test_budget_drops_the_oldest_history(self):
+        processor = make_processor(PROGRAMS["memory"], False)
+        journal = Journal(processor, budget=20_000, checkpoint_interval=64)
+        processor.run(max_steps=2000)
+        self.assertLessEqual(journal.size, journal.budget)
+        self.assertGreater(journal.first, 0)
+        self.assertTrue(all(item >= journal.first for item in journal.checkpoints))
+
+        first = journal.first
+        reference = make_processor(PROGRAMS["memory"], False)
+        reference.run(max_steps=first)
+        self.assertEqual(journal.back(5000), 2000 - first)
+        self.assertEqual(journal.position, first)
+        self.assertEqual(state(processor), state(reference))
+
+    def test_deferred_flags_are_restored_after_being_read(self):
+        # the flags of ADD are deferred, then read by JZ
+        source = "MOV r1, 0x1\nADD r1, 0x1\nJZ 0x0\nNOP\n"
+        for translate_blocks in (False, True):
+            with self.subTest(translate_blocks=translate_blocks):
+                processor = make_processor(source, translate_blocks)
+                self.assertTrue(processor.registers.take("sreg").lazy)
+                journal = Journal(processor)
+                processor.run(max_steps=3)
+                flags = processor.registers["sreg"]
+                journal.back(1)
+                self.assertEqual(processor.registers["pc"], 2)
+                self.assertEqual(processor.registers["sreg"], flags)
+                self.assertEqual(flags, 0b0001_0111)
+                journal.close()
+
+    def test_changes_between_instructions_are_undone_with_the_previous_one(self):
+        processor = make_processor(PROGRAMS["loop"], False)
+        journal = Journal(processor, checkpoint_interval=3)
+        processor.run(max_steps=3)
+        processor.memory.write(0x300, 0x42)
+        processor.registers["r4"] = 0x7
+        processor.run(max_steps=2)
+        journal.back(2)
+        self.assertEqual(processor.memory.read(0x300), 0x42)
+        self.assertEqual(processor.registers["r4"], 0x7)
+        journal.back(1)
+        self.assertEqual(processor.memory.read(0x300), 0)
+        self.assertEqual(processor.registers["r4"], 0)
+        journal.back(2)
+        self.assertEqual(processor.registers["pc"], 0)
+        journal.close()
+        self.assertNotIn(journal, processor.observers)
+        self.assertNotIn(("write", journal.on_write), processor.memory.callbacks)
+        self.assertFalse(processor.memory.is_watched(0x300, 1, "write"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,9 @@
+import threading
 import unittest
 from unittest.mock import MagicMock
 
 import intervaltree
-from xsim.core.memory import Memory, MemoryView
+from xsim.core.memory import DirtyTracker, Memory, MemoryView
 
 
 class TestMemory(unittest.TestCase):
@@ -66,10 +67,7 @@ class TestGetLimitAccessAtTime(unittest.TestCase):
 
     def test_limit_less_than_size(self):
         # Set up restricts
-        self.memory.restricts["access_at_time"] = intervaltree.IntervalTree()
-        self.memory.restricts["access_at_time"].add(
-            intervaltree.Interval(0, 10, data=5)
-        )
+        self.memory.limit_access_at_time(0, 10, limit=5)
 
         # Test when limit is less than size
         address = 0
@@ -79,10 +77,7 @@ class TestGetLimitAccessAtTime(unittest.TestCase):
 
     def test_limit_greater_than_size(self):
         # Set up restricts
-        self.memory.restricts["access_at_time"] = intervaltree.IntervalTree()
-        self.memory.restricts["access_at_time"].add(
-            intervaltree.Interval(0, 10, data=15)
-        )
+        self.memory.limit_access_at_time(0, 10, limit=15)
 
         # Test when limit is greater than size
         address = 0
@@ -97,6 +92,155 @@ class TestGetLimitAccessAtTime(unittest.TestCase):
         limit = self.memory.get_limit_access_at_time(address, size)
         self.assertEqual(limit, 8)
 
+    def test_limit_through_view(self):
+        memory_view = self.memory.view(0x10, 8, restrict_access_at_time=2)
+        memory_view.view(4, 4).limit_access_at_time(limit=3)
+        self.assertEqual(self.memory.get_limit_access_at_time(0x0F, 4), 2)
+        self.assertEqual(self.memory.get_limit_access_at_time(0x14, 4), 3)
+        self.assertEqual(self.memory.get_limit_access_at_time(0x18, 4), 4)
+
+
+class TestMemoryLookup(unittest.TestCase):
+    """Lookups of the page table against the previous interval tree implementation."""
+
+    SIZE = 64 * 1024
+    VIEWS = 48
+
+    def setUp(self):
+        self.memory = Memory(self.SIZE)
+        self.sub_views = intervaltree.IntervalTree()
+        self.restricts = intervaltree.IntervalTree()
+        for index in range(self.VIEWS):
+            address, size = index * 1024 + 100, 700
+            memory_view = self.memory.view(address, size, restrict_access_at_time=1)
+            self.sub_views[address : address + size] = memory_view
+            self.restricts[address : address + size] = 1
+        self.addresses = [(index * 1361) % (self.SIZE - 2) for index in range(2000)]
+
+    def test_views_lookup(self):
+        for address in self.addresses:
+            self.assertEqual(
+                list(self.memory.views_at(address)),
+                [interval.data for interval in self.sub_views[address]],
+            )
+        # a lookup only checks the views of the page holding the address
+        self.assertLessEqual(max(len(page) for page in self.memory.pages), 2)
+
+    def test_access_limit_lookup(self):
+        def interval_limit(address):
+            bound = self.restricts.overlap(address, address + 2)
+            return min(bound.pop().data, 2) if bound else 2
+
+        for address in self.addresses:
+            self.assertEqual(
+                self.memory.get_limit_access_at_time(address, 2),
+                interval_limit(address),
+            )
+
+    def test_access_limit_is_skipped(self):
+        # single bytes and memories without limits do not look the limits up
+        self.memory.restricts = MagicMock()
+        self.assertEqual(self.memory.get_limit_access_at_time(0x100, 1), 1)
+        unrestricted = Memory(self.SIZE)
+        unrestricted.restricts = MagicMock()
+        self.assertEqual(unrestricted.get_limit_access_at_time(0x100, 2), 2)
+        self.memory.restricts.__getitem__.assert_not_called()
+        unrestricted.restricts.__getitem__.assert_not_called()
+
+    def test_views_share_the_root_indexes(self):
+        memory_view = self.memory.view(0x100, 0x100).view(0x10, 0x10)
+        self.assertIs(memory_view.watched, self.memory.watched)
+        self.assertEqual(memory_view.restricts, {})
+
+
+class TestMemoryBlocks(unittest.TestCase):
+    def setUp(self):
+        self.memory = Memory(1024)
+
+    def test_write_and_read_block(self):
+        self.memory.write_block(0x10, b"hello")
+        self.assertEqual(self.memory.read_block(0x10, 5), b"hello")
+        self.assertEqual(self.memory.read(0x14), ord("o"))
+        self.assertEqual(self.memory.read_block(0x10, 0), b"")
+
+    def test_fill(self):
+        self.memory.fill(0x20, 300, 0x7F)
+        self.assertEqual(self.memory.read_block(0x20, 300), b"\x7f" * 300)
+        self.assertEqual(self.memory.read(0x20 + 300), 0)
+
+    def test_copy_overlapping(self):
+        self.memory.write_block(0, b"abcdef")
+        self.memory.copy(0, 2, 4)
+        self.assertEqual(self.memory.read_block(0, 6), b"ababcd")
+        self.memory.copy(2, 0, 4)
+        self.assertEqual(self.memory.read_block(0, 6), b"abcdcd")
+
+    def test_out_of_range(self):
+        with self.assertRaises(ValueError):
+            self.memory.write_block(1020, b"hello")
+
+    def test_single_range_hook(self):
+        root_mock, first_mock, second_mock = MagicMock(), MagicMock(), MagicMock()
+        self.memory.on_write(root_mock)
+        self.memory.view(0x100, 0x100).on_write(first_mock)
+        self.memory.view(0x200, 0x100).on_write(second_mock)
+
+        self.memory.write_block(0x1FE, b"abcd")
+        root_mock.assert_called_once_with(0x1FE, b"abcd")
+        first_mock.assert_called_once_with(0xFE, b"ab")
+        second_mock.assert_called_once_with(0, b"cd")
+
+    def test_range_hook_from_view(self):
+        read_mock, write_mock = MagicMock(), MagicMock()
+        memory_view = self.memory.view(0x100, 0x100)
+        memory_view.view(0x10, 0x10).on_read(read_mock)
+        self.memory.view(0x180, 0x10).on_write(write_mock)
+
+        memory_view.fill(0x0, 0x100, 0x20)
+        write_mock.assert_called_once_with(0, b"\x20" * 0x10)
+        memory_view.copy(0x8, 0x80, 0x10)
+        read_mock.assert_called_once_with(0, 8)
+        write_mock.assert_called_with(0, b"\x20" * 0x10)
+        self.assertEqual(write_mock.call_count, 2)
+
+
+class TestDirtyTracker(unittest.TestCase):
+    def setUp(self):
+        self.memory = Memory(1024)
+        self.video = self.memory.view(0x100, 300)
+        self.tracker = DirtyTracker(self.video, 30)
+
+    def test_collects_written_rows(self):
+        self.assertFalse(self.tracker.dirty)
+        self.memory.write(0x100 + 31, 0x41)
+        self.video.write(29, 0x4142, 2)
+        self.memory.write(0x50, 0x41)
+        self.assertTrue(self.tracker.dirty)
+        self.assertEqual(self.tracker.collect(), [0, 1])
+        self.assertFalse(self.tracker.dirty)
+        self.assertEqual(self.tracker.collect(), [])
+
+    def test_block_writes_are_coalesced(self):
+        self.memory.write_block(0x100 + 45, b"x" * 40)
+        self.video.fill(0, 300, 0x20)
+        self.assertEqual(self.tracker.collect(), list(range(10)))
+
+    def test_rows_are_clipped_to_memory(self):
+        self.video.write(299, 0x41)
+        self.tracker.on_write(299, b"ab")
+        self.assertEqual(self.tracker.collect(), [9])
+        self.tracker.mark_all()
+        self.assertEqual(len(self.tracker.collect()), 10)
+
+    def test_writes_wait_for_the_collect(self):
+        writer = threading.Thread(target=self.video.write, args=(45, 0x41))
+        with self.tracker.lock:
+            writer.start()
+            writer.join(0.05)
+            self.assertFalse(self.tracker.rows)
+        writer.join()
+        self.assertEqual(self.tracker.collect(), [1])
+
 
 class TestMemoryDumping(unittest.TestCase):
     def setUp(self):
@@ -190,6 +334,68 @@ class TestMemoryHooks(unittest.TestCase):
         # Check if the callback was called with the correct arguments
         callback_mock.assert_called_once()
 
+    def test_unwatched_access_skips_dispatch(self):
+        self.memory.view(0x10, 16).on_write(MagicMock())
+        self.memory.on_hook = MagicMock()
+
+        self.memory.write(0x40, 0x41)
+        self.memory.read(0x10)
+        self.memory.on_hook.assert_not_called()
+
+        self.memory.write(0x10, 0x41)
+        self.memory.on_hook.assert_called_once()
+
+    def test_nested_view_subscribers(self):
+        write_mock, read_mock = MagicMock(), MagicMock()
+        outer = self.memory.view(0x20, 32)
+        inner = outer.view(4, 8)
+        inner.on_write(write_mock)
+        inner.on_read(read_mock)
+
+        self.memory.write(0x24, 0x41)
+        write_mock.assert_called_once_with(0, b"\x41")
+        outer.write(11, 0x42)
+        write_mock.assert_called_with(7, b"\x42")
+        self.memory.write(0x2C, 0x43)
+        self.assertEqual(write_mock.call_count, 2)
+
+        outer.read(5, 2)
+        read_mock.assert_called_once_with(1, 2)
+        self.assertEqual(self.memory.watched["read"][0x24:0x2C], b"\x01" * 8)
+        self.assertFalse(any(self.memory.watched["read"][0x2C:]))
+
+    def test_remove_view(self):
+        write_mock = MagicMock()
+        self.memory = Memory(512)
+        outer = self.memory.view(0xF0, 32)
+        inner = outer.view(4, 8)
+        inner.on_write(write_mock)
+        self.memory.remove_view(outer)
+        self.assertEqual(self.memory.sub_views, [])
+        self.assertEqual(list(self.memory.views_at(0xF4)), [])
+        self.assertEqual(list(self.memory.views_at(0x104)), [])
+        self.assertFalse(any(self.memory.watched["write"]))
+        self.memory.write(0xF4, 0x41)
+        write_mock.assert_not_called()
+
+    def test_unsubscribe_rebuilds_watched(self):
+        outer_mock, inner_mock = MagicMock(), MagicMock()
+        outer = self.memory.view(0x20, 32)
+        inner = outer.view(4, 8)
+        outer.on_write(outer_mock)
+        inner.on_write(inner_mock)
+
+        outer.unsubscribe(outer_mock)
+        self.assertEqual(self.memory.watched["write"][0x24:0x2C], b"\x01" * 8)
+        self.assertEqual(sum(self.memory.watched["write"]), 8)
+        inner.unsubscribe(inner_mock)
+        inner.unsubscribe(inner_mock)
+        self.assertFalse(any(self.memory.watched["write"]))
+
+        self.memory.on_hook = MagicMock()
+        self.memory.write(0x24, 0x41)
+        self.memory.on_hook.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -70,6 +70,96 @@ class TestProcessorRegisters(unittest.TestCase):
         self.processor_registers.take.assert_called_once_with(0)
         self.processor_registers.take.return_value.set.assert_called_once_with(42)
 
+    def test_getter_and_setter_share_the_register_file(self):
+        setter = self.processor_registers.setter("r1")
+        getter = self.processor_registers.getter("R1")
+        setter(0x1234)
+        self.assertEqual(getter(), 0x1234)
+        self.assertEqual(self.processor_registers["r1"], 0x1234)
+        self.assertEqual(
+            self.processor_registers.values[self.processor_registers.slot("r1")],
+            0x1234,
+        )
+
+    def test_register_set_updates_memory(self):
+        self.processor_registers["r1"] = 0x1234
+        self.assertEqual(self.memory_view.read(2, 2), 0x1234)
+
+    def test_memory_write_reloads_registers(self):
+        self.memory_view.write(2, 0x1234, 2)
+        self.assertEqual(self.processor_registers["r1"], 0x1234)
+        # a write spanning several registers reloads all of them
+        self.memory_view.write(1, 0xAABBCC, 3)
+        self.assertEqual(self.processor_registers["r0"], 0xAA)
+        self.assertEqual(self.processor_registers["r1"], 0xBBCC)
+
+    def test_unmapped_registers(self):
+        registers = ProcessorRegisters(
+            Memory(4),
+            [
+                {"name": "r0", "size": 2},
+                {"name": "r1", "size": 2},
+                {"name": "pc", "size": 2, "default": 7},
+            ],
+        )
+        self.assertEqual(registers["pc"], 7)
+        registers.setter("pc")(9)
+        self.assertEqual(registers.getter("pc")(), 9)
+        self.assertEqual(registers.unmapped_memory.read(0, 2), 9)
+
+    def test_reset(self):
+        registers = ProcessorRegisters(
+            Memory(4),
+            [
+                {"name": "r0", "size": 2},
+                {"name": "r1", "size": 2},
+                {"name": "pc", "size": 2, "default": 7},
+            ],
+        )
+        registers["r1"] = 3
+        registers["pc"] = 9
+        registers.reset()
+        self.assertEqual(registers["r1"], 0)
+        self.assertEqual(registers.memory.read(2, 2), 0)
+        self.assertEqual(registers["pc"], 7)
+
+    def test_deferred_registers(self):
+        registers = ProcessorRegisters(
+            Memory(2),
+            [{"name": "r0", "size": 2}, {"name": "sreg", "size": 1}],
+            deferred=["sreg"],
+        )
+        sreg = registers.take("sreg")
+        get_sreg = registers.getter("sreg")
+        updates = []
+
+        def update(value, argument):
+            updates.append(argument)
+            return value | argument
+
+        sreg.defer(update, 0x1)
+        sreg.defer(update, 0x4)
+        self.assertEqual(updates, [])
+        # only the last update is applied, when the register is read
+        self.assertEqual(get_sreg(), 0x4)
+        self.assertEqual(registers["sreg"], 0x4)
+        self.assertEqual(updates, [0x4])
+        self.assertEqual(registers.unmapped_memory.read(0, 1), 0x4)
+
+        sreg.defer(update, 0x1)
+        registers["sreg"] = 0x10
+        self.assertEqual(registers["sreg"], 0x10)
+
+    def test_mapped_deferred_registers_are_updated(self):
+        memory = Memory(3)
+        registers = ProcessorRegisters(
+            memory,
+            [{"name": "r0", "size": 2}, {"name": "sreg", "size": 1}],
+            deferred=["sreg"],
+        )
+        registers.take("sreg").defer(lambda value, argument: value | argument, 0x2)
+        self.assertEqual(memory.read(2, 1), 0x2)
+
 
 class TestProcessorBase(unittest.TestCase):
     def setUp(self):
@@ -137,6 +227,39 @@ class TestProcessorBase(unittest.TestCase):
         self.processor.detach_debugger()
         self.assertIsNone(self.processor.dbc)
 
+    def test_snapshot_and_restore(self):
+        processor = self.processor
+        processor.registers["r1"] = 0x1234
+        processor.registers["lr"] = 0x42
+        processor.memory.write(0x300, 0x7)
+        # the flags update is still deferred when the snapshot is taken
+        processor.registers.take("sreg").defer(lambda value, argument: argument, 0x5)
+        snapshot = processor.snapshot()
+
+        processor.registers["r1"] = 0x1
+        processor.registers["lr"] = 0x2
+        processor.registers["sreg"] = 0x3
+        processor.memory.write(0x300, 0x8)
+        processor.halt = True
+        processor.restore(snapshot)
+        self.assertEqual(processor.registers["r1"], 0x1234)
+        self.assertEqual(processor.memory.read(2, 2), 0x1234)
+        self.assertEqual(processor.registers["lr"], 0x42)
+        self.assertEqual(processor.registers["sreg"], 0x5)
+        self.assertEqual(processor.memory.read(0x300), 0x7)
+        self.assertFalse(processor.halt)
+        self.assertEqual(processor.snapshot(), snapshot)
+
+    def test_restore_checks_the_layout(self):
+        snapshot = self.processor.snapshot()
+        other = ProcessorBase(
+            2048, {"registers": [{"name": "pc", "size": 2}]}, flags_names=["Z"]
+        )
+        with self.assertRaises(ValueError):
+            other.restore(snapshot)
+        with self.assertRaises(ValueError):
+            self.processor.restore(snapshot[:-1])
+
 
 if __name__ == "__main__":
     unittest.main()
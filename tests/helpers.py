@@ -0,0 +1,75 @@
+"""Programs and processors shared by the tests of the processor features."""
+
+from pathlib import Path
+
+from xsim.components.basic.processor import BasicProcessor
+from xsim.core.asm_parser import AssemblyParser
+
+REGISTERS_SPEC = {
+    "memory_mapped": [0, 16],
+    "registers": [
+        {"name": "r0", "size": 2},
+        {"name": "r1", "size": 2},
+        {"name": "r2", "size": 2},
+        {"name": "r3", "size": 2},
+        {"name": "r4", "size": 2},
+        {"name": "r5", "size": 2},
+        {"name": "r6", "size": 2},
+        {"name": "r7", "size": 2},
+        {"name": "pc", "size": 2},
+        {"name": "sp", "size": 2},
+        {"name": "sreg", "size": 1},
+    ],
+}
+FLAGS_NAMES = ["I", "T", "H", "S", "V", "P", "Z", "C"]
+
+SOURCE = Path(__file__).parent / "source.asm"
+REGISTER_NAMES = [item["name"] for item in REGISTERS_SPEC["registers"]]
+
+# the test programs, run by both the interpreter and the translated blocks
+PROGRAMS = {
+    "source": SOURCE.read_text(),
+    "loop": "MOV r1, 0x0\nADD r1, 0x1\nJMP 0x1\n",
+    "countdown": (
+        "MOV r2, 0x10\nSUB r2, 0x1\nADD r3, r2\nMOV [0x300], r3\n"
+        "CMP r2, 0x0\nJNZ 0x1\nHALT\n"
+    ),
+    "stack": (
+        "MOV sp, 0x400\nPUSH 0x7\nCALL 0x6\nPOP r2\nJMP 0x1\nHALT\n"
+        "POP r1\nADD r1, 0x1\nPUSH r1\nRET\n"
+    ),
+    "memory": (
+        "MOV r1, 0x5\nMOV [0x300], 0x1234\nADD [0x300], r1\nMOV r5, [0x301]\n"
+        'AND r5, 0xff\nOR r4, 0x10\nXOR r4, r5\nSHR r4, 0x1\nDB 0x200, "abc"\n'
+        "MOV r2, [0x200]\nMUL r2, 0x3\nDIV r2, 0x2\nJMP 0x2\n"
+    ),
+    "registers in memory": "MOV r1, 0x1\nMOV [0x0], 0x2\nADD r1, r0\nJMP 0x1\n",
+    "program counter": "MOV r1, 0x3\nADD r2, 0x1\nMOV pc, r1\nADD r2, 0x2\nJMP 0x1\n",
+    "division by zero": "MOV r1, 0x5\nADD r2, 0x1\nSUB r1, 0x1\nDIV r2, r1\nJMP 0x1\n",
+}
+
+
+def make_processor(
+    source: str, translate_blocks: bool, registers_spec: dict = REGISTERS_SPEC
+) -> BasicProcessor:
+    processor = BasicProcessor(2048, registers_spec, flags_names=FLAGS_NAMES)
+    if translate_blocks:
+        processor.translator.threshold = 1
+    else:
+        processor.translator = None
+    processor.update_program(AssemblyParser.loads(source, REGISTER_NAMES))
+    return processor
+
+
+def run(processor: BasicProcessor, max_steps: int):
+    try:
+        steps = processor.run(max_steps=max_steps)
+    except Exception as exc:
+        steps = type(exc).__name__
+    return (
+        steps,
+        processor.stop_reason,
+        processor.halt,
+        bytes(processor.memory.data),
+        [processor.registers[name] for name in processor.registers.resisters],
+    )
@@ -0,0 +1,70 @@
+import json
+import subprocess
+import sys
+import unittest
+
+HEADLESS_MODULES = [
+    "xsim.core.asm_parser",
+    "xsim.core.clock",
+    "xsim.core.memory",
+    "xsim.core.processor",
+    "xsim.components.basic.processor",
+    "xsim.app.cli",
+]
+HEAVY_PACKAGES = ["lark", "textual", "rich"]
+# cumulative import time of the headless modules, in seconds
+IMPORT_TIME_BUDGET = 0.3
+
+REPORT_LOADED = """
+import json, sys
+print(json.dumps(sorted({name.split(".")[0] for name in sys.modules})))
+"""
+
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_time(stderr: str) -> float:
+    """Sums the cumulative time of the top level imports reported by importtime."""
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if name.startswith(" xsim") and cumulative.strip().isdigit():
+            total += int(cumulative)
+    return total / 1e6
+
+
+class TestHeadlessImports(unittest.TestCase):
+    def test_heavy_packages_are_not_imported(self):
+        result = run_python(
+            "".join(f"import {module}\n" for module in HEADLESS_MODULES) + REPORT_LOADED
+        )
+        loaded = json.loads(result.stdout)
+        for package in HEAVY_PACKAGES:
+            self.assertNotIn(package, loaded)
+
+    def test_lark_is_imported_when_parsing(self):
+        result = run_python(
+            "from xsim.core.asm_parser import AssemblyParser\n"
+            "AssemblyParser.loads('NOP\\n', register_names=[])\n" + REPORT_LOADED
+        )
+        self.assertIn("lark", json.loads(result.stdout))
+        self.assertNotIn("textual", json.loads(result.stdout))
+
+    def test_import_time_budget(self):
+        result = run_python(
+            "".join(f"import {module}\n" for module in HEADLESS_MODULES)
+        )
+        self.assertLess(import_time(result.stderr), IMPORT_TIME_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()